@@ -1,22 +1,45 @@
 from werkzeug.middleware.proxy_fix import ProxyFix
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 from utils.ip_tools import (
     get_network_info, 
     summarize_ip_ranges,
     convert_ip_v4_to_v6,
     convert_ip_v6_to_v4,
-    ip_dec_to_bin, ip_bin_to_dec,
-    ip_dec_to_hex, ip_hex_to_dec,
-    mask_to_cidr, cidr_to_mask,
-    divide_network, query_ip_location
+    plan_division, iter_divided_subnets,
+    query_ip_location, query_ip_locations, get_location_cache_stats, get_rate_limit_stats
+)
+from utils.ip_batch import convert_batch, CONVERTERS as IP_FORMAT_CONVERTERS
+from utils.ip_stream import (
+    read_lines, serialize,
+    iter_summary_rows, iter_format_rows, iter_convert_rows, iter_location_rows, iter_membership_rows, iter_lpm_rows,
+    RESULT_FIELDS as STREAM_RESULT_FIELDS, LOCATION_FIELDS as STREAM_LOCATION_FIELDS,
+    MEMBERSHIP_FIELDS as STREAM_MEMBERSHIP_FIELDS, LPM_FIELDS as STREAM_LPM_FIELDS,
+    OUTPUT_FORMATS as STREAM_OUTPUT_FORMATS
+)
+from utils.ipset import IPSet
+from utils.lpm import LpmService
+from utils.vlsm import allocate_vlsm
+from utils.http_cache import ResponseCache
+from utils.dns_tools import query_dns_records, iter_bulk_dns_records, get_dns_cache_stats
+from utils.logger import app_logger, api_logger, get_log_stats
+from utils.metrics import (
+    REGISTRY, GaugeFunction, HTTP_REQUESTS, HTTP_REQUEST_SECONDS, HTTP_IN_FLIGHT
 )
-from utils.dns_tools import query_dns_records
-from utils.logger import app_logger, api_logger
 import time
 import os
+import random
+import json
+import config
 from werkzeug.utils import secure_filename
 from utils.doc_tools import DocConverter
+from utils.jobs import ConversionJobManager, JobQueueFull
+from utils.pdf_scheduler import PdfConversionScheduler
+from utils.docx_backends import DocxConverterPool, create_docx_backend
+from utils.cache import FileStore
+from utils.uploads import UploadManager, UploadError
+from utils.host_lock import HostLock
+from werkzeug.exceptions import RequestEntityTooLarge
 import atexit
 import schedule
 import threading
@@ -28,13 +51,79 @@ app = Flask(__name__)
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 CORS(app)
 
+# 所有PDF转换共享一个固定大小的进程池，按页拆分后在请求间轮转调度
+# 转换进程数、结果缓存大小均为整台主机的上限，每个工作进程各自创建进程池和缓存索引，按工作进程数均分
+pdf_scheduler = PdfConversionScheduler(
+    workers=config.per_worker(config.PDF_WORKERS),
+    pages_per_task=config.PDF_PAGES_PER_TASK
+)
+# 常驻的DOCX转PDF转换进程，预先启动，按任务数/内存占用定期重启
+docx_pool = DocxConverterPool(
+    lambda: create_docx_backend(config.DOCX_BACKEND, soffice=config.SOFFICE_PATH),
+    workers=config.per_worker(config.DOCX_WORKERS),
+    max_jobs=config.DOCX_MAX_JOBS,
+    max_memory=config.DOCX_MAX_MEMORY_MB * 1024 * 1024,
+    timeout=config.DOCX_TIMEOUT
+) if config.DOCX_WORKERS > 0 else None
 # 初始化文档转换器
-doc_converter = DocConverter()
+doc_converter = DocConverter(scheduler=pdf_scheduler, docx_pool=docx_pool,
+                             docx_engine=config.DOCX_BACKEND, soffice=config.SOFFICE_PATH)
+# 转换结果缓存：按源文件内容哈希和转换参数寻址
+conversion_store = FileStore(
+    config.DOC_CACHE_DIR,
+    max_bytes=config.per_worker(config.DOC_CACHE_MAX_MB * 1024 * 1024),
+    name='conversions'
+) if config.DOC_CACHE_MAX_MB > 0 else None
+# 异步转换任务在独立的进程池中执行
+job_manager = ConversionJobManager(
+    doc_converter,
+    max_workers=config.per_worker(config.DOC_JOB_WORKERS),
+    job_ttl=config.DOC_JOB_TTL,
+    max_pending=config.DOC_JOB_MAX_PENDING,
+    store=conversion_store,
+    db_path=config.DOC_JOB_DB or None
+)
+
+# 上传文件按块流式写入磁盘，超出大小限制的请求在读取请求体前即被拒绝
+upload_manager = UploadManager(
+    doc_converter.upload_folder,
+    max_bytes=config.DOC_UPLOAD_MAX_MB * 1024 * 1024,
+    chunk_size=config.DOC_UPLOAD_CHUNK_KB * 1024,
+    session_ttl=config.DOC_UPLOAD_TTL
+)
+# 为 multipart 的边界和表单字段预留少量余量
+app.config['MAX_CONTENT_LENGTH'] = upload_manager.max_bytes + 64 * 1024
+# 纯计算接口（网段计算、子网划分、格式转换）的响应缓存
+response_cache = ResponseCache(
+    maxsize=config.COMPUTE_CACHE_SIZE,
+    max_body=config.COMPUTE_CACHE_MAX_KB * 1024,
+    max_age=config.HTTP_CACHE_MAX_AGE
+)
+# 最长前缀匹配的前缀表，文件更新后在后台重新编译并整体替换
+lpm_service = LpmService(config.LPM_TABLE_PATH, reload_interval=config.LPM_RELOAD_INTERVAL)
+
+# 导出时读取的组件状态
+GaugeFunction('pdf_scheduler_queued_tasks', 'PDF转换调度器中排队的任务数',
+              lambda: pdf_scheduler.stats()['queued'])
+GaugeFunction('pdf_scheduler_running_tasks', 'PDF转换调度器中执行中的任务数',
+              lambda: pdf_scheduler.stats()['running'])
+GaugeFunction('log_dropped_records', '日志队列写满后丢弃的日志条数',
+              lambda: {(name,): stats['dropped'] for name, stats in get_log_stats().items()},
+              labelnames=('logger',))
 
 # 请求计时中间件
 @app.before_request
 def before_request():
     request.start_time = time.time()
+    # 以路由模板作为指标标签，避免路径参数导致标签无限增长
+    request.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_IN_FLIGHT.inc(request.metrics_route)
+
+@app.teardown_request
+def teardown_request(error=None):
+    route = getattr(request, 'metrics_route', None)
+    if route is not None:
+        HTTP_IN_FLIGHT.dec(route)
 
 def get_client_ip():
     """获取真实的客户端IP地址"""
@@ -50,26 +139,29 @@ def get_client_ip():
 @app.after_request
 def after_request(response):
     duration = time.time() - request.start_time
-    client_ip = get_client_ip()
-    
-    # 扩展的请求信息记录
-    request_info = {
-        "method": request.method,
-        "path": request.path,
-        "status_code": response.status_code,
-        "duration": f"{duration:.3f}s",
-        "client_ip": client_ip,
-        "x_forwarded_for": request.headers.get('X-Forwarded-For', '-'),
-        "x_real_ip": request.headers.get('X-Real-IP', '-'),
-        "host": request.headers.get('Host', '-'),
-        "user_agent": request.headers.get('User-Agent', '-'),
-        "referer": request.headers.get('Referer', '-')
-    }
-    
-    # 格式化日志消息
-    log_message = " | ".join([f"{k}: {v}" for k, v in request_info.items()])
-    api_logger.info(log_message)
-    
+    route = getattr(request, 'metrics_route', 'unmatched')
+    HTTP_REQUEST_SECONDS.observe(duration, request.method, route)
+    HTTP_REQUESTS.inc(request.method, route, str(response.status_code))
+
+    # 成功且不慢的请求按比例采样记录，错误和慢请求始终记录
+    sampled = response.status_code >= 400 or duration * 1000 >= config.LOG_SLOW_REQUEST_MS or \
+        config.LOG_ACCESS_SAMPLE_RATE >= 1 or random.random() < config.LOG_ACCESS_SAMPLE_RATE
+    if sampled:
+        # 扩展的请求信息记录，由日志格式化器渲染为文本或JSON字段
+        request_info = {
+            "method": request.method,
+            "path": request.path,
+            "status_code": response.status_code,
+            "duration": f"{duration:.3f}s",
+            "client_ip": get_client_ip(),
+            "x_forwarded_for": request.headers.get('X-Forwarded-For', '-'),
+            "x_real_ip": request.headers.get('X-Real-IP', '-'),
+            "host": request.headers.get('Host', '-'),
+            "user_agent": request.headers.get('User-Agent', '-'),
+            "referer": request.headers.get('Referer', '-')
+        }
+        api_logger.info('request', extra={'fields': request_info})
+
     # 添加必要的响应头
     if response.mimetype == 'application/pdf' or response.mimetype == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
         response.headers['Access-Control-Expose-Headers'] = 'Content-Disposition'
@@ -80,10 +172,42 @@ def handle_error(error):
     app_logger.error(f"Error occurred: {str(error)}", exc_info=True)
     return jsonify({'error': str(error)}), 500
 
-@app.route('/api/network/calculate', methods=['POST'])
+def _request_data(list_fields=()):
+    """GET 请求取查询参数（list_fields 中的参数可重复出现），其余请求取JSON请求体"""
+    if request.method in ('GET', 'HEAD'):
+        return {key: request.args.getlist(key) if key in list_fields else request.args.get(key)
+                for key in request.args}
+    return request.json
+
+def _uploaded_lines():
+    """
+    读取上传的文本/CSV文件（表单字段 file），未上传文件时返回 None
+    表单参数 column 指定CSV列序号（.csv 文件默认第0列），header=1 表示跳过表头
+    """
+    file = request.files.get('file')
+    if file is None:
+        return None
+    column = request.form.get('column')
+    if column not in (None, ''):
+        column = int(column)
+    else:
+        column = 0 if file.filename.lower().endswith('.csv') else None
+    return read_lines(file.stream, column, skip_header=request.form.get('header') in ('1', 'true'))
+
+def _stream_file_result(name, batches, fields):
+    """以表单参数 format 指定的 CSV/NDJSON 格式流式返回文件处理结果"""
+    output_format = request.form.get('format', 'ndjson')
+    if output_format not in STREAM_OUTPUT_FORMATS:
+        return jsonify({'error': f'不支持的输出格式: {output_format}'}), 400
+    api_logger.info(f"Streaming file result - Tool: {name}, Format: {output_format}, File: {request.files['file'].filename}")
+    return Response(stream_with_context(serialize(batches, fields, output_format)),
+                    mimetype=STREAM_OUTPUT_FORMATS[output_format],
+                    headers={'Content-Disposition': f'attachment; filename={name}.{output_format}'})
+
+@app.route('/api/network/calculate', methods=['GET', 'POST'])
 def calculate_network():
     try:
-        data = request.json
+        data = _request_data()
         ip = data.get('ip')
         mask = data.get('mask')
         
@@ -91,9 +215,11 @@ def calculate_network():
             api_logger.warning(f"Invalid input - IP: {ip}, Mask: {mask}")
             return jsonify({'error': 'IP和掩码不能为空'}), 400
             
-        result = get_network_info(ip, mask)
+        ip, mask = ip.strip(), str(mask).strip().lstrip('/')
+        response = response_cache.respond('calculate', [ip, mask],
+                                          lambda: {'data': get_network_info(ip, mask)})
         api_logger.info(f"Network calculation successful - IP: {ip}, Mask: {mask}")
-        return jsonify({'data': result})
+        return response
     except Exception as e:
         app_logger.error(f"Network calculation failed - IP: {ip}, Mask: {mask}", exc_info=True)
         return jsonify({'error': str(e)}), 400
@@ -101,14 +227,20 @@ def calculate_network():
 @app.route('/api/ip/summary', methods=['POST'])
 def summarize_ips():
     try:
+        lines = _uploaded_lines()
+        if lines is not None:
+            output = request.form.get('output', 'range')
+            return _stream_file_result('summary', iter_summary_rows(lines, output), STREAM_RESULT_FIELDS)
+
         data = request.json
         ip_ranges = data.get('ipRanges', [])
+        output = data.get('output', 'range')
         
         if not ip_ranges:
             api_logger.warning("Empty IP ranges list received")
             return jsonify({'error': 'IP列表不能为空'}), 400
             
-        result = summarize_ip_ranges(ip_ranges)
+        result = summarize_ip_ranges(ip_ranges, output)
         api_logger.info(f"IP summary successful - Input count: {len(ip_ranges)}, Output count: {len(result)}")
         return jsonify({'data': result})
     except Exception as e:
@@ -118,6 +250,11 @@ def summarize_ips():
 @app.route('/api/ip/convert', methods=['POST'])
 def convert_ip():
     try:
+        lines = _uploaded_lines()
+        if lines is not None:
+            batches = iter_convert_rows(lines, request.form.get('direction'), request.form.get('ipv6Prefix', ''))
+            return _stream_file_result('convert', batches, STREAM_RESULT_FIELDS)
+
         data = request.json
         direction = data.get('direction')
         ips = data.get('ips', [])
@@ -145,65 +282,214 @@ def convert_ip():
         app_logger.error("IP conversion failed", exc_info=True)
         return jsonify({'error': str(e)}), 400
 
-@app.route('/api/ip/format', methods=['POST'])
+@app.route('/api/ip/format', methods=['GET', 'POST'])
 def format_ip():
     try:
-        data = request.get_json()
+        lines = _uploaded_lines()
+        if lines is not None:
+            convert_type = request.form.get('type')
+            if convert_type not in IP_FORMAT_CONVERTERS:
+                return jsonify({'error': '不支持的转换类型'}), 400
+            return _stream_file_result('format', iter_format_rows(lines, convert_type), STREAM_RESULT_FIELDS)
+
+        data = _request_data(list_fields=('inputs',))
         convert_type = data.get('type')
         inputs = data.get('inputs', [])
 
         if not inputs:
             return jsonify({'error': '请输入需要转换的内容'}), 400
 
-        # 根据转换类型调用不同的转换函数
-        convert_funcs = {
-            'dec2bin': ip_dec_to_bin,
-            'bin2dec': ip_bin_to_dec,
-            'dec2hex': ip_dec_to_hex,
-            'hex2dec': ip_hex_to_dec,
-            'mask2cidr': mask_to_cidr,
-            'cidr2mask': cidr_to_mask
-        }
-
-        if convert_type not in convert_funcs:
+        if convert_type not in IP_FORMAT_CONVERTERS:
             return jsonify({'error': '不支持的转换类型'}), 400
 
-        # 执行转换
-        results = []
-        for ip in inputs:
-            try:
-                result = convert_funcs[convert_type](ip.strip())
-                results.append(result)
-            except ValueError as e:
-                return jsonify({'error': f'输入格式错误: {str(e)}'}), 400
+        def compute():
+            # 批量转换，单行格式错误不影响其他行
+            results, errors = convert_batch(convert_type, inputs)
+            if errors:
+                app_logger.info(f"IP format finished with errors - Type: {convert_type}, "
+                                f"Input count: {len(inputs)}, Error count: {len(errors)}")
+            return {'data': results, 'errors': errors}
 
-        return jsonify({'data': results})
+        inputs = [text.strip() if isinstance(text, str) else text for text in inputs]
+        return response_cache.respond('format', [convert_type, inputs], compute)
 
     except Exception as e:
         return jsonify({'error': f'转换失败: {str(e)}'}), 500
 
-@app.route('/api/network/divide', methods=['POST'])
-def divide_subnet():
+@app.route('/api/ip/set', methods=['POST'])
+def ip_set_operation():
     try:
         data = request.json
+        op = data.get('op')
+        output = data.get('output', 'range')
+
+        operations = {
+            'union': IPSet.union,
+            'intersection': IPSet.intersection,
+            'difference': IPSet.difference,
+            'symmetric_difference': IPSet.symmetric_difference
+        }
+        if op not in operations:
+            api_logger.warning(f"Invalid IP set operation: {op}")
+            return jsonify({'error': '不支持的集合运算'}), 400
+
+        set_a = IPSet(data.get('a', []))
+        set_b = IPSet(data.get('b', []))
+        result = operations[op](set_a, set_b)
+        api_logger.info(f"IP set {op} successful - A: {len(set_a)} ranges, B: {len(set_b)} ranges, Result: {len(result)} ranges")
+        return jsonify({'data': result.to_list(output), 'stats': result.stats()})
+    except Exception as e:
+        app_logger.error("IP set operation failed", exc_info=True)
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/ip/set/contains', methods=['POST'])
+def ip_set_contains():
+    try:
+        lines = _uploaded_lines()
+        if lines is not None:
+            # 文件上传时，集合以表单字段 set 提交（每行一个）
+            ipset = IPSet(request.form.get('set', '').splitlines())
+            if not ipset:
+                return jsonify({'error': '集合不能为空'}), 400
+            return _stream_file_result('contains', iter_membership_rows(lines, ipset), STREAM_MEMBERSHIP_FIELDS)
+
+        data = request.json
+        ipset = IPSet(data.get('set', []))
+        items = data.get('items', [])
+
+        if not ipset or not items:
+            api_logger.warning("Empty set or item list for IP set membership check")
+            return jsonify({'error': '集合和待检查列表不能为空'}), 400
+
+        results = ipset.check(items)
+        covered = sum(1 for result in results if result['covered'])
+        api_logger.info(f"IP set membership check successful - Set: {len(ipset)} ranges, Items: {len(items)}, Covered: {covered}")
+        return jsonify({'data': results, 'covered': covered})
+    except Exception as e:
+        app_logger.error("IP set membership check failed", exc_info=True)
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/lpm/lookup', methods=['POST'])
+def lpm_lookup():
+    try:
+        table = lpm_service.table()
+        lines = _uploaded_lines()
+        if lines is not None:
+            return _stream_file_result('lpm', iter_lpm_rows(lines, table), STREAM_LPM_FIELDS)
+
+        data = request.json
+        ips = data.get('ips', [])
+
+        if not ips:
+            api_logger.warning("Empty IP list for prefix lookup")
+            return jsonify({'error': 'IP列表不能为空'}), 400
+
+        results = table.lookup_many(ips)
+        api_logger.info(f"Prefix lookup successful - Count: {len(ips)}, Prefixes: {len(table)}")
+        return jsonify({'data': results, 'table': table.stats()})
+    except Exception as e:
+        app_logger.error("Prefix lookup failed", exc_info=True)
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/lpm/table', methods=['GET'])
+def get_lpm_table():
+    return jsonify({'data': lpm_service.table().stats()})
+
+@app.route('/api/lpm/table', methods=['PUT'])
+def replace_lpm_table():
+    try:
+        data = request.json
+        prefixes = data.get('prefixes', [])
+        entries = [(item['prefix'], item.get('label', '')) if isinstance(item, dict) else (item, '')
+                   for item in prefixes]
+        table = lpm_service.replace(entries)
+        return jsonify({'data': table.stats()})
+    except Exception as e:
+        app_logger.error("Prefix table replace failed", exc_info=True)
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/lpm/reload', methods=['POST'])
+def reload_lpm_table():
+    try:
+        return jsonify({'data': lpm_service.reload().stats()})
+    except Exception as e:
+        app_logger.error("Prefix table reload failed", exc_info=True)
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/network/divide', methods=['GET', 'POST'])
+def divide_subnet():
+    try:
+        data = _request_data()
         network = data.get('network')
         divide_type = data.get('divideType')
         value = data.get('value')
         
+        offset = int(data.get('offset') or 0)
+        limit = data.get('limit')
+        limit = int(limit) if limit is not None else None
+        
         if not all([network, divide_type, value]):
             api_logger.warning(f"Incomplete parameters - Network: {network}, Type: {divide_type}, Value: {value}")
             return jsonify({'error': '参数不完整'}), 400
             
-        result = divide_network(network, divide_type, value)
-        api_logger.info(f"Network division successful - Network: {network}, Type: {divide_type}, Value: {value}")
-        return jsonify({'data': result})
+        net, new_prefix, total = plan_division(network, divide_type, value)
+        subnets = iter_divided_subnets(net, new_prefix, total, offset, limit)
+        stream = data.get('stream') in (True, 1, '1', 'true')
+
+        # 非流式响应在内存中生成完整列表，大网段（如IPv6）的子网数可达天文数字，须限制单次返回的数量
+        max_subnets = config.DIVIDE_MAX_SUBNETS
+        if not stream and limit is not None and limit > max_subnets:
+            return jsonify({'error': f'limit 不能超过 {max_subnets}'}), 400
+        if not stream and limit is None and total - max(offset, 0) > max_subnets:
+            api_logger.warning(f"Network division too large - Network: {network}, Type: {divide_type}, Value: {value}, Total: {total}")
+            return jsonify({
+                'error': f'子网数量（{total}）超过单次返回上限 {max_subnets}，请使用 offset/limit 分页或 stream=1 流式输出',
+                'total': total
+            }), 400
+        
+        if stream:
+            # NDJSON 流式输出，逐行返回子网，内存占用恒定
+            api_logger.info(f"Network division streaming - Network: {network}, Type: {divide_type}, Value: {value}, Total: {total}")
+            rows = (json.dumps(subnet, ensure_ascii=False) + '\n' for subnet in subnets)
+            return Response(stream_with_context(rows), mimetype='application/x-ndjson',
+                            headers={'X-Total-Count': str(total)})
+            
+        # 缓存键使用规范化后的划分方案，写法不同但结果相同的请求共用缓存
+        params = [str(net), new_prefix, total, offset, limit]
+        response = response_cache.respond('divide', params,
+                                          lambda: {'data': list(subnets), 'total': total, 'offset': offset})
+        api_logger.info(f"Network division successful - Network: {network}, Type: {divide_type}, Value: {value}, Total: {total}")
+        return response
     except Exception as e:
         app_logger.error(f"Network division failed - Network: {network}", exc_info=True)
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/network/vlsm', methods=['POST'])
+def vlsm_subnet():
+    try:
+        data = request.json
+        network = data.get('network')
+        requirements = data.get('requirements', [])
+
+        if not network or not requirements:
+            api_logger.warning(f"Incomplete VLSM parameters - Network: {network}, Requirements: {len(requirements)}")
+            return jsonify({'error': '参数不完整'}), 400
+
+        allocations, free, unallocated = allocate_vlsm(network, requirements)
+        api_logger.info(f"VLSM allocation successful - Network: {network}, Allocated: {len(allocations)}, "
+                        f"Unallocated: {len(unallocated)}, Free blocks: {len(free)}")
+        return jsonify({'data': allocations, 'free': free, 'unallocated': unallocated})
+    except Exception as e:
+        app_logger.error(f"VLSM allocation failed - Network: {network}", exc_info=True)
+        return jsonify({'error': str(e)}), 400
+
 @app.route('/api/ip/location', methods=['POST'])
 def get_ip_location():
     try:
+        lines = _uploaded_lines()
+        if lines is not None:
+            return _stream_file_result('location', iter_location_rows(lines), STREAM_LOCATION_FIELDS)
+
         data = request.json
         ips = data.get('ips', [])
         
@@ -211,10 +497,7 @@ def get_ip_location():
             api_logger.warning("Empty IP list for location query")
             return jsonify({'error': 'IP列表不能为空'}), 400
             
-        results = []
-        for ip in ips:
-            result = query_ip_location(ip.strip())
-            results.append(result)
+        results = query_ip_locations(ips)
             
         api_logger.info(f"IP location query successful - Count: {len(ips)}")
         return jsonify({'data': results})
@@ -222,6 +505,19 @@ def get_ip_location():
         app_logger.error("IP location query failed", exc_info=True)
         return jsonify({'error': str(e)}), 400
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus 文本格式的指标"""
+    return Response(REGISTRY.expose(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/network/cache-stats', methods=['GET'])
+def get_compute_cache_stats():
+    return jsonify({'data': response_cache.stats()})
+
+@app.route('/api/ip/location/cache-stats', methods=['GET'])
+def get_ip_location_cache_stats():
+    return jsonify({'data': get_location_cache_stats(), 'rate_limit': get_rate_limit_stats()})
+
 @app.route('/api/dns/query', methods=['POST'])
 def query_dns():
     try:
@@ -244,6 +540,39 @@ def query_dns():
         app_logger.error(f"DNS query failed - Domain: {domain}", exc_info=True)
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/dns/bulk', methods=['POST'])
+def bulk_query_dns():
+    try:
+        data = request.json
+        domains = [domain.strip() for domain in data.get('domains', []) if domain.strip()]
+        record_types = data.get('types', [])
+        
+        if not domains:
+            api_logger.warning("Empty domain list for bulk DNS query")
+            return jsonify({'error': '域名列表不能为空'}), 400
+            
+        if not record_types:
+            api_logger.warning("No record types specified for bulk DNS query")
+            return jsonify({'error': '记录类型不能为空'}), 400
+            
+        if len(domains) > config.DNS_BULK_MAX_DOMAINS:
+            api_logger.warning(f"Too many domains for bulk DNS query - Count: {len(domains)}")
+            return jsonify({'error': f'单次最多查询 {config.DNS_BULK_MAX_DOMAINS} 个域名'}), 400
+            
+        # NDJSON 流式输出，每个域名查询完成即返回一行
+        api_logger.info(f"Bulk DNS query streaming - Domains: {len(domains)}, Types: {record_types}")
+        rows = (json.dumps(row, ensure_ascii=False) + '\n'
+                for row in iter_bulk_dns_records(domains, record_types))
+        return Response(stream_with_context(rows), mimetype='application/x-ndjson',
+                        headers={'X-Total-Count': str(len(set(domains)))})
+    except Exception as e:
+        app_logger.error("Bulk DNS query failed", exc_info=True)
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/dns/cache-stats', methods=['GET'])
+def get_dns_query_cache_stats():
+    return jsonify({'data': get_dns_cache_stats()})
+
 @app.route('/api/ip/current-location', methods=['GET'])
 def get_current_ip_location():
     try:
@@ -258,106 +587,232 @@ def get_current_ip_location():
         app_logger.error(f"Current IP location query failed - IP: {client_ip}", exc_info=True)
         return jsonify({'error': str(e)}), 400
 
+def _upload_info(upload):
+    """补充转换结果缓存键"""
+    upload['cache_key'] = doc_converter.cache_key(upload['kind'], upload['sha256'])
+    return upload
+
+def _save_upload():
+    """
+    校验并保存上传的文档：分块写入磁盘并计算内容哈希，首块校验文件头，超出大小限制立即拒绝
+    :return: (上传信息, None)，校验失败时返回 (None, 错误响应)
+             上传信息包含 path、filename、kind、sha256、size 和 cache_key
+    """
+    try:
+        if 'file' not in request.files:
+            app_logger.warning("No file uploaded")
+            return None, (jsonify({'error': '没有上传文件'}), 400)
+    except RequestEntityTooLarge:
+        app_logger.warning(f"Upload too large - Content-Length: {request.content_length}")
+        return None, (jsonify({'error': f'文件大小超过限制（{config.DOC_UPLOAD_MAX_MB}MB）'}), 413)
+        
+    file = request.files['file']
+    if file.filename == '':
+        app_logger.warning("No file selected")
+        return None, (jsonify({'error': '未选择文件'}), 400)
+        
+    # 记录详细的文件信息
+    app_logger.info(f"Processing file conversion request - "
+                  f"Original filename: {file.filename}, "
+                  f"MIME: {file.mimetype}")
+    
+    try:
+        upload = upload_manager.save(file.stream, file.filename)
+    except UploadError as e:
+        app_logger.warning(f"Invalid upload - File: {file.filename}, Error: {str(e)}")
+        return None, (jsonify({'error': str(e)}), e.status)
+        
+    app_logger.info(f"File saved successfully - Path: {upload['path']}, "
+                  f"Size: {upload['size']/1024:.2f}KB, SHA256: {upload['sha256']}")
+    return _upload_info(upload), None
+
+def _send_converted_file(result):
+    """以附件形式返回转换结果"""
+    # 对文件名进行 URL 编码
+    encoded_filename = quote(result['output_filename'])
+    
+    response = send_file(
+        result['output_file'],
+        as_attachment=True,
+        download_name=result['output_filename']
+    )
+    
+    # 使用 RFC 5987 编码格式设置 Content-Disposition
+    response.headers['Content-Disposition'] = \
+        f"attachment; filename=\"{encoded_filename}\"; filename*=UTF-8''{encoded_filename}"
+    return response
+
 @app.route('/api/doc/convert', methods=['POST'])
 def convert_document():
     """文档转换接口"""
     try:
-        if 'file' not in request.files:
-            app_logger.warning("No file uploaded")
-            return jsonify({'error': '没有上传文件'}), 400
-            
-        file = request.files['file']
-        if file.filename == '':
-            app_logger.warning("No file selected")
-            return jsonify({'error': '未选择文件'}), 400
-            
-        if file:
-            # 处理中文文件名
-            filename = file.filename
-            # 仅对文件名中的特殊字符进行安全处理，保留中文
-            safe_filename = "".join([c for c in filename if c.isalnum() or c.isspace() or c in '._-()[]{}中文韩文日文'])
-            file_ext = os.path.splitext(filename)[1].lower()
-            
-            # 记录详细的文件信息
-            app_logger.info(f"Processing file conversion request - "
-                          f"Original filename: {filename}, "
-                          f"Safe filename: {safe_filename}, "
-                          f"Extension: {file_ext}, "
-                          f"MIME: {file.mimetype}, "
-                          f"Size: {file.content_length/1024:.2f}KB")
-            
-            # 验证文件类型
-            valid_pdf = (file_ext == '.pdf' and 
-                        (file.mimetype == 'application/pdf' or 
-                         file.mimetype == 'application/octet-stream'))
-            
-            valid_docx = (file_ext == '.docx' and 
-                         (file.mimetype == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document' or
-                          file.mimetype == 'application/msword' or
-                          file.mimetype == 'application/octet-stream'))
+        upload, error_response = _save_upload()
+        if error_response:
+            return error_response
+        file_path, safe_filename, kind = upload['path'], upload['filename'], upload['kind']
+        
+        # 相同内容、相同参数的文件已转换过，直接返回缓存的结果
+        cached_file = conversion_store.get(upload['cache_key']) if conversion_store else None
+        if cached_file:
+            doc_converter._cleanup_files(file_path)
+            app_logger.info(f"Conversion served from cache - Input: {safe_filename}")
+            return _send_converted_file({
+                'output_file': cached_file,
+                'output_filename': doc_converter.output_filename(kind, safe_filename)
+            })
             
-            if not (valid_pdf or valid_docx):
-                app_logger.warning(f"Invalid file type - MIME: {file.mimetype}, Extension: {file_ext}")
-                return jsonify({'error': '不支持的文件格式，仅支持PDF和DOCX文件'}), 400
+        try:
+            conversion_type = "PDF to DOCX" if kind == 'pdf2docx' else "DOCX to PDF"
+            app_logger.info(f"Starting {conversion_type} conversion for file: {safe_filename}")
             
-            # 保存文件
-            file_path = os.path.join(doc_converter.upload_folder, safe_filename)
-            file.save(file_path)
-            app_logger.info(f"File saved successfully - Path: {file_path}")
+            result = doc_converter.pdf_to_docx(file_path, safe_filename) if kind == 'pdf2docx' else \
+                     doc_converter.docx_to_pdf(file_path, safe_filename)
             
-            try:
-                conversion_type = "PDF to DOCX" if valid_pdf else "DOCX to PDF"
-                app_logger.info(f"Starting {conversion_type} conversion for file: {safe_filename}")
+            if result['status'] == 'success':
+                app_logger.info(f"Conversion successful - "
+                              f"Input: {safe_filename}, "
+                              f"Output: {result['output_filename']}, "
+                              f"Size: {os.path.getsize(result['output_file'])/1024:.2f}KB")
                 
-                result = doc_converter.pdf_to_docx(file_path, safe_filename) if valid_pdf else \
-                         doc_converter.docx_to_pdf(file_path, safe_filename)
+                if conversion_store:
+                    conversion_store.put(upload['cache_key'], result['output_file'])
+                response = _send_converted_file(result)
                 
-                if result['status'] == 'success':
-                    app_logger.info(f"Conversion successful - "
-                                  f"Input: {safe_filename}, "
-                                  f"Output: {result['output_filename']}, "
-                                  f"Size: {os.path.getsize(result['output_file'])/1024:.2f}KB")
-                    
-                    # 对文件名进行 URL 编码
-                    encoded_filename = quote(result['output_filename'])
-                    
-                    response = send_file(
-                        result['output_file'],
-                        as_attachment=True,
-                        download_name=result['output_filename']
-                    )
-                    
-                    # 使用 RFC 5987 编码格式设置 Content-Disposition
-                    response.headers['Content-Disposition'] = \
-                        f"attachment; filename=\"{encoded_filename}\"; filename*=UTF-8''{encoded_filename}"
-                    
-                    # 在发送文件后尝试清理
-                    @response.call_on_close
-                    def cleanup():
-                        try:
-                            time.sleep(1)  # 等待文件处理完成
-                            if 'source_file' in result:
-                                doc_converter._cleanup_files(result['source_file'])
-                                app_logger.info(f"Cleanup completed for source file: {result['source_file']}")
-                        except Exception as e:
-                            app_logger.warning(f"Cleanup error: {str(e)}", exc_info=True)
-                    
-                    return response
-                else:
-                    app_logger.error(f"Conversion failed - Error: {result['message']}")
-                    return jsonify({'error': result['message']}), 500
-                    
-            except Exception as e:
-                app_logger.error(f"Conversion error - File: {safe_filename}, Error: {str(e)}", exc_info=True)
-                doc_converter._cleanup_files(file_path)
-                raise e
+                # 在发送文件后尝试清理
+                @response.call_on_close
+                def cleanup():
+                    try:
+                        time.sleep(1)  # 等待文件处理完成
+                        if 'source_file' in result:
+                            doc_converter._cleanup_files(result['source_file'])
+                            app_logger.info(f"Cleanup completed for source file: {result['source_file']}")
+                    except Exception as e:
+                        app_logger.warning(f"Cleanup error: {str(e)}", exc_info=True)
+                
+                return response
+            else:
+                app_logger.error(f"Conversion failed - Error: {result['message']}")
+                return jsonify({'error': result['message']}), 500
+                
+        except Exception as e:
+            app_logger.error(f"Conversion error - File: {safe_filename}, Error: {str(e)}", exc_info=True)
+            doc_converter._cleanup_files(file_path)
+            raise e
                 
     except Exception as e:
         app_logger.error(f"Document conversion failed - Error: {str(e)}", exc_info=True)
         return jsonify({'error': f'文件转换失败: {str(e)}'}), 500
 
+@app.route('/api/doc/jobs', methods=['POST'])
+def submit_conversion_job():
+    """提交异步转换任务，立即返回任务ID"""
+    try:
+        data = request.get_json(silent=True)
+        if data and data.get('uploadId'):
+            # 分块上传完成后提交
+            try:
+                upload = _upload_info(upload_manager.complete(data['uploadId']))
+            except UploadError as e:
+                return jsonify({'error': str(e)}), e.status
+        else:
+            upload, error_response = _save_upload()
+            if error_response:
+                return error_response
+            
+        try:
+            job = job_manager.submit(upload['kind'], upload['path'], upload['filename'], upload['cache_key'])
+        except JobQueueFull as e:
+            doc_converter._cleanup_files(upload['path'])
+            app_logger.warning(f"Conversion job rejected - File: {upload['filename']}, Error: {str(e)}")
+            return jsonify({'error': str(e)}), 503
+            
+        return jsonify({'data': job}), 202
+    except Exception as e:
+        app_logger.error(f"Conversion job submission failed - Error: {str(e)}", exc_info=True)
+        return jsonify({'error': f'提交转换任务失败: {str(e)}'}), 500
+
+@app.route('/api/doc/jobs/<job_id>', methods=['GET'])
+def get_conversion_job(job_id):
+    job = job_manager.status(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在或已过期'}), 404
+    return jsonify({'data': job})
+
+@app.route('/api/doc/jobs/<job_id>', methods=['DELETE'])
+def cancel_conversion_job(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在或已过期'}), 404
+    return jsonify({'data': job})
+
+@app.route('/api/doc/jobs/<job_id>/download', methods=['GET'])
+def download_conversion_job(job_id):
+    result = job_manager.result(job_id)
+    if result is None:
+        job = job_manager.status(job_id)
+        if job is None:
+            return jsonify({'error': '任务不存在或已过期'}), 404
+        return jsonify({'error': '转换尚未完成', 'data': job}), 409
+    if not os.path.exists(result['output_file']):
+        return jsonify({'error': '转换结果已被清理，请重新转换'}), 410
+    return _send_converted_file(result)
+
+@app.route('/api/doc/uploads', methods=['POST'])
+def create_upload():
+    """创建分块上传会话，请求体为 {"filename": ..., "size": ...}"""
+    try:
+        data = request.json
+        filename = data.get('filename')
+        size = data.get('size')
+        
+        if not filename or not size:
+            return jsonify({'error': '文件名和文件大小不能为空'}), 400
+            
+        return jsonify({'data': upload_manager.create(filename, size)}), 201
+    except UploadError as e:
+        app_logger.warning(f"Chunked upload rejected - Error: {str(e)}")
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        app_logger.error(f"Chunked upload creation failed - Error: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/doc/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    try:
+        return jsonify({'data': upload_manager.status(upload_id)})
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+
+@app.route('/api/doc/uploads/<upload_id>', methods=['PUT'])
+def append_upload(upload_id):
+    """上传一个分块：请求体为原始字节，查询参数 offset 为该分块在文件中的起始位置"""
+    try:
+        offset = int(request.args.get('offset', 0))
+        status = upload_manager.append(upload_id, request.stream, offset, request.content_length)
+        return jsonify({'data': status})
+    except UploadError as e:
+        app_logger.warning(f"Chunk rejected - Upload: {upload_id}, Error: {str(e)}")
+        return jsonify({'error': str(e)}), e.status
+    except RequestEntityTooLarge:
+        return jsonify({'error': f'分块大小超过限制（{config.DOC_UPLOAD_MAX_MB}MB）'}), 413
+    except Exception as e:
+        app_logger.error(f"Chunk upload failed - Upload: {upload_id}, Error: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/doc/uploads/<upload_id>', methods=['DELETE'])
+def abort_upload(upload_id):
+    try:
+        upload_manager.abort(upload_id)
+        return jsonify({'data': {'upload_id': upload_id}})
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+
+@app.route('/api/doc/cache-stats', methods=['GET'])
+def get_conversion_cache_stats():
+    return jsonify({'data': conversion_store.stats() if conversion_store else None})
+
 def cleanup_temp_files():
-    """清理临时文件"""
+    """清空临时目录，只在服务停止时执行"""
     try:
         shutil.rmtree(doc_converter.upload_folder)
         shutil.rmtree(doc_converter.output_folder)
@@ -367,20 +822,60 @@ def cleanup_temp_files():
     except Exception as e:
         app_logger.error(f"Failed to cleanup temporary files: {str(e)}")
 
+def cleanup_expired_temp_files():
+    """
+    定时清理：只删除超过保留时间的临时文件
+    保留时间不短于任务结果和上传会话的有效期，不会删除进行中的上传及其他进程尚未过期的任务文件
+    """
+    max_age = max(config.DOC_JOB_TTL, config.DOC_UPLOAD_TTL, 24 * 3600)
+    doc_converter.cleanup_old_files(max_age_hours=max_age / 3600)
+
 def run_schedule():
     while True:
         schedule.run_pending()
         time.sleep(1)
 
-# 设置定时清理任务
-schedule.every().day.at("00:00").do(cleanup_temp_files)
-scheduler_thread = threading.Thread(target=run_schedule)
-scheduler_thread.daemon = True
-scheduler_thread.start()
+# 同一主机上的多个工作进程中只由一个执行主机级的定时任务
+background_lock = HostLock(config.BACKGROUND_LOCK_PATH)
+_background_started = False
+
+def start_background_tasks(cleanup_on_exit=True):
+    """
+    启动当前进程的后台任务，每个进程只启动一次
+    转换任务和上传会话由同一主机的所有进程共享，每个进程都参与清理（需处理本进程提交、被其他进程取消的任务）；
+    清理过期临时文件会影响同一主机上的所有进程，只由持有 background_lock 的进程执行
+    :param cleanup_on_exit: 进程退出时是否清理临时目录；多进程部署时由服务主进程在停止时清理，
+                            避免单个工作进程重启时删除其他进程正在使用的文件
+    """
+    global _background_started
+    if _background_started:
+        return
+    _background_started = True
+
+    # 设置定时清理任务
+    schedule.every().hour.do(background_lock.elected(cleanup_expired_temp_files))
+    schedule.every(1).minutes.do(job_manager.purge_expired)
+    schedule.every(1).minutes.do(upload_manager.purge_expired)
+    scheduler_thread = threading.Thread(target=run_schedule)
+    scheduler_thread.daemon = True
+    scheduler_thread.start()
+
+    # 程序退出时清理
+    if cleanup_on_exit:
+        atexit.register(cleanup_temp_files)
+    atexit.register(job_manager.shutdown)
+    atexit.register(pdf_scheduler.shutdown)
+
+    # 预先启动DOCX转换进程
+    if docx_pool is not None:
+        docx_pool.start()
+        atexit.register(docx_pool.shutdown)
 
-# 程序退出时清理
-atexit.register(cleanup_temp_files)
+# 转换进程以 spawn 方式启动时会以 __mp_main__ 重新导入本模块，不能在其中启动定时任务和退出清理；
+# 由 serve.py 启动时，各工作进程在 fork 之后自行调用 start_background_tasks
+if __name__ != '__mp_main__' and not os.environ.get('APP_SERVER_MANAGED'):
+    start_background_tasks()
 
 if __name__ == '__main__':
     app_logger.info("Application starting...")
-    app.run(debug=True) 
\ No newline at end of file
+    app.run(debug=True)
@@ -0,0 +1,85 @@
+"""基准测试的计时、统计、结果保存与基准比较"""
+import json
+import time
+
+# 基准比较的指标：名称 -> 数值越大越差时为 True
+COMPARED_METRICS = {'p50_ms': True, 'throughput': False}
+
+def percentile(sorted_values, q):
+    """已排序样本的分位数（线性插值），q 取 0~100"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def summarize(samples, wall=None):
+    """
+    :param samples: 每次调用的耗时（秒）
+    :param wall: 总耗时（秒），并发场景下据此计算吞吐量，否则按样本耗时之和计算
+    """
+    values = sorted(samples)
+    total = wall if wall is not None else sum(values)
+    return {
+        'count': len(values),
+        'p50_ms': percentile(values, 50) * 1000,
+        'p99_ms': percentile(values, 99) * 1000,
+        'mean_ms': sum(values) / len(values) * 1000 if values else 0.0,
+        'throughput': len(values) / total if total > 0 else 0.0
+    }
+
+def measure(fn, min_time=0.3, max_calls=100000, warmup=1):
+    """反复调用 fn 直到累计耗时超过 min_time 秒（至少调用一次），返回统计结果"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < max_calls:
+        started = time.perf_counter()
+        fn()
+        finished = time.perf_counter()
+        samples.append(finished - started)
+        if finished >= deadline:
+            break
+    return summarize(samples)
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_results(path, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+def compare(results, baseline, threshold):
+    """
+    与基准结果比较，只比较两边都有的用例
+    :param threshold: 允许的相对退化比例，如 0.25 表示 p50 增加或吞吐量下降超过 25% 视为退化
+    :return: 退化列表，每项为 (用例, 指标, 基准值, 当前值, 变化比例)
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric, higher_is_worse in COMPARED_METRICS.items():
+            if not base.get(metric) or metric not in current:
+                continue
+            change = current[metric] / base[metric] - 1
+            if (change if higher_is_worse else -change) > threshold:
+                regressions.append((name, metric, base[metric], current[metric], change))
+    return regressions
+
+def print_results(results, baseline=None):
+    header = f"{'用例':<44}{'次数':>8}{'p50(ms)':>12}{'p99(ms)':>12}{'吞吐(次/秒)':>14}"
+    if baseline:
+        header += f"{'p50变化':>10}"
+    print(header)
+    for name, result in results.items():
+        line = (f"{name:<44}{result['count']:>8}{result['p50_ms']:>12.3f}{result['p99_ms']:>12.3f}"
+                f"{result['throughput']:>14.1f}")
+        base = (baseline or {}).get(name)
+        if base and base.get('p50_ms'):
+            line += f"{(result['p50_ms'] / base['p50_ms'] - 1) * 100:>+9.1f}%"
+        print(line)
@@ -0,0 +1,177 @@
+"""
+接口级压测：多个线程通过 Flask 测试客户端并发调用接口，统计吞吐量和 p50/p99
+归属地和DNS上游指向本地桩服务；每个请求使用不同的输入，测量的是缓存未命中时的完整处理路径
+"""
+import os
+import io
+import random
+import logging
+import itertools
+import threading
+import time
+
+def configure(ip_api_url, dns_port):
+    """设置压测环境，须在导入 config 及应用之前调用"""
+    os.environ.update({
+        'IP_API_BASE_URL': ip_api_url,
+        # 桩服务不限流
+        'IP_API_RATE_LIMIT': '1000000',
+        'IP_API_BATCH_RATE_LIMIT': '1000000',
+        'IP_API_BURST': '1000000',
+        'GEO_CACHE_DB': '',
+        'DNS_NAMESERVERS': '127.0.0.1',
+        'DNS_PORT': str(dns_port),
+        'DOC_CACHE_MAX_MB': '0',
+        'DOCX_WORKERS': '0',
+        'LOG_CONSOLE': '0',
+        # 不启动定时任务，也不在退出时清理临时目录
+        'APP_SERVER_MANAGED': '1'
+    })
+
+# 每次运行使用不同的起点，同一进程内多次运行也不会命中缓存
+_counter = itertools.count(random.randrange(1 << 20))
+
+def _unique():
+    return next(_counter)
+
+def _public_ip(index):
+    return f"44.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}"
+
+def _ranges(count, seed):
+    rng = random.Random(seed)
+    return [f"10.{rng.randrange(256)}.{rng.randrange(256)}.0/{rng.choice((24, 26, 28))}" for _ in range(count)]
+
+def _sample_pdf(pages=3):
+    """生成用于转换压测的PDF"""
+    from utils.doc_tools import load_converter
+    fitz = load_converter('pymupdf')
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Benchmark page {number + 1}", fontsize=18)
+        for line in range(30):
+            page.insert_text((72, 110 + line * 20), f"Line {line + 1}: network 10.{number}.{line}.0/24 " * 2,
+                             fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+def scenarios(include_doc=False):
+    """
+    :return: {场景名: (并发数, 请求数, 单次请求函数)}，请求函数参数为测试客户端，返回响应
+    """
+    ranges = _ranges(1000, 1)
+    ips = [f"10.0.{index // 256}.{index % 256}" for index in range(1000)]
+
+    def calculate_cached(client):
+        return client.get('/api/network/calculate?ip=192.168.1.10&mask=24')
+
+    def calculate(client):
+        index = _unique()
+        return client.post('/api/network/calculate', json={
+            'ip': f"10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}", 'mask': str(8 + index % 23)})
+
+    def summary(client):
+        return client.post('/api/ip/summary', json={'ipRanges': ranges, 'output': 'cidr'})
+
+    def ip_format(client):
+        return client.post('/api/ip/format', json={'type': 'dec2bin', 'inputs': ips})
+
+    def divide_page(client):
+        return client.get(f'/api/network/divide?network=10.0.0.0/8&divideType=hosts&value=254'
+                          f'&offset={_unique() % 65000}&limit=100')
+
+    def location_single(client):
+        return client.post('/api/ip/location', json={'ips': [_public_ip(_unique())]})
+
+    def location_batch(client):
+        return client.post('/api/ip/location', json={'ips': [_public_ip(_unique()) for _ in range(100)]})
+
+    def dns_query(client):
+        return client.post('/api/dns/query', json={'domain': f"h{_unique()}.bench.test", 'types': ['A']})
+
+    result = {
+        'calculate/cached': (8, 2000, calculate_cached),
+        'calculate': (8, 2000, calculate),
+        'summary[1000]': (4, 200, summary),
+        'format/dec2bin[1000]': (4, 200, ip_format),
+        'divide/page[/8]': (8, 1000, divide_page),
+        'location/single': (16, 500, location_single),
+        'location/batch[100]': (4, 100, location_batch),
+        'dns/query': (16, 500, dns_query)
+    }
+
+    if include_doc:
+        pdf = _sample_pdf()
+
+        def pdf_to_docx(client):
+            # 末尾追加注释使每次内容不同，避免命中转换结果缓存
+            data = pdf + f"\n%{_unique()}\n".encode()
+            response = client.post('/api/doc/convert', data={'file': (io.BytesIO(data), 'bench.pdf')},
+                                   content_type='multipart/form-data')
+            response.close()
+            return response
+
+        result['doc/pdf2docx[3 pages]'] = (2, 10, pdf_to_docx)
+    return result
+
+def run_scenario(app, request, concurrency, total):
+    """并发执行 total 次请求，返回统计结果及失败数"""
+    from benchmarks.common import summarize
+
+    samples, errors = [], []
+    remaining = itertools.count()
+    lock = threading.Lock()
+
+    def worker():
+        client = app.test_client()
+        local_samples, local_errors = [], 0
+        while next(remaining) < total:
+            started = time.perf_counter()
+            response = request(client)
+            local_samples.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                local_errors += 1
+        with lock:
+            samples.extend(local_samples)
+            errors.append(local_errors)
+
+    # 预热：建立连接、填充惰性初始化的资源
+    request(app.test_client())
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result = summarize(samples, wall=time.perf_counter() - started)
+    result['concurrency'] = concurrency
+    result['errors'] = sum(errors)
+    return result
+
+def run(name_filter=None, include_doc=False, scale=1.0):
+    """
+    :param scale: 请求数的缩放比例
+    """
+    from app import app, doc_converter
+    # 逐条查询的调试日志及 pdf2docx 写入根日志器的进度日志不计入压测
+    logging.getLogger('utils.dns_tools').setLevel(logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    folders = [doc_converter.upload_folder, doc_converter.output_folder]
+    files_before = {folder: set(os.listdir(folder)) for folder in folders}
+    results = {}
+    try:
+        for name, (concurrency, total, request) in scenarios(include_doc).items():
+            if name_filter and name_filter not in name:
+                continue
+            results[f'load/{name}'] = run_scenario(app, request, concurrency, max(int(total * scale), concurrency))
+    finally:
+        # 删除转换压测上传和生成的文件
+        for folder in folders:
+            for filename in set(os.listdir(folder)) - files_before[folder]:
+                try:
+                    os.remove(os.path.join(folder, filename))
+                except OSError:
+                    pass
+    return results
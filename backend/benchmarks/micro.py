@@ -0,0 +1,179 @@
+"""
+ip_tools 及相关计算模块的微基准，输入规模从单个地址到 /8 网段
+归属地查询的在线路径访问本地 ip-api 桩服务，须先由 run.py 启动桩服务并设置配置后再导入本模块
+"""
+import os
+import random
+import shutil
+import tempfile
+import itertools
+from collections import deque
+import config
+from utils import ip_tools
+from utils.ip_stream import iter_summary_rows
+from utils.ip_batch import convert_batch
+from utils.ipset import IPSet
+from utils.lpm import PrefixTable
+from utils.vlsm import allocate_vlsm
+
+# 列表输入的规模
+SIZES = (1, 100, 10000)
+# 网段规模：单个地址到 /8
+NETWORKS = ('10.1.2.3/32', '10.1.2.0/24', '10.1.0.0/16', '10.0.0.0/8')
+
+def _ipv4_list(count, seed=0):
+    rng = random.Random(seed)
+    return [f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}" for _ in range(count)]
+
+def _ipv4_ranges(count, seed=0):
+    """地址、网段、地址范围混合的输入"""
+    rng = random.Random(seed)
+    items = []
+    for index, ip in enumerate(_ipv4_list(count, seed)):
+        if index % 3 == 1:
+            items.append(f"{ip.rsplit('.', 1)[0]}.0/{rng.choice((24, 26, 28))}")
+        elif index % 3 == 2:
+            items.append(f"{ip}-{ip.rsplit('.', 1)[0]}.255")
+        else:
+            items.append(ip)
+    return items
+
+def _write_geo_csv(path, ranges, seed=0):
+    """生成离线归属地数据：从 1.0.0.0 起连续排列、长度随机的区间，返回覆盖的最大地址"""
+    rng = random.Random(seed)
+    start = 1 << 24
+    with open(path, 'w', encoding='utf-8') as f:
+        for index in range(ranges):
+            end = start + rng.randrange(256, 4096)
+            f.write(f"{start},{end},国家{index % 200},地区{index % 50},城市{index % 1000},运营商{index % 30}\n")
+            start = end + 1 + rng.randrange(0, 1024)
+    return start
+
+def _use_geo_index(folder, ranges=100000):
+    """将离线索引指向临时目录中生成的数据，首次离线查询时构建索引"""
+    csv_path = os.path.join(folder, 'geoip.csv')
+    last = _write_geo_csv(csv_path, ranges)
+    config.GEO_CSV_PATH = csv_path
+    config.GEO_INDEX_PATH = os.path.join(folder, 'geoip.idx')
+    return last
+
+def _offline(fn):
+    """以离线后端执行 fn"""
+    def call():
+        backend, config.GEO_BACKEND = config.GEO_BACKEND, 'offline'
+        try:
+            return fn()
+        finally:
+            config.GEO_BACKEND = backend
+    return call
+
+# 在线查询每次使用未缓存过的公网地址
+_public_ips = (f"44.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}"
+               for index in itertools.count(random.randrange(1 << 20)))
+
+def _fresh_ips(count):
+    return [next(_public_ips) for _ in range(count)]
+
+def _int_to_ip(value):
+    return f"{value >> 24}.{(value >> 16) & 255}.{(value >> 8) & 255}.{value & 255}"
+
+def _case_inputs(count):
+    ips = _ipv4_list(count)
+    return {
+        'ips': ips,
+        'ranges': _ipv4_ranges(count),
+        'mapped': ['::ffff:' + ip for ip in ips],
+        'binary': [ip_tools.ip_dec_to_bin(ip) for ip in ips],
+        'hex': [ip_tools.ip_dec_to_hex(ip) for ip in ips],
+        'masks': [ip_tools.cidr_to_mask(str(index % 33)) for index in range(count)]
+    }
+
+def cases(geo_folder):
+    """
+    :param geo_folder: 存放离线归属地数据的临时目录
+    :return: [(用例名, 无参调用)]
+    """
+    result = []
+    geo_last = _use_geo_index(geo_folder)
+    geo_rng = random.Random(1)
+
+    def add(name, fn):
+        result.append((name, fn))
+
+    # 单个地址
+    add('get_network_info', lambda: ip_tools.get_network_info('192.168.1.10', '24'))
+    add('parse_ip_interval', lambda: ip_tools.parse_ip_interval('10.0.0.0/8'))
+    add('validate_ip_decimal', lambda: ip_tools.validate_ip_decimal('192.168.1.10'))
+    add('ip_dec_to_bin', lambda: ip_tools.ip_dec_to_bin('192.168.1.10'))
+    add('ip_bin_to_dec', lambda: ip_tools.ip_bin_to_dec('11000000.10101000.00000001.00001010'))
+    add('ip_dec_to_hex', lambda: ip_tools.ip_dec_to_hex('192.168.1.10'))
+    add('ip_hex_to_dec', lambda: ip_tools.ip_hex_to_dec('C0.A8.01.0A'))
+    add('mask_to_cidr', lambda: ip_tools.mask_to_cidr('255.255.240.0'))
+    add('cidr_to_mask', lambda: ip_tools.cidr_to_mask('20'))
+
+    # 归属地查询：缓存命中、在线（访问桩服务）、离线索引
+    add('query_ip_location/cached', lambda: ip_tools.query_ip_location('44.0.0.1'))
+    add('query_ip_location/online', lambda: ip_tools.query_ip_location(_fresh_ips(1)[0]))
+    add('query_ip_location/offline', _offline(lambda: ip_tools.query_ip_location('8.8.8.8')))
+    add('query_ip_locations/online[100]', lambda: ip_tools.query_ip_locations(_fresh_ips(100)))
+
+    # 列表输入
+    for size in SIZES:
+        data = _case_inputs(size)
+        intervals = [ip_tools.parse_ip_interval(item) for item in data['ranges']]
+        add(f'summarize_ip_ranges[{size}]', lambda d=data: ip_tools.summarize_ip_ranges(d['ranges']))
+        add(f'summarize_ip_ranges/cidr[{size}]', lambda d=data: ip_tools.summarize_ip_ranges(d['ranges'], 'cidr'))
+        add(f'merge_ip_intervals[{size}]', lambda i=intervals: ip_tools.merge_ip_intervals(i))
+        add(f'convert_ip_v4_to_v6[{size}]', lambda d=data: ip_tools.convert_ip_v4_to_v6(d['ips'], '2001:db8::'))
+        add(f'convert_ip_v6_to_v4[{size}]', lambda d=data: ip_tools.convert_ip_v6_to_v4(d['mapped']))
+        add(f'convert_batch/dec2bin[{size}]', lambda d=data: convert_batch('dec2bin', d['ips']))
+        add(f'convert_batch/bin2dec[{size}]', lambda d=data: convert_batch('bin2dec', d['binary']))
+        add(f'convert_batch/hex2dec[{size}]', lambda d=data: convert_batch('hex2dec', d['hex']))
+        add(f'convert_batch/mask2cidr[{size}]', lambda d=data: convert_batch('mask2cidr', d['masks']))
+        ipset = IPSet(data['ranges'])
+        add(f'IPSet[{size}]', lambda d=data: IPSet(d['ranges']))
+        add(f'IPSet.check[{size}]', lambda s=ipset, d=data: s.check(d['ips']))
+        table = PrefixTable((item, 'label') for item in data['ranges'] if '-' not in item)
+        add(f'PrefixTable.lookup_many[{size}]', lambda t=table, d=data: t.lookup_many(d['ips']))
+        add(f'query_ip_locations/cached[{size}]', lambda d=data: ip_tools.query_ip_locations(d['ips']))
+        geo_ips = [_int_to_ip(geo_rng.randrange(1 << 24, geo_last)) for _ in range(size)]
+        add(f'query_ip_locations/offline[{size}]',
+            _offline(lambda ips=geo_ips: ip_tools.query_ip_locations(ips)))
+
+    # 文件流式汇总：互不相邻的地址，合并后的区间数随行数增长
+    stream_lines = [(line_no, _int_to_ip((10 << 24) + line_no * 2)) for line_no in range(100000)]
+    add('iter_summary_rows[100000]', lambda: deque(iter_summary_rows(iter(stream_lines)), maxlen=0))
+
+    # 网段规模：单个地址到 /8
+    for network in NETWORKS:
+        prefixlen = int(network.split('/')[1])
+        add(f'get_network_info[/{prefixlen}]',
+            lambda n=network: ip_tools.get_network_info(*n.split('/')))
+        add(f'interval_to_cidrs[/{prefixlen}]',
+            lambda n=network: ip_tools.interval_to_cidrs(*ip_tools.parse_ip_interval(n)))
+        # 每个子网约254台主机：/8 划分为 65536 个子网
+        if prefixlen <= 24:
+            add(f'plan_division[/{prefixlen}]', lambda n=network: ip_tools.plan_division(n, 'hosts', 254))
+            plan = ip_tools.plan_division(network, 'hosts', 254)
+            # 从中间位置取一页，不生成之前的子网
+            add(f'iter_divided_subnets/page[/{prefixlen}]',
+                lambda p=plan: deque(ip_tools.iter_divided_subnets(*p, offset=p[2] // 2, limit=100), maxlen=0))
+            add(f'divide_network/hosts[/{prefixlen}]',
+                lambda n=network: ip_tools.divide_network(n, 'hosts', 254))
+            add(f'divide_network/page[/{prefixlen}]',
+                lambda n=network: ip_tools.divide_network(n, 'hosts', 254, offset=0, limit=100))
+            add(f'allocate_vlsm[/{prefixlen}]',
+                lambda n=network: allocate_vlsm(n, [{'hosts': 1000, 'count': 4}, {'hosts': 200, 'count': 8}, 50, 10]))
+    return result
+
+def run(measure, name_filter=None, min_time=0.3):
+    geo_folder = tempfile.mkdtemp(prefix='bench-geoip-')
+    results = {}
+    try:
+        for name, fn in cases(geo_folder):
+            if name_filter and name_filter not in name:
+                continue
+            results[f'micro/{name}'] = measure(fn, min_time=min_time)
+    finally:
+        shutil.rmtree(geo_folder, ignore_errors=True)
+    return results
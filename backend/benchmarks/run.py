@@ -0,0 +1,59 @@
+"""
+基准测试入口
+
+    cd backend
+    python -m benchmarks.run                              # 微基准 + 接口压测
+    python -m benchmarks.run --suite micro --filter summarize
+    python -m benchmarks.run --doc                        # 包含PDF转Word压测（较慢）
+    python -m benchmarks.run --save baseline.json         # 保存为基准结果
+    python -m benchmarks.run --baseline baseline.json     # 与基准比较，退化超过阈值时退出码为1
+"""
+import sys
+import argparse
+from benchmarks.stubs import IpApiStub, DnsStub
+from benchmarks import load as load_suite
+
+def main():
+    parser = argparse.ArgumentParser(description='IP工具箱基准测试')
+    parser.add_argument('--suite', choices=('all', 'micro', 'load'), default='all')
+    parser.add_argument('--filter', help='只运行名称包含该字符串的用例')
+    parser.add_argument('--doc', action='store_true', help='包含文档转换压测')
+    parser.add_argument('--min-time', type=float, default=0.3, help='每个微基准用例的最短运行时间（秒）')
+    parser.add_argument('--scale', type=float, default=1.0, help='压测请求数的缩放比例')
+    parser.add_argument('--upstream-latency', type=float, default=0.02, help='桩服务的模拟延迟（秒）')
+    parser.add_argument('--save', help='将结果保存为JSON')
+    parser.add_argument('--baseline', help='基准结果JSON')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='允许的退化比例，p50 增加或吞吐量下降超过该比例时失败')
+    args = parser.parse_args()
+
+    # 桩服务须在导入应用配置之前启动，其地址通过环境变量传给配置
+    ip_api = IpApiStub(latency=args.upstream_latency).start()
+    dns_stub = DnsStub(latency=args.upstream_latency / 4).start()
+    load_suite.configure(ip_api.url, dns_stub.port)
+
+    from benchmarks import common, micro
+    results = {}
+    if args.suite in ('all', 'micro'):
+        results.update(micro.run(common.measure, args.filter, min_time=args.min_time))
+    if args.suite in ('all', 'load'):
+        results.update(load_suite.run(args.filter, include_doc=args.doc, scale=args.scale))
+
+    baseline = common.load_results(args.baseline) if args.baseline else None
+    common.print_results(results, baseline)
+    failed = [name for name, result in results.items() if result.get('errors')]
+    for name in failed:
+        print(f"失败请求: {name} - {results[name]['errors']} 次", file=sys.stderr)
+    if args.save:
+        common.save_results(args.save, results)
+
+    if baseline is not None:
+        regressions = common.compare(results, baseline, args.threshold)
+        for name, metric, base, current, change in regressions:
+            print(f"性能退化: {name} {metric} {base:.3f} -> {current:.3f} ({change * 100:+.1f}%)", file=sys.stderr)
+        if regressions:
+            return 1
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+启动耗时与内存基准：在全新的子进程中导入应用，统计导入耗时、常驻内存及已加载的转换库
+
+    cd backend
+    python benchmarks/startup.py                 # 只导入应用（IP/DNS接口进程的冷启动）
+    python benchmarks/startup.py --load-converters  # 导入后再加载全部转换库，对比首次转换时的额外开销
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在子进程中执行，输出一行JSON
+_PROBE = r'''
+import sys, time, json
+started = time.perf_counter()
+import app
+imported = time.perf_counter() - started
+loaded = None
+if LOAD_CONVERTERS:
+    from utils.doc_tools import CONVERTER_LIBRARIES, load_converter
+    started = time.perf_counter()
+    for name in CONVERTER_LIBRARIES:
+        load_converter(name)
+    loaded = time.perf_counter() - started
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage / 1024 / (1024 if sys.platform == 'darwin' else 1)
+    except ImportError:
+        return None
+
+heavy = ['pdf2docx', 'fitz', 'pymupdf', 'cv2', 'fontTools', 'docx2pdf', 'pythoncom']
+print(json.dumps({
+    'import_seconds': imported,
+    'converter_seconds': loaded,
+    'rss_mb': rss_mb(),
+    'modules': len(sys.modules),
+    'heavy_modules': [name for name in heavy if name in sys.modules]
+}))
+'''
+
+def probe(load_converters):
+    env = dict(os.environ)
+    # 不启动定时任务和常驻转换进程，也不在退出时清理临时目录
+    env['APP_SERVER_MANAGED'] = '1'
+    env['PYTHONPATH'] = BACKEND_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    code = f"LOAD_CONVERTERS = {bool(load_converters)}\n" + _PROBE
+    output = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='应用启动耗时与内存基准')
+    parser.add_argument('--runs', type=int, default=5, help='重复次数，取中位数')
+    parser.add_argument('--load-converters', action='store_true', help='导入后加载全部转换库')
+    parser.add_argument('--json', action='store_true', help='以JSON输出结果')
+    args = parser.parse_args()
+
+    results = [probe(args.load_converters) for _ in range(args.runs)]
+    summary = {
+        'runs': args.runs,
+        'import_seconds': statistics.median(r['import_seconds'] for r in results),
+        'rss_mb': statistics.median(r['rss_mb'] for r in results) if results[0]['rss_mb'] is not None else None,
+        'modules': results[-1]['modules'],
+        'heavy_modules': results[-1]['heavy_modules']
+    }
+    if args.load_converters:
+        summary['converter_seconds'] = statistics.median(r['converter_seconds'] for r in results)
+
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False))
+        return
+    print(f"导入应用: {summary['import_seconds'] * 1000:.0f} ms（{args.runs} 次中位数）")
+    if args.load_converters:
+        print(f"加载转换库: {summary['converter_seconds'] * 1000:.0f} ms")
+    if summary['rss_mb'] is not None:
+        print(f"常驻内存: {summary['rss_mb']:.1f} MB")
+    print(f"已加载模块: {summary['modules']}，转换相关: {', '.join(summary['heavy_modules']) or '无'}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""本地桩服务：ip-api 兼容的归属地接口和 DNS 服务器，用于在不访问外网的情况下压测和测试"""
+import json
+import time
+import threading
+import socketserver
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import dns.message
+import dns.rcode
+import dns.rdatatype
+import dns.rrset
+
+def _location(ip):
+    return {'status': 'success', 'query': ip, 'country': '测试', 'regionName': '测试',
+            'city': '测试', 'isp': 'bench'}
+
+class IpApiStub:
+    """
+    ip-api 兼容的桩服务：GET /json/<ip> 和 POST /batch
+    :param latency: 每个请求的模拟延迟（秒）
+    """
+
+    def __init__(self, latency=0.02):
+        stub = self
+        self.latency = latency
+        self.requests = 0
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # 响应头和响应体分两次写出，长连接上 Nagle 与延迟确认叠加会给每个响应增加约 40ms
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body):
+                stub.requests += 1
+                time.sleep(stub.latency)
+                data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                # 不触发限流暂停
+                self.send_header('X-Rl', '1000')
+                self.send_header('X-Ttl', '60')
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._send(_location(self.path.split('?')[0].rsplit('/', 1)[-1]))
+
+            def do_POST(self):
+                ips = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'[]')
+                self._send([_location(ip) for ip in ips])
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name='ip-api-stub', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+class DnsStub:
+    """
+    DNS 桩服务（UDP）：A 记录返回 127.0.0.1，以 nx- 开头的域名返回 NXDOMAIN，其余记录类型返回空应答
+    :param latency: 每个查询的模拟延迟（秒）
+    :param ttl: A 记录的TTL（秒）
+    :param negative_ttl: 提供时否定应答附带 SOA 记录，其TTL和 minimum 均为该值
+    """
+
+    def __init__(self, latency=0.005, ttl=300, negative_ttl=None):
+        stub = self
+        self.latency = latency
+        self.queries = 0
+        self.counts = Counter()  # (域名, 记录类型) -> 收到的查询次数
+        lock = threading.Lock()
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                data, sock = self.request
+                query = dns.message.from_wire(data)
+                response = dns.message.make_response(query)
+                question = query.question[0]
+                name = question.name.to_text()
+                with lock:
+                    stub.queries += 1
+                    stub.counts[name.rstrip('.'), dns.rdatatype.to_text(question.rdtype)] += 1
+                if name.startswith('nx-'):
+                    response.set_rcode(dns.rcode.NXDOMAIN)
+                elif question.rdtype == dns.rdatatype.A:
+                    response.answer.append(dns.rrset.from_text(question.name, ttl, 'IN', 'A', '127.0.0.1'))
+                if not response.answer and negative_ttl is not None:
+                    response.authority.append(dns.rrset.from_text(
+                        question.name.parent() if len(question.name) > 1 else question.name, negative_ttl,
+                        'IN', 'SOA', f'ns.stub. admin.stub. 1 3600 600 86400 {negative_ttl}'))
+                time.sleep(stub.latency)
+                sock.sendto(response.to_wire(), self.client_address)
+
+        self._server = socketserver.ThreadingUDPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name='dns-stub', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,113 @@
+import os
+
+# 所有配置均可通过同名环境变量覆盖
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+def _env_str(name, default):
+    return os.environ.get(name, default)
+
+def _env_float(name, default):
+    return float(os.environ.get(name, default))
+
+# 日志：由后台线程异步成批写入
+LOG_FORMAT = _env_str('LOG_FORMAT', 'text')                 # 日志格式：text / json（JSON Lines）
+LOG_CONSOLE = _env_int('LOG_CONSOLE', 1)                    # 为0时只写日志文件，不输出到控制台
+LOG_QUEUE_SIZE = _env_int('LOG_QUEUE_SIZE', 10000)          # 待写入日志队列上限，写满时丢弃新日志
+LOG_BATCH_SIZE = _env_int('LOG_BATCH_SIZE', 256)            # 每批最多写入的日志条数，每批刷新一次
+LOG_ACCESS_SAMPLE_RATE = _env_float('LOG_ACCESS_SAMPLE_RATE', 1.0)  # 成功请求访问日志的采样比例，错误和慢请求始终记录
+LOG_SLOW_REQUEST_MS = _env_int('LOG_SLOW_REQUEST_MS', 1000) # 超过该耗时（毫秒）的请求始终记录
+
+# 缓存目录（持久化缓存、索引文件等）
+CACHE_DIR = _env_str('CACHE_DIR', os.path.join(os.path.dirname(__file__), 'cache'))
+
+# IP归属地缓存
+GEO_CACHE_SIZE = _env_int('GEO_CACHE_SIZE', 10000)          # 内存中最多缓存的IP数量
+GEO_CACHE_TTL = _env_int('GEO_CACHE_TTL', 86400)            # 查询成功的缓存时间（秒）
+GEO_CACHE_NEGATIVE_TTL = _env_int('GEO_CACHE_NEGATIVE_TTL', 600)  # 查询失败/私有地址的缓存时间（秒）
+GEO_CACHE_DB = _env_str('GEO_CACHE_DB', os.path.join(CACHE_DIR, 'ip_location.db'))  # 置空则不持久化
+
+# IP归属地上游接口（ip-api.com 兼容），测试时可指向本地桩服务
+IP_API_BASE_URL = _env_str('IP_API_BASE_URL', 'http://ip-api.com').rstrip('/')
+IP_API_TIMEOUT = _env_int('IP_API_TIMEOUT', 5)              # 请求超时（秒）
+IP_API_BATCH_SIZE = _env_int('IP_API_BATCH_SIZE', 100)      # 批量接口单次最多IP数量
+IP_API_MAX_WORKERS = _env_int('IP_API_MAX_WORKERS', 4)      # 批量查询的最大并发数
+IP_API_POOL_SIZE = _env_int('IP_API_POOL_SIZE', 10)         # HTTP 连接池大小
+IP_API_RATE_LIMIT = _env_int('IP_API_RATE_LIMIT', 45)       # 单个查询接口每分钟最多请求数（整台主机）
+IP_API_BATCH_RATE_LIMIT = _env_int('IP_API_BATCH_RATE_LIMIT', 15)  # 批量接口每分钟最多请求数（整台主机）
+IP_API_BURST = _env_int('IP_API_BURST', 5)                  # 空闲后允许立即连续发出的请求数（整台主机）
+IP_API_MAX_WAIT = _env_int('IP_API_MAX_WAIT', 10)           # 等待上游配额的最长时间（秒），超过时直接返回限流错误
+
+# IP归属地查询后端：'online' 调用上游接口，'offline' 使用本地离线索引（不访问网络）
+GEO_BACKEND = _env_str('GEO_BACKEND', 'online')
+GEO_CSV_PATH = _env_str('GEO_CSV_PATH', '')                 # 离线数据CSV，索引缺失或过旧时据此重建
+GEO_INDEX_PATH = _env_str('GEO_INDEX_PATH', os.path.join(CACHE_DIR, 'geoip.idx'))  # 离线索引文件
+
+# 纯计算接口（网段计算、子网划分、格式转换）的响应缓存
+COMPUTE_CACHE_SIZE = _env_int('COMPUTE_CACHE_SIZE', 2048)   # 最多缓存的响应数
+COMPUTE_CACHE_MAX_KB = _env_int('COMPUTE_CACHE_MAX_KB', 512)  # 单个响应超过该大小（KB）时不缓存
+DIVIDE_MAX_SUBNETS = _env_int('DIVIDE_MAX_SUBNETS', 65536)  # 子网划分单次响应最多返回的子网数，超出时须分页或流式输出
+HTTP_CACHE_MAX_AGE = _env_int('HTTP_CACHE_MAX_AGE', 3600)   # 响应的 Cache-Control max-age（秒）
+
+# 最长前缀匹配：前缀表CSV（每行 prefix,label），修改后自动热加载
+LPM_TABLE_PATH = _env_str('LPM_TABLE_PATH', os.path.join(CACHE_DIR, 'lpm_table.csv'))  # 接口设置的前缀表写入此文件，各工作进程据此同步；置空则只在进程内生效
+LPM_RELOAD_INTERVAL = _env_int('LPM_RELOAD_INTERVAL', 5)    # 检查前缀表文件更新的间隔（秒），为0时不自动检查，多进程部署时各进程不再同步
+
+# 生产环境服务（python serve.py）
+SERVER_HOST = _env_str('SERVER_HOST', '0.0.0.0')
+SERVER_PORT = _env_int('SERVER_PORT', 5000)
+SERVER_WORKER_CLASS = _env_str('SERVER_WORKER_CLASS', 'thread')  # 工作模型：thread / gevent / process
+SERVER_WORKERS = _env_int('SERVER_WORKERS', os.cpu_count() or 1)  # 工作进程数
+SERVER_THREADS = _env_int('SERVER_THREADS', 8)             # thread 模型下每个进程的线程数
+SERVER_CONNECTIONS = _env_int('SERVER_CONNECTIONS', 1000)  # gevent 模型下每个进程的最大并发连接数
+SERVER_PRELOAD = _env_int('SERVER_PRELOAD', 1)             # 为1时在主进程中预加载应用，工作进程 fork 后以写时复制共享内存
+SERVER_TIMEOUT = _env_int('SERVER_TIMEOUT', 300)           # 工作进程无响应超过该时间（秒）后重启
+# 实际运行的工作进程数，由 serve.py 设置；标注为整台主机的上限按此均分到各工作进程
+WEB_WORKERS = max(_env_int('APP_WEB_WORKERS', 1), 1)
+
+def per_worker(total):
+    """整台主机的上限均分到每个工作进程的份额，至少为1；为0（不启用）时仍为0"""
+    return max(total // WEB_WORKERS, 1) if total > 0 else total
+
+BACKGROUND_LOCK_PATH = _env_str('BACKGROUND_LOCK_PATH', os.path.join(CACHE_DIR, 'background.lock'))  # 主机级定时任务的选举锁文件
+
+# DNS解析器，测试时可指向本地桩服务
+DNS_NAMESERVERS = [ns.strip() for ns in _env_str('DNS_NAMESERVERS', '8.8.8.8,1.1.1.1,223.5.5.5').split(',') if ns.strip()]
+DNS_PORT = _env_int('DNS_PORT', 53)
+DNS_TIMEOUT = _env_int('DNS_TIMEOUT', 3)                    # 单次查询超时（秒）
+DNS_BULK_CONCURRENCY = _env_int('DNS_BULK_CONCURRENCY', 32) # 批量查询时同时进行的域名数
+DNS_BULK_MAX_DOMAINS = _env_int('DNS_BULK_MAX_DOMAINS', 1000)  # 批量查询单次最多域名数
+
+# DNS应答缓存
+DNS_CACHE_SIZE = _env_int('DNS_CACHE_SIZE', 4096)           # 最多缓存的 (域名, 记录类型) 数量
+DNS_CACHE_MAX_TTL = _env_int('DNS_CACHE_MAX_TTL', 86400)    # 缓存时间上限（秒），实际取记录TTL与该值的较小者
+DNS_NEGATIVE_TTL = _env_int('DNS_NEGATIVE_TTL', 300)        # 否定应答缺少SOA时的缓存时间（秒）
+DNS_MAX_CONCURRENCY = _env_int('DNS_MAX_CONCURRENCY', 64)   # 全局同时进行的上游DNS查询数上限
+
+# 异步文档转换任务
+DOC_JOB_WORKERS = _env_int('DOC_JOB_WORKERS', 2)            # 转换进程数（整台主机）
+DOC_JOB_TTL = _env_int('DOC_JOB_TTL', 3600)                 # 任务结束后保留结果的时间（秒）
+DOC_JOB_MAX_PENDING = _env_int('DOC_JOB_MAX_PENDING', 32)   # 最多同时排队/执行的任务数
+DOC_JOB_DB = _env_str('DOC_JOB_DB', os.path.join(CACHE_DIR, 'jobs.db'))  # 任务状态数据库，同一主机的工作进程共享；置空则只保存在进程内
+
+# 文档转换结果缓存（按源文件内容寻址）
+DOC_CACHE_DIR = _env_str('DOC_CACHE_DIR', os.path.join(CACHE_DIR, 'conversions'))
+DOC_CACHE_MAX_MB = _env_int('DOC_CACHE_MAX_MB', 1024)       # 缓存总大小上限（MB，整台主机），为0时不缓存
+
+# 文档上传
+DOC_UPLOAD_MAX_MB = _env_int('DOC_UPLOAD_MAX_MB', 100)      # 单个文件大小上限（MB）
+DOC_UPLOAD_CHUNK_KB = _env_int('DOC_UPLOAD_CHUNK_KB', 1024) # 写入磁盘的缓冲块大小（KB）
+DOC_UPLOAD_TTL = _env_int('DOC_UPLOAD_TTL', 3600)           # 分块上传会话无活动后的过期时间（秒）
+
+# PDF转Word调度
+PDF_WORKERS = _env_int('PDF_WORKERS', os.cpu_count() or 1) # 全局PDF转换进程数（整台主机）
+PDF_PAGES_PER_TASK = _env_int('PDF_PAGES_PER_TASK', 4)      # 每个调度任务解析的页数
+
+# Word转PDF
+DOCX_BACKEND = _env_str('DOCX_BACKEND', 'auto')             # 转换后端：auto / word-com / libreoffice
+SOFFICE_PATH = _env_str('SOFFICE_PATH', 'soffice')          # LibreOffice 可执行文件
+DOCX_WORKERS = _env_int('DOCX_WORKERS', 2)                  # 常驻转换进程数（整台主机），为0时每次转换单独启动
+DOCX_MAX_JOBS = _env_int('DOCX_MAX_JOBS', 50)               # 转换进程处理多少个任务后重启
+DOCX_MAX_MEMORY_MB = _env_int('DOCX_MAX_MEMORY_MB', 1024)   # 转换进程内存超过该值（MB）后重启
+DOCX_TIMEOUT = _env_int('DOCX_TIMEOUT', 120)                # 单个转换任务的超时（秒）
@@ -0,0 +1,90 @@
+"""
+生产环境启动入口：python serve.py
+
+工作模型由 SERVER_WORKER_CLASS 指定：
+    thread   多进程 + 每进程多线程（gunicorn gthread），适合大多数场景
+    gevent   多进程 + 协程，适合大量并发的上游查询（需要安装 gevent）
+    process  多进程，每个进程同时只处理一个请求（gunicorn sync）
+未安装 gunicorn 时（如 Windows）退化为单进程多线程的 Werkzeug 服务
+"""
+import os
+import sys
+import config
+
+# 应用模块导入时不自行启动后台任务，由各工作进程在 fork 之后启动
+os.environ['APP_SERVER_MANAGED'] = '1'
+
+_WORKER_CLASSES = {
+    'thread': 'gthread',
+    'gevent': 'gevent',
+    'process': 'sync'
+}
+
+def _post_worker_init(worker):
+    from app import start_background_tasks
+    start_background_tasks(cleanup_on_exit=False)
+
+def _on_exit(server):
+    # 整个服务停止时清理一次临时目录
+    from app import cleanup_temp_files
+    cleanup_temp_files()
+
+def gunicorn_options():
+    worker_class = config.SERVER_WORKER_CLASS
+    if worker_class not in _WORKER_CLASSES:
+        raise ValueError(f"不支持的工作模型: {worker_class}，可选 {', '.join(_WORKER_CLASSES)}")
+    return {
+        'bind': f"{config.SERVER_HOST}:{config.SERVER_PORT}",
+        'worker_class': _WORKER_CLASSES[worker_class],
+        'workers': config.SERVER_WORKERS,
+        'threads': config.SERVER_THREADS if worker_class == 'thread' else 1,
+        'worker_connections': config.SERVER_CONNECTIONS,
+        'preload_app': bool(config.SERVER_PRELOAD),
+        'timeout': config.SERVER_TIMEOUT,
+        # 访问日志由应用自身记录
+        'accesslog': None,
+        'post_worker_init': _post_worker_init,
+        'on_exit': _on_exit
+    }
+
+def run_gunicorn():
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app import app
+            return app
+
+    # 应用据此把主机级的上限（转换进程数、结果缓存大小、上游频率限制）均分到各工作进程
+    config.WEB_WORKERS = max(config.SERVER_WORKERS, 1)
+    Application(gunicorn_options()).run()
+
+def run_werkzeug():
+    from werkzeug.serving import run_simple
+    from app import app, app_logger, start_background_tasks
+    app_logger.warning("gunicorn is not installed, serving with a single-process threaded Werkzeug server")
+    start_background_tasks()
+    run_simple(config.SERVER_HOST, config.SERVER_PORT, app, threaded=True)
+
+def main():
+    if config.SERVER_WORKER_CLASS == 'gevent':
+        # 须在导入应用（及其中的 threading、socket 等）之前完成
+        from gevent import monkey
+        monkey.patch_all()
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        run_werkzeug()
+        return
+    run_gunicorn()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 与运行应用时一致，以 backend 目录为导入根目录（from utils.xxx import ...）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
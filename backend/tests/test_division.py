@@ -0,0 +1,108 @@
+import os
+import json
+import itertools
+import ipaddress
+import pytest
+from utils.ip_tools import plan_division, iter_divided_subnets, divide_network
+
+@pytest.fixture
+def client():
+    # 不启动定时任务，也不在退出时清空临时目录
+    os.environ.setdefault('APP_SERVER_MANAGED', '1')
+    from app import app
+    return app.test_client()
+
+def test_divide_rejects_unpaged_huge_division(client):
+    response = client.get('/api/network/divide', query_string={
+        'network': '2001:db8::/32', 'divideType': 'hosts', 'value': 2})
+
+    assert response.status_code == 400
+    assert response.get_json()['total'] == 1 << 94
+
+def test_divide_rejects_limit_above_max(client):
+    import config
+    response = client.get('/api/network/divide', query_string={
+        'network': '2001:db8::/32', 'divideType': 'hosts', 'value': 2, 'limit': config.DIVIDE_MAX_SUBNETS + 1})
+
+    assert response.status_code == 400
+
+def test_divide_pages_and_streams_huge_division(client):
+    query = {'network': '2001:db8::/32', 'divideType': 'hosts', 'value': 2, 'offset': 1 << 90}
+    page = client.get('/api/network/divide', query_string=dict(query, limit=2)).get_json()
+    assert page['total'] == 1 << 94
+    assert [subnet['subnet'] for subnet in page['data']] == ['2001:db8:1000::/126', '2001:db8:1000::4/126']
+
+    response = client.get('/api/network/divide', query_string=dict(query, stream=1, limit=3))
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert response.headers['X-Total-Count'] == str(1 << 94)
+    assert [row['subnet'] for row in rows] == [subnet['subnet'] for subnet in page['data']] + ['2001:db8:1000::8/126']
+
+def test_divide_small_network_without_limit(client):
+    response = client.get('/api/network/divide', query_string={
+        'network': '192.168.0.0/24', 'divideType': 'count', 'value': 4})
+
+    assert response.status_code == 200
+    assert [subnet['subnet'] for subnet in response.get_json()['data']] == [
+        '192.168.0.0/26', '192.168.0.64/26', '192.168.0.128/26', '192.168.0.192/26']
+
+def _reference(network, new_prefix, total):
+    """由 ipaddress 逐个生成的划分结果"""
+    subnets = []
+    for subnet in itertools.islice(ipaddress.ip_network(network).subnets(new_prefix=new_prefix), total):
+        hosts = list(subnet.hosts())
+        subnets.append({
+            'subnet': str(subnet),
+            'netmask': str(subnet.netmask),
+            'network': str(subnet.network_address),
+            'broadcast': str(subnet.broadcast_address),
+            'hosts': subnet.num_addresses - 2,
+            'range': f"{hosts[0]} - {hosts[-1]}"
+        })
+    return subnets
+
+@pytest.mark.parametrize('network, divide_type, value, new_prefix, total', [
+    ('192.168.0.0/24', 'count', 4, 26, 4),
+    ('192.168.0.0/24', 'count', 5, 27, 5),
+    ('192.168.0.0/24', 'count', 1, 24, 1),
+    ('10.0.0.0/30', 'count', 4, 32, 4),
+    ('10.0.0.0/28', 'hosts', 1, 31, 8),
+    ('10.0.0.0/22', 'hosts', 30, 27, 32),
+    ('2001:db8::/120', 'count', 3, 122, 3),
+    ('2001:db8::/120', 'hosts', 6, 125, 32),
+    ('2001:db8::/124', 'hosts', 1, 127, 8),
+    ('::/124', 'count', 16, 128, 16),
+])
+def test_division_matches_ipaddress(network, divide_type, value, new_prefix, total):
+    net, prefix, count = plan_division(network, divide_type, value)
+    assert (str(net), prefix, count) == (network, new_prefix, total)
+
+    expected = _reference(network, new_prefix, total)
+    assert list(iter_divided_subnets(net, prefix, count)) == expected
+    assert divide_network(network, divide_type, value) == expected
+    for offset, limit in [(0, 1), (1, 2), (total - 1, 5), (total, 3), (2, 0), (-3, 2)]:
+        page = list(iter_divided_subnets(net, prefix, count, offset, limit))
+        start = max(offset, 0)
+        assert page == expected[start:start + limit]
+
+def test_division_ipv6_paging_far_from_start():
+    net, prefix, total = plan_division('2001:db8::/32', 'count', 1 << 40)
+    assert (prefix, total) == (72, 1 << 40)
+
+    offset = (1 << 40) - 3
+    page = list(iter_divided_subnets(net, prefix, total, offset, 10))
+    # 最后三个子网，超出总数的部分不返回
+    assert [subnet['subnet'] for subnet in page] == [
+        '2001:db8:ffff:ffff:fd00::/72', '2001:db8:ffff:ffff:fe00::/72', '2001:db8:ffff:ffff:ff00::/72']
+    assert page[-1]['broadcast'] == str(net.broadcast_address)
+
+@pytest.mark.parametrize('network, divide_type, value', [
+    ('192.168.0.1/24', 'count', 2),
+    ('192.168.0.0/24', 'count', 0),
+    ('192.168.0.0/24', 'count', 257),
+    ('192.168.0.0/24', 'hosts', 256),
+    ('2001:db8::/126', 'count', 5),
+    ('not-a-network', 'count', 2),
+])
+def test_division_rejects_invalid_plans(network, divide_type, value):
+    with pytest.raises(ValueError):
+        plan_division(network, divide_type, value)
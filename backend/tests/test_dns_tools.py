@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import threading
+import pytest
+from benchmarks.stubs import DnsStub
+from utils import dns_tools
+
+# 桩服务的记录TTL和否定应答（SOA minimum）TTL，均取较短的值以便测试过期
+TTL = 1
+NEGATIVE_TTL = 1
+
+@pytest.fixture
+def stub(monkeypatch):
+    stub = DnsStub(latency=0.1, ttl=TTL, negative_ttl=NEGATIVE_TTL).start()
+    dns_tools._get_loop()
+    monkeypatch.setattr(dns_tools._resolver, 'port', stub.port)
+    monkeypatch.setattr(dns_tools._resolver, 'nameservers', ['127.0.0.1'])
+    dns_tools._dns_cache.clear()
+    yield stub
+    stub.stop()
+
+def _cache_stats():
+    stats = dns_tools.get_dns_cache_stats()
+    return stats['hits'], stats['misses']
+
+def test_queries_share_one_event_loop(stub):
+    """各线程的查询都在同一个常驻事件循环上执行，多个记录类型同时查询"""
+    loop = dns_tools._get_loop()
+    threads = [threading.Thread(target=dns_tools.query_single_record, args=(f'host{i}.test', 'A'))
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert dns_tools._get_loop() is loop
+
+    started = time.perf_counter()
+    results = dns_tools.query_dns_records('multi.test', ['A', 'AAAA', 'MX', 'TXT'])
+    elapsed = time.perf_counter() - started
+    # 4 个查询各耗时 0.1 秒，并发执行时总耗时远小于 0.4 秒
+    assert elapsed < 0.3
+    assert [result['type'] for result in results] == ['A', 'AAAA', 'MX', 'TXT']
+
+def test_answers_cached_until_ttl_expires(stub):
+    first = dns_tools.query_single_record('cached.test', 'A')
+    hits, misses = _cache_stats()
+    second = dns_tools.query_single_record('cached.test', 'A')
+
+    assert first['records'][0]['value'] == second['records'][0]['value'] == '127.0.0.1'
+    assert stub.counts['cached.test', 'A'] == 1
+    assert _cache_stats() == (hits + 1, misses)
+    # 返回剩余TTL
+    assert second['records'][0]['ttl'] <= TTL
+
+    time.sleep(TTL + 0.1)
+    dns_tools.query_single_record('cached.test', 'A')
+    assert stub.counts['cached.test', 'A'] == 2
+    assert _cache_stats()[1] == misses + 1
+
+def test_negative_answers_cached_for_soa_minimum(stub, monkeypatch):
+    # SOA 中的否定缓存时间优先于默认值
+    monkeypatch.setattr(dns_tools.config, 'DNS_NEGATIVE_TTL', 300)
+
+    for _ in range(3):
+        result = dns_tools.query_single_record('nx-missing.test', 'A')
+        assert result['records'][0]['value'] == '域名不存在'
+    dns_tools.query_single_record('noanswer.test', 'MX')
+    dns_tools.query_single_record('noanswer.test', 'MX')
+    assert stub.counts['nx-missing.test', 'A'] == 1
+    assert stub.counts['noanswer.test', 'MX'] == 1
+
+    time.sleep(NEGATIVE_TTL + 0.1)
+    dns_tools.query_single_record('nx-missing.test', 'A')
+    dns_tools.query_single_record('noanswer.test', 'MX')
+    assert stub.counts['nx-missing.test', 'A'] == 2
+    assert stub.counts['noanswer.test', 'MX'] == 2
+
+@pytest.fixture
+def client():
+    # 不启动定时任务，也不在退出时清空临时目录
+    os.environ.setdefault('APP_SERVER_MANAGED', '1')
+    from app import app
+    return app.test_client()
+
+def _ndjson(response):
+    body = response.get_data(as_text=True)
+    assert body.endswith('\n')
+    return [json.loads(line) for line in body.splitlines()]
+
+def test_bulk_query_streams_ndjson(stub, client):
+    request = {'domains': ['a.test', 'nx-b.test', ' a.test ', ''], 'types': ['A']}
+
+    response = client.post('/api/dns/bulk', json=request)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['X-Total-Count'] == '2'
+    rows = sorted(_ndjson(response), key=lambda row: row['domain'])
+    assert [row['domain'] for row in rows] == ['a.test', 'nx-b.test']
+    for row in rows:
+        assert set(row) == {'domain', 'data', 'cached', 'elapsed_ms'}
+        assert row['cached'] is False
+    assert rows[0]['data'][0]['records'][0]['value'] == '127.0.0.1'
+    assert rows[1]['data'][0]['records'][0]['value'] == '域名不存在'
+
+    # 再次查询全部命中缓存，不再访问上游
+    queries = stub.queries
+    rows = _ndjson(client.post('/api/dns/bulk', json=request))
+    assert all(row['cached'] for row in rows)
+    assert stub.queries == queries
+
+def test_bulk_query_validates_input(client):
+    assert client.post('/api/dns/bulk', json={'domains': [], 'types': ['A']}).status_code == 400
+    assert client.post('/api/dns/bulk', json={'domains': ['a.test'], 'types': []}).status_code == 400
+
+def test_bulk_query_pauses_for_slow_consumer(stub, monkeypatch):
+    """调用方读取较慢时，已完成但未读取的结果不超过输出队列容量，上游查询随之暂停"""
+    concurrency = 2
+    monkeypatch.setattr(dns_tools.config, 'DNS_BULK_CONCURRENCY', concurrency)
+    stub.latency = 0.01
+    domains = [f'slow{i}.test' for i in range(20)]
+
+    rows = dns_tools.iter_bulk_dns_records(domains, ['A'])
+    first = next(rows)
+    time.sleep(0.5)
+    # 已读取 1 个，队列中最多 concurrency 个，另有 concurrency 个完成查询后等待放入队列
+    assert stub.queries <= 1 + 2 * concurrency
+
+    rest = list(rows)
+    assert sorted(row['domain'] for row in [first] + rest) == sorted(domains)
+    assert stub.queries == len(domains)
+
+def test_bulk_query_stops_when_consumer_closes(stub, monkeypatch):
+    monkeypatch.setattr(dns_tools.config, 'DNS_BULK_CONCURRENCY', 2)
+    stub.latency = 0.01
+
+    rows = dns_tools.iter_bulk_dns_records([f'closed{i}.test' for i in range(20)], ['A'])
+    next(rows)
+    rows.close()
+    time.sleep(0.2)
+    queries = stub.queries
+    time.sleep(0.2)
+    assert stub.queries == queries < 20
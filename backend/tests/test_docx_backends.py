@@ -0,0 +1,147 @@
+import threading
+import pytest
+from utils.docx_backends import DocxBackend, DocxConverterPool, _PoolJob
+
+class FakeBackend(DocxBackend):
+    """按文件名决定行为：slow 开头的任务阻塞直到被终止或放行"""
+
+    name = 'fake'
+
+    def __init__(self):
+        self.killed = threading.Event()
+        self.release = threading.Event()
+        self.kills = 0
+        self.stopped = False
+
+    def start(self):
+        pass
+
+    def convert(self, docx_file, output_file):
+        if docx_file.startswith('slow'):
+            self.release.wait(5)
+            if self.killed.is_set():
+                raise RuntimeError('converter killed')
+
+    def kill(self):
+        self.kills += 1
+        self.killed.set()
+        self.release.set()
+        return True
+
+    def stop(self):
+        self.stopped = True
+
+@pytest.fixture
+def pool():
+    backends = []
+
+    def factory():
+        backends.append(FakeBackend())
+        return backends[-1]
+
+    pool = DocxConverterPool(factory, workers=1, timeout=0.5).start()
+    pool.backends = backends
+    yield pool
+    for backend in backends:
+        backend.release.set()
+    pool.shutdown()
+
+def test_timeout_kills_and_restarts_converter(pool):
+    with pytest.raises(TimeoutError):
+        pool.convert('slow.docx', 'slow.pdf')
+    first = pool.backends[0]
+    assert first.kills == 1
+
+    assert pool.convert('fast.docx', 'fast.pdf') == 'fast.pdf'
+    assert first.stopped
+    assert len(pool.backends) == 2
+
+def test_late_abort_does_not_touch_next_job(pool):
+    """超时终止请求到达时任务已结束，工作线程已在执行下一个任务"""
+    worker = pool._workers[0]
+    finished = _PoolJob('fast.docx', 'fast.pdf')
+    pool._queue.put(finished)
+    assert finished.future.result(timeout=5) == 'fast.pdf'
+
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault('value', pool.convert('slow.docx', 'slow.pdf')))
+    thread.start()
+    while worker.current is None:
+        pass
+
+    assert worker.abort(finished) is False
+    backend = pool.backends[-1]
+    assert backend.kills == 0
+    backend.release.set()
+    thread.join()
+    assert result['value'] == 'slow.pdf'
+    assert not worker.aborted
+
+def test_queued_job_is_cancelled_on_timeout(pool):
+    """唯一的工作线程被占用时，排队的任务超时后取消，不再执行"""
+    worker = pool._workers[0]
+    busy = _PoolJob('slow.docx', 'slow.pdf')
+    pool._queue.put(busy)
+    assert busy.started.wait(5)
+
+    with pytest.raises(TimeoutError, match='排队'):
+        pool.convert('fast.docx', 'fast.pdf')
+    pool.backends[0].release.set()
+    assert busy.future.result(timeout=5) == 'slow.pdf'
+    assert pool.convert('fast.docx', 'fast.pdf') == 'fast.pdf'
+    assert worker.jobs_done == 2
+    assert len(pool.backends) == 1
+
+def test_timeout_while_converter_starts():
+    """转换程序启动超过超时时间时，调用方超时返回，启动完成后该任务不再执行"""
+    starting = threading.Event()
+    release = threading.Event()
+    converted = []
+
+    class SlowStart(FakeBackend):
+        def start(self):
+            starting.set()
+            release.wait(5)
+
+        def convert(self, docx_file, output_file):
+            converted.append(docx_file)
+
+    pool = DocxConverterPool(SlowStart, workers=1, timeout=0.3).start()
+    try:
+        assert starting.wait(5)
+        pool._workers[0].backend = None
+        with pytest.raises(TimeoutError):
+            pool.convert('a.docx', 'a.pdf')
+        release.set()
+        assert pool.convert('b.docx', 'b.pdf') == 'b.pdf'
+        assert converted == ['b.docx']
+    finally:
+        release.set()
+        pool.shutdown()
+
+def test_unkillable_converter_is_recycled_after_job():
+    """无法终止的转换程序在任务结束后重启"""
+    backends = []
+
+    class Unkillable(FakeBackend):
+        def kill(self):
+            self.kills += 1
+            return False
+
+    def factory():
+        backends.append(Unkillable())
+        return backends[-1]
+
+    pool = DocxConverterPool(factory, workers=1, timeout=0.3).start()
+    try:
+        with pytest.raises(TimeoutError):
+            pool.convert('slow.docx', 'slow.pdf')
+        assert backends[0].kills == 1
+        backends[0].release.set()
+        assert pool.convert('fast.docx', 'fast.pdf') == 'fast.pdf'
+        assert backends[0].stopped
+        assert len(backends) == 2
+    finally:
+        for backend in backends:
+            backend.release.set()
+        pool.shutdown()
@@ -0,0 +1,43 @@
+import pytest
+from utils.geoip import build_geo_index, GeoIndex, _parse_ip
+
+ROWS = [
+    ('1.0.0.0', '1.0.0.255', 'A'),
+    ('1.0.1.0', '1.0.1.0', 'B'),
+    ('8.8.8.0', '8.8.8.255', 'C'),
+    ('255.255.255.0', '255.255.255.255', 'D'),
+    ('2001:db8::', '2001:db8::ffff', 'E'),
+    ('2001:db8:0:1::', '2001:db8:0:1::', 'F'),
+    ('ffff::', 'ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff', 'G'),
+]
+
+@pytest.fixture(scope='module')
+def index(tmp_path_factory):
+    folder = tmp_path_factory.mktemp('geoip')
+    csv_path = folder / 'geo.csv'
+    csv_path.write_text('start,end,country,region,city,isp\n' +
+                        ''.join(f'{start},{end},{country},R,C,I\n' for start, end, country in ROWS))
+    build_geo_index(str(csv_path), str(folder / 'geo.idx'))
+    return GeoIndex(str(folder / 'geo.idx'))
+
+# 区间边界、区间之间、首个区间之前及地址空间两端
+PROBES = ['0.0.0.0', '0.255.255.255', '1.0.0.0', '1.0.0.255', '1.0.1.0', '1.0.1.1', '8.8.8.8',
+          '255.255.255.255', '::', '2001:db7:ffff:ffff:ffff:ffff:ffff:ffff', '2001:db8::',
+          '2001:db8::ffff', '2001:db8::1:0', '2001:db8:0:1::', '2001:db8:0:1::1', 'ffff::',
+          'ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff']
+
+def _country(location):
+    return location[0] if location else None
+
+def test_lookup_many_matches_single_lookups(index):
+    # 重复多次以超过整批查找的阈值，并打乱 IPv4/IPv6 顺序
+    addresses = [_parse_ip(ip) for ip in PROBES * 3][::-1]
+    expected = [_country(index.lookup_int(*address)) for address in addresses]
+
+    assert [_country(location) for location in index.lookup_many(addresses)] == expected
+    assert expected[::-1][:len(PROBES)] == [None, None, 'A', 'A', 'B', None, 'C', 'D', None, None,
+                                            'E', 'E', None, 'F', None, 'G', 'G']
+
+def test_lookup_many_small_batch_and_empty(index):
+    assert index.lookup_many([]) == []
+    assert _country(index.lookup_many([_parse_ip('8.8.8.8')])[0]) == 'C'
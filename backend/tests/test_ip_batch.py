@@ -0,0 +1,57 @@
+import random
+import pytest
+from utils.ip_batch import CONVERTERS, convert_batch
+
+def _random_inputs(rng, count):
+    items = []
+    for _ in range(count):
+        octets = [rng.randrange(256) for _ in range(4)]
+        prefix = rng.randrange(33)
+        mask = (0xFFFFFFFF << (32 - prefix)) & 0xFFFFFFFF
+        items.append(rng.choice((
+            '.'.join(map(str, octets)),
+            '.'.join(format(octet, '08b') for octet in octets),
+            '.'.join(format(octet, rng.choice(('02X', '02x', 'x'))) for octet in octets),
+            '.'.join(str((mask >> shift) & 0xFF) for shift in (24, 16, 8, 0)),
+            str(prefix),
+        )))
+    return items
+
+# 各转换类型的边界输入、无效输入及其他地址族
+EDGE_CASES = [
+    '0.0.0.0', '255.255.255.255', '256.1.1.1', '1.2.3', '1.2.3.4.5', '1..2.3', '.1.2.3', '1.2.3.',
+    ' 10.0.0.1 ', '010.001.000.001', '1. 2.3.4', '+1.2.3.4', '-1.2.3.4', '１.2.3.4', '1.2.3.4/24',
+    '00000000.11111111.00000000.1111111', '00000000.11111111.00000000.111111112', '0A.0b.FF.00', 'G0.00.00.00',
+    '100.00.00.00', '255.255.255.0', '255.0.255.0', '0', '32', '33', '-1', '08', ' 24 ', '',
+    '2001:db8::1', '::ffff:192.0.2.1', '::1', 'fe80::1%eth0', '1' * 100, '1.2.3.4' + ' ' * 70,
+]
+
+def _expected(single, item):
+    text = item.strip() if isinstance(item, str) else item
+    if not isinstance(text, str):
+        return None, '输入必须是字符串'
+    try:
+        return single(text), None
+    except ValueError as e:
+        return None, str(e)
+
+@pytest.mark.parametrize('convert_type', sorted(CONVERTERS))
+def test_batch_matches_single_conversion(convert_type):
+    _, single = CONVERTERS[convert_type]
+    inputs = _random_inputs(random.Random(convert_type), 500) + EDGE_CASES + [None, 123]
+    random.Random(0).shuffle(inputs)
+
+    results, errors = convert_batch(convert_type, inputs)
+
+    errors = {error['index']: error for error in errors}
+    for index, item in enumerate(inputs):
+        result, error = _expected(single, item)
+        assert results[index] == result, item
+        assert (errors[index]['error'] if index in errors else None) == error, item
+    assert any(result is not None for result in results)
+    assert errors
+
+def test_batch_handles_empty_and_unknown_type():
+    assert convert_batch('dec2bin', []) == ([], [])
+    with pytest.raises(ValueError):
+        convert_batch('v4tov6', ['1.2.3.4'])
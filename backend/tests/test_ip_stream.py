@@ -0,0 +1,25 @@
+import random
+import pytest
+from utils import ip_stream
+from utils.ip_tools import summarize_ip_ranges
+
+def _inputs(count, seed=0):
+    rng = random.Random(seed)
+    items = []
+    for _ in range(count):
+        base = f"10.{rng.randrange(4)}.{rng.randrange(256)}"
+        items.append(rng.choice((f"{base}.{rng.randrange(256)}", f"{base}.0/28", f"{base}.16-{base}.40",
+                                 f"2001:db8::{rng.randrange(4096):x}")))
+    return items
+
+@pytest.mark.parametrize('output', ['range', 'cidr'])
+def test_streaming_summary_matches_in_memory(monkeypatch, output):
+    # 小批量使汇总跨越多次合并
+    monkeypatch.setattr(ip_stream, 'BATCH_SIZE', 7)
+    items = _inputs(2000)
+    lines = list(enumerate(items + ['not-an-ip'], 1))
+
+    rows = [row for batch in ip_stream.iter_summary_rows(iter(lines), output) for row in batch]
+
+    assert [row['line'] for row in rows if row['error']] == [len(lines)]
+    assert [row['result'] for row in rows if not row['error']] == summarize_ip_ranges(items, output)
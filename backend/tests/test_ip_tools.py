@@ -0,0 +1,83 @@
+import random
+import ipaddress
+import pytest
+from utils.ip_tools import parse_ip_interval, merge_ip_intervals, interval_to_cidrs, summarize_ip_ranges
+
+def _interval(network):
+    net = ipaddress.ip_network(network, strict=False)
+    return net.version, int(net.network_address), int(net.broadcast_address)
+
+@pytest.mark.parametrize('text, expected', [
+    ('10.0.0.1', (4, 0x0A000001, 0x0A000001)),
+    (' 10.0.0.1/24 ', _interval('10.0.0.0/24')),
+    ('10.0.0.0/255.255.255.0', _interval('10.0.0.0/24')),
+    ('0.0.0.0/0', (4, 0, (1 << 32) - 1)),
+    ('10.0.0.5 - 10.0.0.9', (4, 0x0A000005, 0x0A000009)),
+    ('2001:db8::1/64', _interval('2001:db8::/64')),
+    ('::/0', (6, 0, (1 << 128) - 1)),
+    ('2001:db8::1-2001:db8::ff', (6, int(ipaddress.ip_address('2001:db8::1')), int(ipaddress.ip_address('2001:db8::ff')))),
+])
+def test_parse_ip_interval(text, expected):
+    assert parse_ip_interval(text) == expected
+
+@pytest.mark.parametrize('text', [
+    '', 'abc', '10.0.0.256', '10.0.0.0/33', '2001:db8::/129', '10.0.0.9-10.0.0.1', '10.0.0.1-2001:db8::1', '10.0.0.0/x'
+])
+def test_parse_ip_interval_rejects_invalid(text):
+    with pytest.raises(ValueError):
+        parse_ip_interval(text)
+
+def test_merge_overlapping_and_adjacent_intervals():
+    intervals = [(4, 10, 20), (4, 15, 30), (4, 31, 40), (4, 42, 50), (4, 5, 5), (6, 41, 41), (6, 10, 40)]
+
+    assert merge_ip_intervals(intervals) == [(4, 5, 5), (4, 10, 40), (4, 42, 50), (6, 10, 41)]
+
+def test_merge_keeps_address_families_apart():
+    # 数值相邻但版本不同的区间不能合并
+    assert merge_ip_intervals([(6, 0, 9), (4, 0, 9), (6, 10, 10)]) == [(4, 0, 9), (6, 0, 10)]
+
+def _reference_cidrs(version, start, end):
+    address = ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address
+    return [str(net) for net in ipaddress.summarize_address_range(address(start), address(end))]
+
+def test_interval_to_cidrs_matches_ipaddress():
+    rng = random.Random(0)
+    cases = [(4, 0, (1 << 32) - 1), (6, 0, (1 << 128) - 1), (4, 1, 1), (6, 1, (1 << 128) - 2)]
+    for _ in range(300):
+        version = rng.choice((4, 6))
+        bits = 32 if version == 4 else 128
+        start = rng.randrange(1 << bits)
+        end = min(start + rng.randrange(1 << rng.randrange(1, 24)), (1 << bits) - 1)
+        cases.append((version, start, end))
+    for version, start, end in cases:
+        assert interval_to_cidrs(version, start, end) == _reference_cidrs(version, start, end)
+
+def test_summarize_mixed_families():
+    ranges = ['2001:db8::1', '10.0.0.0/25', '10.0.0.128-10.0.0.255', '2001:db8::/127', '', '10.0.1.0']
+
+    assert summarize_ip_ranges(ranges) == ['10.0.0.0-10.0.1.0', '2001:db8::-2001:db8::1']
+    assert summarize_ip_ranges(ranges, 'cidr') == ['10.0.0.0/24', '10.0.1.0/32', '2001:db8::/127']
+
+def test_summarize_cidr_matches_ipaddress():
+    rng = random.Random(1)
+    ranges = []
+    for _ in range(500):
+        base = f"172.16.{rng.randrange(8)}"
+        ranges.append(rng.choice((f"{base}.{rng.randrange(256)}", f"{base}.{rng.randrange(0, 256, 16)}/28",
+                                  f"{base}.{rng.randrange(100)}-{base}.{rng.randrange(100, 256)}",
+                                  f"2001:db8::{rng.randrange(512):x}/{rng.randrange(120, 129)}")))
+    networks = [ipaddress.ip_network(item, strict=False) if '-' not in item else None for item in ranges]
+    for item in ranges:
+        if '-' in item:
+            first, last = (ipaddress.ip_address(part) for part in item.split('-'))
+            networks.extend(ipaddress.summarize_address_range(first, last))
+    networks = [net for net in networks if net is not None]
+    expected = [str(net) for version in (4, 6)
+                for net in ipaddress.collapse_addresses(net for net in networks if net.version == version)]
+
+    assert summarize_ip_ranges(ranges, 'cidr') == expected
+
+@pytest.mark.parametrize('ranges, output', [(['10.0.0.1', 'bad'], 'range'), (['10.0.0.1'], 'prefix')])
+def test_summarize_rejects_invalid_input(ranges, output):
+    with pytest.raises(ValueError):
+        summarize_ip_ranges(ranges, output)
@@ -0,0 +1,109 @@
+import random
+import ipaddress
+import pytest
+from utils.ipset import IPSet
+
+# 随机输入所在的小范围，含地址空间两端，便于展开为地址集合比较
+REGIONS = [('10.0.0.0', 4), ('0.0.0.0', 4), ('255.255.255.0', 4), ('2001:db8::', 6), ('::', 6),
+           ('ffff:ffff:ffff:ffff:ffff:ffff:ffff:ff00', 6)]
+
+def _random_items(rng, count):
+    items = []
+    for _ in range(count):
+        base, version = rng.choice(REGIONS)
+        base = ipaddress.ip_address(base)
+        first = base + rng.randrange(256)
+        kind = rng.randrange(3)
+        if kind == 0:
+            items.append(str(first))
+        elif kind == 1:
+            last = base + rng.randrange(int(first) - int(base), 256)
+            items.append(f"{first}-{last}")
+        else:
+            prefixlen = (32 if version == 4 else 128) - rng.randrange(9)
+            items.append(str(ipaddress.ip_network(f"{first}/{prefixlen}", strict=False)))
+    return items
+
+def _expand_items(items):
+    """由 ipaddress 将输入展开为 (version, 地址) 集合"""
+    addresses = set()
+    for item in items:
+        if '-' in item:
+            first, last = (ipaddress.ip_address(part) for part in item.split('-'))
+            values = range(int(first), int(last) + 1)
+            version = first.version
+        else:
+            net = ipaddress.ip_network(item, strict=False)
+            values = range(int(net.network_address), int(net.broadcast_address) + 1)
+            version = net.version
+        addresses.update((version, value) for value in values)
+    return addresses
+
+def _expand(ipset):
+    return {(version, value) for version, start, end in ipset.intervals() for value in range(start, end + 1)}
+
+def _assert_normalized(ipset):
+    # 同一版本的区间有序、互不重叠且互不相邻
+    intervals = list(ipset.intervals())
+    for (version, _, end), (next_version, next_start, _) in zip(intervals, intervals[1:]):
+        assert version < next_version or end + 1 < next_start
+
+@pytest.mark.parametrize('seed', range(20))
+def test_set_operations_match_python_sets(seed):
+    rng = random.Random(seed)
+    a_items, b_items = _random_items(rng, rng.randrange(0, 12)), _random_items(rng, rng.randrange(0, 12))
+    a, b = IPSet(a_items), IPSet(b_items)
+    expected_a, expected_b = _expand_items(a_items), _expand_items(b_items)
+    assert _expand(a) == expected_a
+
+    for result, expected in [
+        (a | b, expected_a | expected_b),
+        (a & b, expected_a & expected_b),
+        (a - b, expected_a - expected_b),
+        (b - a, expected_b - expected_a),
+        (a ^ b, expected_a ^ expected_b),
+    ]:
+        assert _expand(result) == expected
+        assert result.num_addresses() == len(expected)
+        _assert_normalized(result)
+    assert a.issubset(a | b) and (a | b).issuperset(b)
+    assert (a - b).issubset(a) and not (a - b) & b
+
+def test_empty_set_operations():
+    empty, some = IPSet(), IPSet(['10.0.0.0/30', '2001:db8::1'])
+
+    assert not empty and len(empty) == 0
+    assert empty | some == some
+    assert not empty & some
+    assert some - empty == some
+    assert not empty - some
+    assert some ^ empty == some
+    assert not some ^ some
+    assert empty.issubset(some) and not some.issubset(empty)
+
+@pytest.mark.parametrize('version, full', [(4, '0.0.0.0/0'), (6, '::/0')])
+def test_full_address_space(version, full):
+    space = IPSet([full])
+    bits = 32 if version == 4 else 128
+    some = IPSet(['0.0.0.0', '10.0.0.0/8', '255.255.255.255'] if version == 4
+                 else ['::', '2001:db8::/32', 'ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff'])
+
+    assert space.num_addresses(version) == 1 << bits
+    assert space | some == space
+    assert space & some == some
+    assert not some - space
+    complement = space - some
+    assert complement.num_addresses() == (1 << bits) - some.num_addresses()
+    assert complement ^ space == some
+    assert complement | some == space
+    # 首末地址已被减去，补集不含地址空间两端
+    intervals = list(complement.intervals())
+    assert intervals[0][1] > 0 and intervals[-1][2] < (1 << bits) - 1
+
+def test_families_do_not_mix():
+    v4, v6 = IPSet(['0.0.0.0/0']), IPSet(['::/96'])
+
+    assert not v4 & v6
+    assert v4 - v6 == v4
+    assert (v4 | v6).num_addresses(4) == 1 << 32
+    assert (v4 | v6).num_addresses(6) == 1 << 32
@@ -0,0 +1,119 @@
+import os
+import time
+import pytest
+from utils import jobs
+from utils.doc_tools import DocConverter
+from utils.jobs import ConversionJobManager
+
+def _fake_conversion(kind, file_path, filename, docx_engine, soffice):
+    """文件名以 crash 开头时模拟转换进程被终止（如 OOM）"""
+    if filename.startswith('crash'):
+        os._exit(1)
+    return {'status': 'success', 'output_file': file_path, 'output_filename': filename}
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, '_run_conversion', _fake_conversion)
+    converter = DocConverter(upload_folder=str(tmp_path / 'uploads'), output_folder=str(tmp_path / 'converted'))
+    manager = ConversionJobManager(converter, max_workers=1)
+    yield manager
+    manager.shutdown()
+
+def _wait(manager, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = manager.status(job_id)
+        if status['status'] in ('success', 'failed', 'cancelled'):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f'job {job_id} did not finish')
+
+def test_broken_pool_fails_only_affected_job(tmp_path, manager):
+    source = tmp_path / 'uploads' / 'a.pdf'
+
+    source.write_bytes(b'%PDF-')
+    crashed = _wait(manager, manager.submit('pdf2docx', str(source), 'crash.pdf')['job_id'])
+    source.write_bytes(b'%PDF-')
+    after = _wait(manager, manager.submit('pdf2docx', str(source), 'report.pdf')['job_id'])
+
+    assert crashed['status'] == 'failed'
+    assert after['status'] == 'success'
+
+def _slow_conversion(kind, file_path, filename, docx_engine, soffice):
+    time.sleep(0.5)
+    return _fake_conversion(kind, file_path, filename, docx_engine, soffice)
+
+def test_job_state_is_shared_between_managers(tmp_path, monkeypatch):
+    # 模拟多个工作进程：任务由一个实例提交，由另一个实例轮询、下载和取消
+    monkeypatch.setattr(jobs, '_run_conversion', _slow_conversion)
+    converter = DocConverter(upload_folder=str(tmp_path / 'uploads'), output_folder=str(tmp_path / 'converted'))
+    db_path = str(tmp_path / 'jobs.db')
+    owner = ConversionJobManager(converter, max_workers=1, max_pending=1, db_path=db_path)
+    other = ConversionJobManager(converter, max_workers=1, max_pending=1, db_path=db_path)
+    try:
+        source = tmp_path / 'uploads' / 'a.pdf'
+        source.write_bytes(b'%PDF-')
+        job_id = owner.submit('pdf2docx', str(source), 'report.pdf')['job_id']
+        with pytest.raises(jobs.JobQueueFull):
+            other.submit('pdf2docx', str(source), 'other.pdf')
+
+        assert _wait(other, job_id)['status'] == 'success'
+        assert other.result(job_id)['output_filename'] == 'report.pdf'
+        assert other.cancel(job_id)['status'] == 'cancelled'
+        assert owner.status(job_id)['status'] == 'cancelled'
+    finally:
+        owner.shutdown()
+        other.shutdown()
+
+def test_cancelled_running_job_counts_until_it_returns(tmp_path, monkeypatch):
+    # 转换在任务进程中执行，以文件作为放行信号
+    release = tmp_path / 'release'
+
+    def blocking_conversion(kind, file_path, filename, docx_engine, soffice):
+        while not release.exists():
+            time.sleep(0.01)
+        return _fake_conversion(kind, file_path, filename, docx_engine, soffice)
+
+    monkeypatch.setattr(jobs, '_run_conversion', blocking_conversion)
+    converter = DocConverter(upload_folder=str(tmp_path / 'uploads'), output_folder=str(tmp_path / 'converted'))
+    manager = ConversionJobManager(converter, max_workers=1, max_pending=1)
+    try:
+        source = tmp_path / 'uploads' / 'a.pdf'
+        source.write_bytes(b'%PDF-')
+        job_id = manager.submit('pdf2docx', str(source), 'report.pdf')['job_id']
+        while manager.status(job_id)['status'] != 'running':
+            time.sleep(0.01)
+        assert manager.cancel(job_id)['status'] == 'cancelled'
+        # 转换进程仍在执行，取消后不能立即提交新任务
+        with pytest.raises(jobs.JobQueueFull):
+            manager.submit('pdf2docx', str(source), 'other.pdf')
+
+        release.touch()
+        deadline = time.time() + 10
+        while manager._jobs.get(job_id)['finished_at'] is None:
+            assert time.time() < deadline
+            time.sleep(0.01)
+        source.write_bytes(b'%PDF-')
+        assert _wait(manager, manager.submit('pdf2docx', str(source), 'other.pdf')['job_id'])['status'] == 'success'
+        assert manager.status(job_id)['status'] == 'cancelled'
+    finally:
+        release.touch()
+        manager.shutdown()
+
+def test_jobs_of_exited_owner_are_failed(tmp_path, manager):
+    source = tmp_path / 'uploads' / 'a.pdf'
+    source.write_bytes(b'%PDF-')
+    job = manager._new_job('pdf2docx', str(source), 'report.pdf')
+    manager._jobs.add(job)
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0)
+    os.waitpid(pid, 0)
+    with manager._jobs._lock:
+        manager._jobs._connection().execute('UPDATE jobs SET owner = ? WHERE job_id = ?', (pid, job['job_id']))
+
+    manager.purge_expired()
+
+    status = manager.status(job['job_id'])
+    assert status['status'] == 'failed'
+    assert not source.exists()
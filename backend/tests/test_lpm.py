@@ -0,0 +1,97 @@
+import os
+import time
+import random
+import ipaddress
+import pytest
+from utils.lpm import PrefixTable, LpmService, read_prefix_file
+
+def _random_prefixes(rng, count):
+    """在少数几个顶级网段内生成多层嵌套的前缀"""
+    prefixes = []
+    for _ in range(count):
+        root = rng.choice(('10.0.0.0', '192.168.0.0', '2001:db8::'))
+        version = 4 if '.' in root else 6
+        bits = 32 if version == 4 else 128
+        prefixlen = rng.randrange(bits - 16, bits + 1)
+        address = ipaddress.ip_address(root) + rng.randrange(1 << 16)
+        prefixes.append(str(ipaddress.ip_network(f"{address}/{prefixlen}", strict=False)))
+    return prefixes
+
+def _brute_force(networks, ip):
+    """逐条比较，取包含该地址的最长前缀；重复前缀以最后一条为准"""
+    address = ipaddress.ip_address(ip)
+    best = None
+    for net, label in networks:
+        if address.version == net.version and address in net and (best is None or net.prefixlen >= best[0].prefixlen):
+            best = (net, label)
+    return (str(best[0]), best[1]) if best else None
+
+@pytest.mark.parametrize('seed', range(5))
+def test_lookup_matches_brute_force(seed):
+    rng = random.Random(seed)
+    prefixes = _random_prefixes(rng, 200) + ['10.0.0.0/8', '10.0.0.0/8', '0.0.0.0/0', '2001:db8::/32']
+    entries = [(prefix, f"label-{index}") for index, prefix in enumerate(prefixes)]
+    table = PrefixTable(entries)
+    ips = [str(ipaddress.ip_address(rng.choice(('10.0.0.0', '192.168.0.0', '2001:db8::', '172.16.0.0', '2001:db9::')))
+               + rng.randrange(1 << 17)) for _ in range(1000)]
+
+    networks = [(ipaddress.ip_network(prefix), label) for prefix, label in entries]
+    expected = [_brute_force(networks, ip) for ip in ips]
+    assert [table.lookup(ip) for ip in ips] == expected
+    assert [(row['prefix'], row['label']) if row['prefix'] else None for row in table.lookup_many(ips)] == expected
+
+def test_lookup_nested_prefix_boundaries():
+    table = PrefixTable([('10.0.0.0/8', 'a'), ('10.1.0.0/16', 'b'), ('10.1.2.0/24', 'c'), ('10.1.2.128/25', 'd'),
+                         ('10.1.2.255', 'e'), ('11.0.0.0/8', 'f')])
+    cases = {
+        '9.255.255.255': None,
+        '10.0.0.0': ('10.0.0.0/8', 'a'),
+        '10.1.1.255': ('10.1.0.0/16', 'b'),
+        '10.1.2.0': ('10.1.2.0/24', 'c'),
+        '10.1.2.127': ('10.1.2.0/24', 'c'),
+        '10.1.2.128': ('10.1.2.128/25', 'd'),
+        '10.1.2.254': ('10.1.2.128/25', 'd'),
+        '10.1.2.255': ('10.1.2.255/32', 'e'),
+        '10.1.3.0': ('10.1.0.0/16', 'b'),
+        '10.255.255.255': ('10.0.0.0/8', 'a'),
+        '11.0.0.0': ('11.0.0.0/8', 'f'),
+        '12.0.0.0': None,
+        '2001:db8::1': None,
+    }
+    assert {ip: table.lookup(ip) for ip in cases} == cases
+    rows = table.lookup_many(list(cases) + ['bad'])
+    assert rows[-1]['error'] and rows[-1]['prefix'] is None
+
+def test_reload_picks_up_file_changes(tmp_path):
+    path = tmp_path / 'prefixes.csv'
+    path.write_text('prefix,label\n10.0.0.0/8,old\n')
+    service = LpmService(str(path), reload_interval=0.05)
+    assert service.table().lookup('10.1.1.1') == ('10.0.0.0/8', 'old')
+
+    path.write_text('10.0.0.0/8,new\n10.1.0.0/16,nested\n')
+    os.utime(path, (time.time() + 1, time.time() + 1))
+    deadline = time.time() + 10
+    while service.table().lookup('10.1.1.1') != ('10.1.0.0/16', 'nested'):
+        assert time.time() < deadline, 'prefix table was not reloaded'
+        time.sleep(0.05)
+    assert service.table().lookup('10.2.0.0') == ('10.0.0.0/8', 'new')
+
+    # 新文件有误时保留当前表
+    path.write_text('10.0.0.0/8,new\nnot-a-prefix\n')
+    with pytest.raises(ValueError):
+        service.reload()
+    assert service.table().lookup('10.1.1.1') == ('10.1.0.0/16', 'nested')
+
+def test_replace_is_visible_to_other_services(tmp_path):
+    path = str(tmp_path / 'prefixes.csv')
+    writer, reader = LpmService(path, reload_interval=0.05), LpmService(path, reload_interval=0.05)
+    assert reader.table().lookup('10.1.1.1') is None
+
+    writer.replace([('10.0.0.0/8', 'a,b'), ('2001:db8::/32', '')])
+
+    assert writer.table().lookup('10.1.1.1') == ('10.0.0.0/8', 'a,b')
+    assert read_prefix_file(path) == [('10.0.0.0/8', 'a,b'), ('2001:db8::/32', '')]
+    deadline = time.time() + 10
+    while reader.table().lookup('10.1.1.1') != ('10.0.0.0/8', 'a,b'):
+        assert time.time() < deadline, 'replaced table was not loaded from file'
+        time.sleep(0.05)
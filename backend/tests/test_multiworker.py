@@ -0,0 +1,124 @@
+import os
+import sys
+import json
+import time
+import socket
+import signal
+import subprocess
+import urllib.request
+import urllib.error
+import pytest
+
+pytest.importorskip('gunicorn')
+fitz = pytest.importorskip('fitz')
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKERS = 3
+
+# 按 serve.py 启动多进程服务；不在停止时清理上传目录，避免删除测试之外的文件
+LAUNCHER = '''
+import serve
+options = serve.gunicorn_options
+serve.gunicorn_options = lambda: dict(options(), on_exit=lambda server: None)
+serve.main()
+'''
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _request(base, method, path, body=None, json_body=None):
+    """每个请求使用新连接，由任意一个工作进程处理"""
+    headers = {}
+    if json_body is not None:
+        body = json.dumps(json_body).encode()
+        headers['Content-Type'] = 'application/json'
+    request = urllib.request.Request(base + path, data=body, method=method, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+@pytest.fixture
+def server(tmp_path):
+    port = _free_port()
+    env = dict(os.environ, SERVER_HOST='127.0.0.1', SERVER_PORT=str(port), SERVER_WORKERS=str(WORKERS),
+               SERVER_WORKER_CLASS='thread', CACHE_DIR=str(tmp_path), DOC_CACHE_MAX_MB='0',
+               LPM_RELOAD_INTERVAL='1', PDF_WORKERS='1')
+    process = subprocess.Popen([sys.executable, '-c', LAUNCHER], cwd=BACKEND, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 60
+    while True:
+        try:
+            if _request(base, 'GET', '/api/lpm/table')[0] == 200:
+                break
+        except OSError:
+            pass
+        if process.poll() is not None or time.time() > deadline:
+            process.kill()
+            pytest.fail('server did not start')
+        time.sleep(0.2)
+    yield base
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+def _pdf_bytes():
+    document = fitz.open()
+    for number in range(3):
+        document.new_page().insert_text((72, 72), f'page {number}')
+    data = document.tobytes()
+    document.close()
+    return data
+
+def test_chunked_upload_and_job_polling_across_workers(server):
+    pdf = _pdf_bytes()
+    status, body = _request(server, 'POST', '/api/doc/uploads', json_body={'filename': 'multi.pdf', 'size': len(pdf)})
+    assert status == 201
+    upload_id = json.loads(body)['data']['upload_id']
+
+    chunk = len(pdf) // 4 + 1
+    for offset in range(0, len(pdf), chunk):
+        status, body = _request(server, 'PUT', f'/api/doc/uploads/{upload_id}?offset={offset}',
+                                body=pdf[offset:offset + chunk])
+        assert status == 200, body
+        assert _request(server, 'GET', f'/api/doc/uploads/{upload_id}')[0] == 200
+
+    status, body = _request(server, 'POST', '/api/doc/jobs', json_body={'uploadId': upload_id})
+    assert status == 202, body
+    job_id = json.loads(body)['data']['job_id']
+
+    deadline = time.time() + 120
+    while True:
+        status, body = _request(server, 'GET', f'/api/doc/jobs/{job_id}')
+        assert status == 200, body
+        job = json.loads(body)['data']
+        if job['status'] not in ('queued', 'running') or time.time() > deadline:
+            break
+        time.sleep(0.1)
+    assert job['status'] == 'success', job
+
+    for _ in range(WORKERS * 2):
+        status, body = _request(server, 'GET', f'/api/doc/jobs/{job_id}/download')
+        assert status == 200
+        assert body.startswith(b'PK')
+    assert _request(server, 'DELETE', f'/api/doc/jobs/{job_id}')[0] == 200
+
+def test_prefix_table_update_reaches_all_workers(server):
+    prefixes = [{'prefix': '10.0.0.0/8', 'label': 'a'}, {'prefix': '10.1.0.0/16', 'label': 'b'}]
+    status, _ = _request(server, 'PUT', '/api/lpm/table', json_body={'prefixes': prefixes})
+    assert status == 200
+
+    # 其他工作进程在下次检查修改时间时加载新表
+    deadline = time.time() + 15
+    consecutive = 0
+    while consecutive < WORKERS * 4:
+        assert time.time() < deadline, 'prefix table did not propagate to all workers'
+        status, body = _request(server, 'GET', '/api/lpm/table')
+        consecutive = consecutive + 1 if json.loads(body)['data']['prefixes'] == 2 else 0
+        time.sleep(0.05)
@@ -0,0 +1,78 @@
+import re
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from utils.doc_tools import load_converter, PDF_CONVERT_SETTINGS
+from utils.pdf_scheduler import PdfConversionScheduler
+
+PAGES_PER_TASK = 4
+
+def _write_pdf(path, pages):
+    fitz = load_converter('pymupdf')
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {number + 1}", fontsize=18)
+        page.insert_text((72, 110), f"network 10.{number}.0.0/24", fontsize=11)
+    doc.save(str(path))
+    doc.close()
+
+@pytest.fixture
+def scheduler():
+    scheduler = PdfConversionScheduler(workers=2, pages_per_task=PAGES_PER_TASK)
+    yield scheduler
+    scheduler.shutdown()
+
+def _docx_text(path):
+    """docx 中的全部文本行"""
+    with zipfile.ZipFile(path) as docx:
+        xml = docx.read('word/document.xml').decode('utf-8')
+    return [text.strip() for text in re.findall(r'<w:t[^>]*>([^<]*)', xml)]
+
+def test_convert_splits_pages_into_tasks(tmp_path, scheduler):
+    """页数超过 pages_per_task 时按页拆分解析，再合并生成 docx"""
+    pdf_file, output_file = tmp_path / 'report.pdf', tmp_path / 'report.docx'
+    _write_pdf(pdf_file, 10)
+    progress = []
+
+    scheduler.convert(str(pdf_file), str(output_file), PDF_CONVERT_SETTINGS,
+                      progress=lambda done, total: progress.append((done, total)))
+
+    text = _docx_text(output_file)
+    assert [f'Page {number}' for number in range(1, 11)] == [line for line in text if line.startswith('Page')]
+    # 3 个解析任务 + 1 个生成任务
+    assert progress[-1] == (4, 4)
+    assert scheduler.stats()['running'] == 0
+
+def test_convert_small_document_in_single_task(tmp_path, scheduler):
+    pdf_file, output_file = tmp_path / 'small.pdf', tmp_path / 'small.docx'
+    _write_pdf(pdf_file, 2)
+
+    scheduler.convert(str(pdf_file), str(output_file), PDF_CONVERT_SETTINGS)
+
+    assert 'Page 2' in _docx_text(output_file)
+
+def _exit_once(marker):
+    """首次执行时模拟转换进程被终止（如 OOM），之后正常返回"""
+    import os
+    if not os.path.exists(marker):
+        open(marker, 'w').close()
+        os._exit(1)
+    return 'done'
+
+def _exit_always():
+    import os
+    os._exit(1)
+
+def _ok():
+    return 'ok'
+
+def test_broken_pool_is_rebuilt_and_task_retried(tmp_path, scheduler):
+    assert scheduler._submit('r1', _exit_once, str(tmp_path / 'marker')).result(timeout=30) == 'done'
+    assert scheduler._submit('r2', _ok).result(timeout=30) == 'ok'
+
+def test_task_fails_after_max_attempts_and_pool_recovers(scheduler):
+    with pytest.raises(BrokenProcessPool):
+        scheduler._submit('r1', _exit_always).result(timeout=30)
+    assert scheduler._submit('r2', _ok).result(timeout=30) == 'ok'
+    assert scheduler.stats()['running'] == 0
@@ -0,0 +1,160 @@
+import threading
+import pytest
+from utils import ip_tools
+from utils.rate_limit import TokenBucket, SingleFlight
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+def test_bucket_burst_then_queue(clock):
+    bucket = TokenBucket(60, burst=2, clock=clock)  # 每秒一个令牌
+
+    assert bucket.reserve(0) == 0
+    assert bucket.reserve(0) == 0
+    # 令牌不足：不愿等待的调用被拒绝且不消耗令牌，愿意等待的依次排队
+    assert bucket.reserve(0.5) is None
+    assert bucket.reserve(10) == pytest.approx(1.0)
+    assert bucket.reserve(10) == pytest.approx(2.0)
+    assert bucket.reserve(2.5) is None
+    assert bucket.stats() == {'rate_per_minute': 60.0, 'burst': 2, 'granted': 4, 'delayed': 2, 'shed': 2}
+
+def test_bucket_refills_up_to_burst(clock):
+    bucket = TokenBucket(60, burst=2, clock=clock)
+    bucket.reserve(0)
+    bucket.reserve(0)
+
+    clock.advance(1)
+    assert bucket.reserve(0) == 0
+    assert bucket.reserve(0) is None
+
+    # 长时间空闲后最多积累 burst 个令牌
+    clock.advance(100)
+    assert bucket.reserve(0) == 0
+    assert bucket.reserve(0) == 0
+    assert bucket.reserve(10) == pytest.approx(1.0)
+
+def test_bucket_pause(clock):
+    bucket = TokenBucket(60, burst=3, clock=clock)
+
+    bucket.pause(10)
+    assert bucket.reserve(5) is None
+    # 恢复时刻只放行一个请求，之后按速率发放
+    assert bucket.reserve(20) == pytest.approx(10.0)
+    assert bucket.reserve(20) == pytest.approx(11.0)
+
+    clock.advance(11)
+    assert bucket.reserve(0) is None
+    clock.advance(1)
+    assert bucket.reserve(0) == 0
+    # 暂停期间及恢复时刻都不补充令牌
+    bucket.pause(5)
+    clock.advance(5)
+    assert bucket.reserve(0) is None
+    clock.advance(1)
+    assert bucket.reserve(0) == 0
+
+class CountingFlight(SingleFlight):
+    """所有调用方都已认领（成为认领方或等待方）后才置位 all_claimed"""
+
+    def __init__(self, expected):
+        super().__init__()
+        self.expected = expected
+        self.claims = 0
+        self.all_claimed = threading.Event()
+
+    def claim(self, keys):
+        result = super().claim(keys)
+        with self._lock:
+            self.claims += 1
+            if self.claims >= self.expected:
+                self.all_claimed.set()
+        return result
+
+def _coalesced(flight, key, fn):
+    """与 ip_tools 中的用法相同：认领方执行，其他调用方等待其结果或异常"""
+    owned, waiting = flight.claim([key])
+    if waiting:
+        return waiting[key].result(timeout=10)
+    try:
+        result = fn()
+    except BaseException as e:
+        flight.reject(key, e)
+        raise
+    flight.resolve(key, result)
+    return result
+
+def _run_concurrently(count, target):
+    outcomes = [None] * count
+    barrier = threading.Barrier(count)
+
+    def run(index):
+        barrier.wait()
+        try:
+            outcomes[index] = ('ok', target())
+        except Exception as e:
+            outcomes[index] = ('error', e)
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return outcomes
+
+def test_single_flight_collapses_duplicate_calls():
+    flight, calls = CountingFlight(8), []
+
+    def call():
+        calls.append(1)
+        flight.all_claimed.wait(timeout=10)
+        return 'value'
+
+    outcomes = _run_concurrently(8, lambda: _coalesced(flight, 'key', call))
+
+    assert outcomes == [('ok', 'value')] * 8
+    assert len(calls) == 1
+    assert flight.inflight() == 0
+
+def test_single_flight_propagates_exception_to_waiters():
+    flight, error = CountingFlight(8), RuntimeError('upstream failed')
+
+    def fail():
+        flight.all_claimed.wait(timeout=10)
+        raise error
+
+    outcomes = _run_concurrently(8, lambda: _coalesced(flight, 'key', fail))
+
+    assert outcomes == [('error', error)] * 8
+    assert flight.inflight() == 0
+    # 失败后同一键可以重新认领
+    assert flight.claim(['key']) == (['key'], {})
+
+def test_location_query_failure_reaches_coalesced_callers(monkeypatch):
+    monkeypatch.setattr(ip_tools.config, 'GEO_BACKEND', 'online')
+    flight = CountingFlight(6)
+    monkeypatch.setattr(ip_tools, '_inflight', flight)
+    monkeypatch.setattr(ip_tools, '_resolve_locally', lambda ip: None)
+    calls = []
+
+    def fetch(ip, deadline):
+        calls.append(ip)
+        flight.all_claimed.wait(timeout=10)
+        raise ConnectionError('upstream unreachable')
+
+    monkeypatch.setattr(ip_tools, '_fetch_location', fetch)
+    outcomes = _run_concurrently(6, lambda: ip_tools.query_ip_location('203.0.113.9'))
+
+    assert calls == ['203.0.113.9']
+    assert [kind for kind, _ in outcomes] == ['error'] * 6
+    assert all(isinstance(error, ConnectionError) for _, error in outcomes)
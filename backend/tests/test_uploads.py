@@ -0,0 +1,55 @@
+import io
+import hashlib
+import pytest
+from utils.uploads import UploadManager, UploadError
+
+PDF = b'%PDF-1.4\n' + b'0' * 100
+
+@pytest.fixture
+def manager(tmp_path):
+    return UploadManager(str(tmp_path), max_bytes=1024, chunk_size=16)
+
+def test_same_filename_uploads_do_not_overwrite(manager):
+    first = manager.save(io.BytesIO(PDF), 'report.pdf')
+    second = manager.save(io.BytesIO(PDF + b'1'), 'report.pdf')
+
+    assert first['filename'] == second['filename'] == 'report.pdf'
+    assert first['path'] != second['path']
+    with open(first['path'], 'rb') as f:
+        assert f.read() == PDF
+
+def test_chunked_upload_path_is_scoped_to_upload_id(manager):
+    saved = manager.save(io.BytesIO(PDF), 'report.pdf')
+    session = manager.create('report.pdf', len(PDF))
+    manager.append(session['upload_id'], io.BytesIO(PDF), 0)
+
+    completed = manager.complete(session['upload_id'])
+
+    assert completed['filename'] == 'report.pdf'
+    assert session['upload_id'] in completed['path']
+    assert completed['path'] != saved['path']
+
+def test_rejects_mismatched_content(manager):
+    with pytest.raises(UploadError):
+        manager.save(io.BytesIO(b'PK\x03\x04' + b'0' * 10), 'report.pdf')
+
+def test_chunked_upload_spans_manager_instances(tmp_path):
+    # 模拟多个工作进程：各分块由不同的管理器实例接收
+    first = UploadManager(str(tmp_path), max_bytes=1024, chunk_size=16)
+    second = UploadManager(str(tmp_path), max_bytes=1024, chunk_size=16)
+    session = first.create('report.pdf', len(PDF))
+    upload_id = session['upload_id']
+
+    second.append(upload_id, io.BytesIO(PDF[:40]), 0)
+    assert first.status(upload_id)['received'] == 40
+    with pytest.raises(UploadError) as exc:
+        first.append(upload_id, io.BytesIO(PDF[40:]), 0)
+    assert exc.value.status == 409
+    first.append(upload_id, io.BytesIO(PDF[40:]), 40)
+
+    completed = second.complete(upload_id)
+    with open(completed['path'], 'rb') as f:
+        assert f.read() == PDF
+    assert completed['sha256'] == hashlib.sha256(PDF).hexdigest()
+    with pytest.raises(UploadError):
+        first.status(upload_id)
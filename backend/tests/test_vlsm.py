@@ -0,0 +1,82 @@
+import os
+import random
+import ipaddress
+import pytest
+from utils.vlsm import allocate_vlsm
+
+def _check_plan(network, requirements, allocations, free, unallocated):
+    parent = ipaddress.ip_network(network, strict=False)
+    reserved = 2 if parent.version == 4 else 1
+    blocks = [ipaddress.ip_network(allocation['subnet']) for allocation in allocations]
+    blocks += [ipaddress.ip_network(block['subnet']) for block in free]
+
+    # 分配块与空闲块都在主网段内，互不重叠，合起来恰好覆盖主网段
+    assert all(block.subnet_of(parent) for block in blocks)
+    blocks.sort()
+    for block, following in zip(blocks, blocks[1:]):
+        assert int(block.broadcast_address) < int(following.network_address)
+    assert sum(block.num_addresses for block in blocks) == parent.num_addresses
+
+    for allocation in allocations:
+        block = ipaddress.ip_network(allocation['subnet'])
+        if allocation['requested_hosts'] is not None:
+            # 容纳所需主机数的最小块
+            assert block.num_addresses - reserved >= allocation['requested_hosts']
+            assert block.prefixlen == parent.max_prefixlen or block.num_addresses // 2 - reserved < allocation['requested_hosts']
+    assert len(allocations) + len(unallocated) == sum(
+        item.get('count', 1) if isinstance(item, dict) else 1 for item in requirements)
+
+@pytest.mark.parametrize('seed', range(30))
+def test_random_plans_fit_without_overlap(seed):
+    rng = random.Random(seed)
+    network = rng.choice(('10.0.0.0/16', '192.168.4.0/22', '172.16.0.0/24', '2001:db8::/112'))
+    # 单个需求不超过主网段，空间不足时部分需求未分配
+    capacity = ipaddress.ip_network(network).num_addresses - 2
+    choices = [hosts for hosts in (1, 2, 3, 14, 30, 62, 100, 254, 500, 1000, 4000) if hosts <= capacity]
+    requirements = []
+    for _ in range(rng.randrange(1, 12)):
+        item = {'hosts': rng.choice(choices)}
+        if rng.random() < 0.3:
+            item['count'] = rng.randrange(1, 6)
+        requirements.append(item if rng.random() < 0.8 else item['hosts'])
+
+    allocations, free, unallocated = allocate_vlsm(network, requirements)
+
+    _check_plan(network, requirements, allocations, free, unallocated)
+
+def test_exact_fit_and_shortage():
+    allocations, free, unallocated = allocate_vlsm('10.0.0.0/24', [{'name': 'a', 'hosts': 100}, {'hosts': 50, 'count': 2}])
+    assert [allocation['subnet'] for allocation in allocations] == ['10.0.0.0/25', '10.0.0.128/26', '10.0.0.192/26']
+    assert free == [] and unallocated == []
+
+    allocations, free, unallocated = allocate_vlsm('10.0.0.0/24', [{'name': 'a', 'hosts': 100}, {'name': 'b', 'hosts': 100},
+                                                                   {'name': 'c', 'hosts': 100}])
+    assert [allocation['name'] for allocation in allocations] == ['a', 'b']
+    assert [item['name'] for item in unallocated] == ['c']
+
+@pytest.mark.parametrize('network, requirements', [
+    ('10.0.0.0/24', [{'hosts': 300}]),
+    ('10.0.0.0/30', [2, {'prefixlen': 29}]),
+    ('2001:db8::/120', [{'hosts': 256}]),
+])
+def test_parent_too_small_is_rejected(network, requirements):
+    with pytest.raises(ValueError):
+        allocate_vlsm(network, requirements)
+
+@pytest.fixture
+def client():
+    # 不启动定时任务，也不在退出时清空临时目录
+    os.environ.setdefault('APP_SERVER_MANAGED', '1')
+    from app import app
+    return app.test_client()
+
+def test_vlsm_route(client):
+    response = client.post('/api/network/vlsm', json={'network': '10.0.0.0/24', 'requirements': [60, 60, 120]})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [allocation['subnet'] for allocation in body['data']] == ['10.0.0.128/26', '10.0.0.192/26', '10.0.0.0/25']
+    assert body['free'] == [] and body['unallocated'] == []
+
+    response = client.post('/api/network/vlsm', json={'network': '10.0.0.0/24', 'requirements': [{'hosts': 1000}]})
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
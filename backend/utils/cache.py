@@ -0,0 +1,256 @@
+import os
+import shutil
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from utils.logger import app_logger
+
+class SQLiteStore:
+    """基于SQLite的持久化缓存层，进程重启后仍然有效"""
+
+    def __init__(self, path, namespace):
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        self.path = path
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._pid = os.getpid()
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, '
+            'expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))'
+        )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _connection(self):
+        """SQLite 连接不能跨 fork 使用，预加载后 fork 出的工作进程各自重新连接"""
+        if self._pid != os.getpid():
+            self._conn = self._connect()
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key):
+        """返回 (expires_at, value)，不存在或已过期时返回 None"""
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?',
+                (self.namespace, key)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row[1], json.loads(row[0])
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._connection().execute(
+                'INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)',
+                (self.namespace, key, json.dumps(value, ensure_ascii=False), expires_at)
+            )
+
+    def purge_expired(self):
+        """删除已过期的记录"""
+        with self._lock:
+            self._connection().execute(
+                'DELETE FROM cache WHERE namespace = ? AND expires_at <= ?',
+                (self.namespace, time.time())
+            )
+
+    def clear(self):
+        with self._lock:
+            self._connection().execute('DELETE FROM cache WHERE namespace = ?', (self.namespace,))
+
+class TTLCache:
+    """
+    线程安全的 LRU + TTL 缓存
+    :param maxsize: 内存中最多保存的条目数，超出后淘汰最久未使用的条目
+    :param ttl: 默认过期时间（秒），可在 set() 时为单个条目指定
+    :param persist_path: SQLite 文件路径，提供时启用持久化层（值需可JSON序列化）
+    :param name: 缓存名称，同时作为持久化层的命名空间
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, persist_path=None, name='cache'):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'persistent_hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+        self._store = None
+        if persist_path:
+            try:
+                self._store = SQLiteStore(persist_path, name)
+                self._store.purge_expired()
+            except Exception as e:
+                app_logger.warning(f"Persistent cache disabled for {name}: {str(e)}")
+
+    @staticmethod
+    def _store_key(key):
+        return key if isinstance(key, str) else json.dumps(key, ensure_ascii=False)
+
+    def _put(self, key, expires_at, value):
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def get_entry(self, key):
+        """返回 (value, 剩余秒数)，未命中时返回 None"""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._data.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return entry[1], entry[0] - now
+                del self._data[key]
+                self._stats['expirations'] += 1
+
+        if self._store is not None:
+            try:
+                stored = self._store.get(self._store_key(key))
+            except Exception as e:
+                app_logger.warning(f"Persistent cache read failed for {self.name}: {str(e)}")
+                stored = None
+            if stored is not None:
+                expires_at, value = stored
+                with self._lock:
+                    self._put(key, expires_at, value)
+                    self._stats['persistent_hits'] += 1
+                return value, expires_at - now
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def get(self, key, default=None):
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._put(key, expires_at, value)
+        if self._store is not None:
+            try:
+                self._store.set(self._store_key(key), value, expires_at)
+            except Exception as e:
+                app_logger.warning(f"Persistent cache write failed for {self.name}: {str(e)}")
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+        if self._store is not None:
+            self._store.clear()
+
+    def stats(self):
+        """命中率等统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._data)
+        lookups = stats['hits'] + stats['persistent_hits'] + stats['misses']
+        stats['maxsize'] = self.maxsize
+        stats['persistent'] = self._store is not None
+        stats['hit_rate'] = round((stats['hits'] + stats['persistent_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+class FileStore:
+    """
+    内容寻址的文件缓存，按总字节数做 LRU 淘汰
+    文件名即缓存键，进程重启后从目录中恢复索引（按最近访问时间排序）
+    :param folder: 缓存目录
+    :param max_bytes: 缓存总大小上限
+    :param name: 缓存名称，用于日志
+    """
+
+    def __init__(self, folder, max_bytes, name='files'):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.name = name
+        self._entries = OrderedDict()  # key -> 文件大小
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        os.makedirs(folder, exist_ok=True)
+
+        files = []
+        for filename in os.listdir(folder):
+            path = os.path.join(folder, filename)
+            if filename.startswith('.') or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            files.append((stat.st_atime, filename, stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._size += size
+        with self._lock:
+            self._evict()
+
+    def _path(self, key):
+        return os.path.join(self.folder, key)
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            self._stats['evictions'] += 1
+            try:
+                os.remove(self._path(key))
+            except OSError as e:
+                app_logger.warning(f"File cache eviction failed for {self.name}: {str(e)}")
+
+    def get(self, key):
+        """返回缓存文件路径，未命中时返回 None"""
+        path = self._path(key)
+        with self._lock:
+            if key in self._entries and os.path.exists(path):
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+            else:
+                if key in self._entries:
+                    self._size -= self._entries.pop(key)
+                self._stats['misses'] += 1
+                return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def put(self, key, source_path):
+        """复制文件到缓存中，返回缓存文件路径；文件超过缓存上限时不缓存并返回 None"""
+        size = os.path.getsize(source_path)
+        if size > self.max_bytes:
+            return None
+        path = self._path(key)
+        tmp_path = os.path.join(self.folder, f".{key}.{threading.get_ident()}.tmp")
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._size -= self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._size += size
+            self._stats['stores'] += 1
+            self._evict()
+        return path
+
+    def stats(self):
+        """命中率等统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['files'] = len(self._entries)
+            stats['size'] = self._size
+        lookups = stats['hits'] + stats['misses']
+        stats['max_bytes'] = self.max_bytes
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
@@ -1,38 +1,114 @@
 import dns.resolver
+import dns.asyncresolver
+import dns.rdatatype
 import dns.reversename
 from dns.exception import DNSException
-import concurrent.futures
+import asyncio
 import threading
+import time
 import logging
+import config
+from utils.cache import TTLCache
+from utils.metrics import UPSTREAM_SECONDS
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# 创建线程本地存储的解析器
-thread_local = threading.local()
-
-def get_resolver():
-    """获取线程本地的DNS解析器"""
-    if not hasattr(thread_local, 'resolver'):
-        thread_local.resolver = dns.resolver.Resolver()
-        # 设置超时时间
-        thread_local.resolver.timeout = 3
-        thread_local.resolver.lifetime = 3
-        # 使用可靠的DNS服务器
-        thread_local.resolver.nameservers = [
-            '8.8.8.8',  # Google DNS
-            '1.1.1.1',  # Cloudflare DNS
-            '223.5.5.5'  # AliDNS
-        ]
-    return thread_local.resolver
+# 进程内共享的DNS应答缓存，按 (域名, 记录类型) 缓存并遵循记录TTL
+_dns_cache = TTLCache(
+    maxsize=config.DNS_CACHE_SIZE,
+    ttl=config.DNS_NEGATIVE_TTL,
+    name='dns'
+)
 
-def query_single_record(domain, record_type):
-    """查询单个DNS记录"""
+# 常驻事件循环线程及其上的异步解析器、全局并发限制，首次使用时创建
+_loop = None
+_resolver = None
+_semaphore = None
+_loop_lock = threading.Lock()
+
+def _make_resolver():
+    """创建异步DNS解析器"""
+    resolver = dns.asyncresolver.Resolver()
+    # 设置超时时间
+    resolver.timeout = config.DNS_TIMEOUT
+    resolver.lifetime = config.DNS_TIMEOUT
+    # 使用可靠的DNS服务器，测试时可指向本地桩服务
+    resolver.nameservers = list(config.DNS_NAMESERVERS)
+    resolver.port = config.DNS_PORT
+    return resolver
+
+def _get_loop():
+    """获取常驻的事件循环，所有DNS查询都在该线程上并发执行"""
+    global _loop, _resolver, _semaphore
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name='dns-loop', daemon=True)
+                thread.start()
+                _resolver = _make_resolver()
+                _semaphore = asyncio.Semaphore(config.DNS_MAX_CONCURRENCY)
+                _loop = loop
+    return _loop
+
+def _run(coro):
+    """在事件循环线程上执行协程并等待结果"""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+def _negative_ttl(error):
+    """从否定应答的 SOA 记录计算负缓存时间：min(SOA TTL, SOA minimum)"""
+    try:
+        if isinstance(error, dns.resolver.NXDOMAIN):
+            responses = list(error.responses().values())
+        else:
+            responses = [error.kwargs['response']]
+        for response in responses:
+            for rrset in response.authority:
+                if rrset.rdtype == dns.rdatatype.SOA:
+                    return min(rrset.ttl, rrset[0].minimum)
+    except Exception:
+        pass
+    return config.DNS_NEGATIVE_TTL
+
+def _error_result(domain, record_type, value):
+    """构造失败/否定应答的查询结果"""
+    return {
+        'type': record_type,
+        'records': [{
+            'name': domain,
+            'type': record_type,
+            'value': value,
+            'ttl': 0
+        }]
+    }
+
+def _outcome(error):
+    if isinstance(error, dns.resolver.NXDOMAIN):
+        return 'nxdomain'
+    if isinstance(error, dns.resolver.NoAnswer):
+        return 'noanswer'
+    if isinstance(error, dns.resolver.Timeout):
+        return 'timeout'
+    return 'error'
+
+async def _resolve_record(domain, record_type):
+    """
+    向上游查询单个DNS记录
+    :return: (查询结果, 可缓存时间)，可缓存时间为0表示不缓存
+    """
     try:
         logger.info(f"开始查询 {domain} 的 {record_type} 记录")
-        resolver = get_resolver()
-        answers = resolver.resolve(domain, record_type)
+        async with _semaphore:
+            started = time.perf_counter()
+            try:
+                answers = await _resolver.resolve(domain, record_type)
+            except Exception as e:
+                UPSTREAM_SECONDS.observe(time.perf_counter() - started, 'dns', '-', _outcome(e))
+                raise
+        # 按实际应答的DNS服务器分别统计，便于发现较慢的服务器
+        UPSTREAM_SECONDS.observe(time.perf_counter() - started, 'dns', answers.nameserver, 'ok')
         records = []
         
         for rdata in answers:
@@ -54,96 +130,156 @@ def query_single_record(domain, record_type):
         return {
             'type': record_type,
             'records': records
-        }
+        }, answers.ttl
                 
-    except dns.resolver.NXDOMAIN:
+    except dns.resolver.NXDOMAIN as e:
         logger.warning(f"域名 {domain} 不存在")
-        return {
-            'type': record_type,
-            'records': [{
-                'name': domain,
-                'type': record_type,
-                'value': '域名不存在',
-                'ttl': 0
-            }]
-        }
-    except dns.resolver.NoAnswer:
+        return _error_result(domain, record_type, '域名不存在'), _negative_ttl(e)
+    except dns.resolver.NoAnswer as e:
         logger.warning(f"域名 {domain} 没有 {record_type} 记录")
-        return {
-            'type': record_type,
-            'records': [{
-                'name': domain,
-                'type': record_type,
-                'value': f'没有 {record_type} 记录',
-                'ttl': 0
-            }]
-        }
+        return _error_result(domain, record_type, f'没有 {record_type} 记录'), _negative_ttl(e)
     except dns.resolver.Timeout:
         logger.error(f"查询 {domain} 的 {record_type} 记录超时")
-        return {
-            'type': record_type,
-            'records': [{
-                'name': domain,
-                'type': record_type,
-                'value': '查询超时',
-                'ttl': 0
-            }]
-        }
+        return _error_result(domain, record_type, '查询超时'), 0
     except DNSException as e:
         logger.error(f"DNS查询异常: {str(e)}")
-        return {
-            'type': record_type,
-            'records': [{
-                'name': domain,
-                'type': record_type,
-                'value': f'查询失败: {str(e)}',
-                'ttl': 0
-            }]
-        }
+        return _error_result(domain, record_type, f'查询失败: {str(e)}'), 0
     except Exception as e:
         logger.error(f"未知错误: {str(e)}")
-        return {
-            'type': record_type,
-            'records': [{
-                'name': domain,
-                'type': record_type,
-                'value': f'查询错误: {str(e)}',
-                'ttl': 0
-            }]
-        }
+        return _error_result(domain, record_type, f'查询错误: {str(e)}'), 0
+
+def _cache_key(domain, record_type):
+    return domain.lower().rstrip('.'), record_type.upper()
+
+def _cached_record(domain, record_type):
+    """从应答缓存读取，未命中时返回 None"""
+    entry = _dns_cache.get_entry(_cache_key(domain, record_type))
+    if entry is None:
+        return None
+    result, remaining = entry
+    # 返回剩余TTL，与递归解析器的行为一致
+    ttl = max(int(remaining), 0)
+    return {
+        'type': result['type'],
+        'records': [dict(record, name=domain, ttl=ttl if record['ttl'] else 0)
+                    for record in result['records']]
+    }
+
+async def _query_record(domain, record_type):
+    """查询单个DNS记录并写入缓存"""
+    result, ttl = await _resolve_record(domain, record_type)
+    ttl = min(ttl, config.DNS_CACHE_MAX_TTL)
+    if ttl > 0:
+        _dns_cache.set(_cache_key(domain, record_type), result, ttl=ttl)
+    return result
+
+def query_single_record(domain, record_type):
+    """查询单个DNS记录，优先使用进程内共享的应答缓存"""
+    result = _cached_record(domain, record_type)
+    if result is not None:
+        return result
+    return _run(_query_record(domain, record_type))
+
+def get_dns_cache_stats():
+    """获取DNS应答缓存统计信息"""
+    return _dns_cache.stats()
+
+async def _query_records(domain, record_types):
+    """同时发起所有记录类型的查询"""
+    results = await asyncio.gather(
+        *(_query_record(domain, record_type) for record_type in record_types),
+        return_exceptions=True
+    )
+    return dict(zip(record_types, results))
+
+def _cached_records(domain, record_types):
+    """读取所有记录类型的缓存，返回 (已有结果, 需要查询的记录类型)"""
+    answers = {record_type: _cached_record(domain, record_type) for record_type in record_types}
+    pending = [record_type for record_type, result in answers.items() if result is None]
+    return answers, pending
+
+def _collect_results(domain, record_types, answers):
+    """按请求的记录类型顺序整理查询结果"""
+    results = []
+    for record_type in record_types:
+        result = answers[record_type]
+        if isinstance(result, Exception):
+            logger.error(f"处理查询结果时出错: {str(result)}")
+            results.append(_error_result(domain, record_type, f'查询异常: {str(result)}'))
+        elif result and result.get('records'):
+            results.append(result)
+    return results
 
 def query_dns_records(domain, record_types):
-    """并发查询多个DNS记录"""
+    """并发查询多个DNS记录，缓存未命中的记录类型在事件循环上同时查询"""
     logger.info(f"开始查询域名 {domain} 的记录: {record_types}")
-    results = []
-    
-    # 使用线程池并发查询
-    with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(record_types), 3)) as executor:
-        future_to_type = {
-            executor.submit(query_single_record, domain, record_type): record_type
-            for record_type in record_types
-        }
-        
-        # 收集结果
-        for future in concurrent.futures.as_completed(future_to_type):
-            try:
-                result = future.result()
-                if result and result.get('records'):
-                    results.append(result)
-            except Exception as e:
-                record_type = future_to_type[future]
-                logger.error(f"处理查询结果时出错: {str(e)}")
-                results.append({
-                    'type': record_type,
-                    'records': [{
-                        'name': domain,
-                        'type': record_type,
-                        'value': f'查询异常: {str(e)}',
-                        'ttl': 0
-                    }]
-                })
-    
-    # 按记录类型排序
-    results.sort(key=lambda x: record_types.index(x['type']))
+    record_types = list(dict.fromkeys(record_types))
+    answers, pending = _cached_records(domain, record_types)
+    if pending:
+        answers.update(_run(_query_records(domain, pending)))
+
+    results = _collect_results(domain, record_types, answers)
     logger.info(f"查询完成，共获取 {len(results)} 种记录")
-    return results 
\ No newline at end of file
+    return results
+
+async def _bulk_query(domains, record_types, output):
+    """
+    批量查询多个域名，每完成一个域名就放入输出队列，最后放入 None 表示结束
+    输出队列有界，调用方读取较慢时查询随之暂停，已完成但未读取的结果不会无限累积
+    """
+    limit = asyncio.Semaphore(config.DNS_BULK_CONCURRENCY)
+
+    async def query_domain(domain):
+        async with limit:
+            started = time.perf_counter()
+            answers, pending = _cached_records(domain, record_types)
+            if pending:
+                answers.update(await _query_records(domain, pending))
+            # 结果放入队列后才释放并发名额
+            await output.put({
+                'domain': domain,
+                'data': _collect_results(domain, record_types, answers),
+                'cached': not pending,
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 3)
+            })
+
+    tasks = [asyncio.ensure_future(query_domain(domain)) for domain in domains]
+    try:
+        await asyncio.gather(*tasks)
+    except asyncio.CancelledError:
+        # 调用方已不再读取（gather 会一并取消各查询），不放入结束标记，队列已满时会一直等待
+        raise
+    except Exception:
+        for task in tasks:
+            task.cancel()
+        await output.put(None)
+        raise
+    await output.put(None)
+
+async def _new_queue(maxsize):
+    """asyncio.Queue 须在事件循环线程上创建"""
+    return asyncio.Queue(maxsize)
+
+def iter_bulk_dns_records(domains, record_types):
+    """
+    批量查询多个域名的DNS记录
+    域名之间并发数受 DNS_BULK_CONCURRENCY 限制，上游查询总数仍受全局并发限制
+    :return: 生成器，按完成顺序逐个产出 {'domain', 'data', 'cached', 'elapsed_ms'}
+    """
+    domains = list(dict.fromkeys(domains))
+    record_types = list(dict.fromkeys(record_types))
+    logger.info(f"开始批量查询 {len(domains)} 个域名的记录: {record_types}")
+
+    loop = _get_loop()
+    output = _run(_new_queue(config.DNS_BULK_CONCURRENCY))
+    future = asyncio.run_coroutine_threadsafe(_bulk_query(domains, record_types, output), loop)
+    try:
+        while True:
+            item = asyncio.run_coroutine_threadsafe(output.get(), loop).result()
+            if item is None:
+                break
+            yield item
+        future.result()
+    finally:
+        # 客户端中途断开时取消剩余查询
+        future.cancel()
@@ -1,13 +1,97 @@
 import os
 import shutil
-from pdf2docx import Converter
-from docx2pdf import convert
+import importlib
+import threading
 from utils.logger import app_logger
+from utils.metrics import CONVERSION_PHASE_SECONDS
 import time
-import pythoncom  # 导入 pythoncom
+from utils.docx_backends import create_docx_backend, resolve_backend_name
+import hashlib
+import json
+import uuid
+
+# 转换库注册表：名称 -> (模块, 属性)，属性为 None 时返回模块本身
+# 转换库（PyMuPDF、OpenCV、fonttools 等）导入耗时且占用内存，只在首次转换时导入，
+# 只提供IP/DNS接口的进程不会加载它们
+CONVERTER_LIBRARIES = {
+    'pdf2docx': ('pdf2docx', 'Converter'),
+    'pymupdf': ('fitz', None)
+}
+_loaded_libraries = {}
+_library_lock = threading.Lock()
+
+def load_converter(name):
+    """按名称导入转换库，导入结果在进程内缓存"""
+    library = _loaded_libraries.get(name)
+    if library is not None:
+        return library
+    if name not in CONVERTER_LIBRARIES:
+        raise ValueError(f"未注册的转换库: {name}")
+    module_name, attribute = CONVERTER_LIBRARIES[name]
+    with _library_lock:
+        if name not in _loaded_libraries:
+            started = time.perf_counter()
+            module = importlib.import_module(module_name)
+            _loaded_libraries[name] = getattr(module, attribute) if attribute else module
+            app_logger.info(f"Converter library loaded - Name: {name}, "
+                            f"Time: {time.perf_counter() - started:.2f}s")
+    return _loaded_libraries[name]
+
+# pdf2docx 转换参数，同时参与转换结果缓存的键计算
+PDF_CONVERT_SETTINGS = {
+    'tables_settings': {
+        'text_settings': {
+            'line_overlap': 0.8,
+            'font_size_detection': True,  # 启用字体大小检测
+            'char_inclusion': 0.9,  # 字符包含阈值
+            'char_distance': 0.3,  # 字符距离阈值
+        },
+        'table_settings': {
+            'min_rows': 1,
+            'min_cols': 1,
+            'edge_min_length': 3,
+            'cell_min_size': 3,
+        }
+    },
+    'text_settings': {
+        'line_margin': 0.1,
+        'line_overlap': 0.9,
+        'line_break_width': 5,
+        'line_break_free_space_ratio': 0.1,
+        'line_separate_threshold': 5,
+        'line_spacing_threshold': 5,
+        'line_merge_threshold': 2,
+        'line_height_threshold': 2,
+        'line_width_threshold': 2,
+        'line_alignment_threshold': 0.1,
+        'preserve_space': True,  # 保留空格
+        'detect_chinese': True,  # 检测中文
+        'char_merging_threshold': 0.3,  # 字符合并阈值
+    },
+    'image_settings': {
+        'min_image_area': 100,
+        'max_image_area': None,
+        'min_image_height': 10,
+        'min_image_width': 10,
+    },
+    'layout_settings': {
+        'section_height': None,
+        'section_width': None,
+        'section_overlap': 0.9,
+        'section_margin': 0.1,
+        'preserve_layout': True,  # 保留布局
+    }
+}
 
 class DocConverter:
-    def __init__(self, upload_folder='uploads', output_folder='converted'):
+    def __init__(self, upload_folder='uploads', output_folder='converted', scheduler=None,
+                 docx_pool=None, docx_engine='auto', soffice='soffice'):
+        # 共享的 PDF 转换调度器（PdfConversionScheduler），未提供时在当前进程中单进程转换
+        self.scheduler = scheduler
+        # 常驻的 DOCX 转换进程池（DocxConverterPool），未提供时每次启动一个转换程序
+        self.docx_pool = docx_pool
+        self.docx_engine = resolve_backend_name(docx_engine)
+        self.soffice = soffice
         # 创建上传和输出目录
         self.upload_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), upload_folder)
         self.output_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), output_folder)
@@ -17,6 +101,46 @@ class DocConverter:
             if not os.path.exists(folder):
                 os.makedirs(folder)
 
+    @staticmethod
+    def output_filename(kind, original_filename):
+        """根据转换类型由原始文件名生成输出文件名"""
+        if kind == 'pdf2docx':
+            # 使用原始文件名（去掉.pdf后缀，添加.docx后缀）
+            if original_filename.lower().endswith('.pdf'):
+                return original_filename[:-4] + '.docx'
+            return original_filename + '.docx'
+
+        base_name = original_filename
+        if base_name.lower().endswith('.docx'):
+            base_name = base_name[:-5]  # 移除 .docx
+        elif base_name.lower().endswith('.doc'):
+            base_name = base_name[:-4]  # 移除 .doc
+        
+        # 确保base_name不为空
+        if not base_name:
+            base_name = "converted"
+        return f"{base_name}.pdf"
+
+    def output_path(self, output_filename):
+        """输出文件的保存路径：以随机ID为前缀，同名文件并发转换时互不覆盖，下载时仍使用 output_filename"""
+        return os.path.join(self.output_folder, f"{uuid.uuid4().hex}_{output_filename}")
+
+    def settings_fingerprint(self, kind):
+        """转换参数的指纹，参数或转换引擎变化后缓存键随之变化"""
+        settings = PDF_CONVERT_SETTINGS if kind == 'pdf2docx' else self.docx_engine
+        payload = json.dumps([kind, settings], sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    def cache_key(self, kind, digest):
+        """转换结果缓存键：源文件内容哈希 + 转换类型 + 转换参数指纹"""
+        return f"{digest}-{kind}-{self.settings_fingerprint(kind)}"
+
+    def uses_shared_workers(self, kind):
+        """该类型的转换是否由共享的常驻进程执行（调用方只需在线程中等待）"""
+        if kind == 'pdf2docx':
+            return self.scheduler is not None
+        return self.docx_pool is not None
+
     def _cleanup_files(self, *files):
         """清理临时文件"""
         for file in files:
@@ -41,62 +165,29 @@ class DocConverter:
             except Exception as e:
                 app_logger.warning(f"Failed to cleanup file {file}: {str(e)}", exc_info=True)
 
-    def _safe_convert_pdf(self, pdf_file, output_file):
+    def _safe_convert_pdf(self, pdf_file, output_file, progress=None):
         """安全的PDF转换处理"""
+        if self.scheduler is not None:
+            # 按页拆分后交给全局进程池，与其他请求公平地分享CPU
+            self.scheduler.convert(pdf_file, output_file, PDF_CONVERT_SETTINGS, progress)
+            return
+
         cv = None
         try:
-            cv = Converter(pdf_file)
-            cv.convert(output_file, start=0, end=None, pages=None,
-                      multi_processing=True,
-                      cpu_count=None,
-                      tables_settings={
-                          'text_settings': {
-                              'line_overlap': 0.8,
-                              'font_size_detection': True,  # 启用字体大小检测
-                              'char_inclusion': 0.9,  # 字符包含阈值
-                              'char_distance': 0.3,  # 字符距离阈值
-                          },
-                          'table_settings': {
-                              'min_rows': 1,
-                              'min_cols': 1,
-                              'edge_min_length': 3,
-                              'cell_min_size': 3,
-                          }
-                      },
-                      text_settings={
-                          'line_margin': 0.1,
-                          'line_overlap': 0.9,
-                          'line_break_width': 5,
-                          'line_break_free_space_ratio': 0.1,
-                          'line_separate_threshold': 5,
-                          'line_spacing_threshold': 5,
-                          'line_merge_threshold': 2,
-                          'line_height_threshold': 2,
-                          'line_width_threshold': 2,
-                          'line_alignment_threshold': 0.1,
-                          'preserve_space': True,  # 保留空格
-                          'detect_chinese': True,  # 检测中文
-                          'char_merging_threshold': 0.3,  # 字符合并阈值
-                      },
-                      image_settings={
-                          'min_image_area': 100,
-                          'max_image_area': None,
-                          'min_image_height': 10,
-                          'min_image_width': 10,
-                      },
-                      layout_settings={
-                          'section_height': None,
-                          'section_width': None,
-                          'section_overlap': 0.9,
-                          'section_margin': 0.1,
-                          'preserve_layout': True,  # 保留布局
-                      })
+            with CONVERSION_PHASE_SECONDS.time('pdf2docx', 'convert'):
+                cv = load_converter('pdf2docx')(pdf_file)
+                cv.convert(output_file, start=0, end=None, pages=None,
+                          multi_processing=False,
+                          **PDF_CONVERT_SETTINGS)
         finally:
             if cv:
                 cv.close()
 
-    def pdf_to_docx(self, pdf_file, original_filename):
-        """PDF转Word"""
+    def pdf_to_docx(self, pdf_file, original_filename, progress=None):
+        """
+        PDF转Word
+        :param progress: 进度回调，参数为 (已完成任务数, 总任务数)，仅使用调度器时有效
+        """
         try:
             if not os.path.exists(pdf_file):
                 raise FileNotFoundError("上传的文件不存在")
@@ -110,17 +201,12 @@ class DocConverter:
             if file_size == 0:
                 raise ValueError("文件大小为0，可能是空文件")
             
-            # 使用原始文件名（去掉.pdf后缀，添加.docx后缀）
-            if original_filename.lower().endswith('.pdf'):
-                output_filename = original_filename[:-4] + '.docx'
-            else:
-                output_filename = original_filename + '.docx'
-            
-            output_file = os.path.join(self.output_folder, output_filename)
+            output_filename = self.output_filename('pdf2docx', original_filename)
+            output_file = self.output_path(output_filename)
             
             # 使用安全的转换方法
             try:
-                self._safe_convert_pdf(pdf_file, output_file)
+                self._safe_convert_pdf(pdf_file, output_file, progress)
                 
                 # 验证输出文件
                 if not os.path.exists(output_file):
@@ -151,64 +237,41 @@ class DocConverter:
     def docx_to_pdf(self, docx_file, original_filename):
         """Word转PDF"""
         try:
-            pythoncom.CoInitialize()
-            try:
-                import win32com.client
-                word = win32com.client.Dispatch("Word.Application")
+            output_filename = self.output_filename('docx2pdf', original_filename)
+            app_logger.info(f"Converting to PDF with filename: {output_filename}")  # 添加日志
+            output_file = self.output_path(output_filename)
+            
+            if self.docx_pool is not None:
+                # 交给常驻的转换进程，无需每次启动转换程序
+                with CONVERSION_PHASE_SECONDS.time('docx2pdf', 'convert'):
+                    self.docx_pool.convert(docx_file, output_file)
+            else:
+                backend = create_docx_backend(self.docx_engine, soffice=self.soffice)
+                with CONVERSION_PHASE_SECONDS.time('docx2pdf', 'start'):
+                    backend.start()
                 try:
-                    word.Visible = False
-                    
-                    # 修改文件名处理逻辑
-                    base_name = original_filename
-                    if base_name.lower().endswith('.docx'):
-                        base_name = base_name[:-5]  # 移除 .docx
-                    elif base_name.lower().endswith('.doc'):
-                        base_name = base_name[:-4]  # 移除 .doc
-                    
-                    # 确保base_name不为空
-                    if not base_name:
-                        base_name = "converted"
-                        
-                    output_filename = f"{base_name}.pdf"
-                    app_logger.info(f"Converting to PDF with filename: {output_filename}")  # 添加日志
-                    output_file = os.path.join(self.output_folder, output_filename)
-                    
-                    # 打开文档
-                    doc = word.Documents.Open(docx_file)
-                    
-                    try:
-                        # 设置保存选项
-                        wdFormatPDF = 17  # PDF 格式
-                        
-                        # 保存为PDF
-                        doc.SaveAs2(output_file, FileFormat=wdFormatPDF)
-                    finally:
-                        # 关闭文档
-                        doc.Close()
-                    
-                    # 验证输出文件
-                    if not os.path.exists(output_file):
-                        raise Exception("转换失败，未生成输出文件")
-                    
-                    output_size = os.path.getsize(output_file)
-                    if output_size == 0:
-                        raise Exception("转换失败，生成的文件为空")
-                    
-                    app_logger.info(f"Conversion successful. Output file: {output_filename}, size: {output_size/1024/1024:.2f}MB")
-                    
-                    return {
-                        'status': 'success',
-                        'message': '转换成功',
-                        'output_file': output_file,
-                        'output_filename': output_filename,
-                        'source_file': docx_file
-                    }
+                    with CONVERSION_PHASE_SECONDS.time('docx2pdf', 'convert'):
+                        backend.convert(docx_file, output_file)
                 finally:
-                    # 退出 Word
-                    word.Quit()
-            finally:
-                # 确保在完成后取消初始化
-                pythoncom.CoUninitialize()
+                    backend.stop()
+            
+            # 验证输出文件
+            if not os.path.exists(output_file):
+                raise Exception("转换失败，未生成输出文件")
+            
+            output_size = os.path.getsize(output_file)
+            if output_size == 0:
+                raise Exception("转换失败，生成的文件为空")
+            
+            app_logger.info(f"Conversion successful. Output file: {output_filename}, size: {output_size/1024/1024:.2f}MB")
+            
+            return {
+                'status': 'success',
+                'message': '转换成功',
+                'output_file': output_file,
+                'output_filename': output_filename,
+                'source_file': docx_file
+            }
                 
         except Exception as e:
             app_logger.error(f"DOCX to PDF conversion failed: {str(e)}", exc_info=True)
@@ -0,0 +1,462 @@
+import os
+import sys
+import time
+import queue
+import socket
+import shutil
+import tempfile
+import signal
+import threading
+import subprocess
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from utils.logger import app_logger
+
+class DocxBackend:
+    """
+    DOCX转PDF后端接口，实例只在创建它的工作线程中使用
+    start() 启动转换程序并保持运行，convert() 可被反复调用
+    """
+
+    name = 'base'
+
+    def start(self):
+        raise NotImplementedError
+
+    def convert(self, docx_file, output_file):
+        raise NotImplementedError
+
+    def healthy(self):
+        """转换程序是否仍可用"""
+        return True
+
+    def memory_usage(self):
+        """转换程序占用的内存（字节），无法获取时返回 None"""
+        return None
+
+    def kill(self):
+        """
+        从其他线程强制终止正在执行的转换（用于超时），不支持时返回 False
+        """
+        return False
+
+    def stop(self):
+        pass
+
+class WordComBackend(DocxBackend):
+    """通过 COM 调用 Microsoft Word，仅支持 Windows"""
+
+    name = 'word-com'
+
+    def __init__(self):
+        self._word = None
+        self._pid = None
+
+    def start(self):
+        import uuid
+        import pythoncom
+        import win32com.client
+        pythoncom.CoInitialize()
+        # DispatchEx 为每个工作线程启动独立的 Word 进程
+        self._word = win32com.client.DispatchEx("Word.Application")
+        self._word.Visible = False
+        self._word.DisplayAlerts = 0
+        # 以唯一标题找到该实例的主窗口，记下进程号供超时时终止
+        self._word.Caption = f'docx-converter-{uuid.uuid4().hex}'
+        self._pid = self._find_pid(self._word.Caption)
+
+    @staticmethod
+    def _find_pid(caption):
+        try:
+            import win32gui
+            import win32process
+            hwnd = win32gui.FindWindow('OpusApp', caption)
+            return win32process.GetWindowThreadProcessId(hwnd)[1] if hwnd else None
+        except Exception as e:
+            app_logger.warning(f"Failed to find Word process: {str(e)}")
+            return None
+
+    def convert(self, docx_file, output_file):
+        # 打开文档
+        doc = self._word.Documents.Open(os.path.abspath(docx_file), ReadOnly=True)
+        try:
+            wdFormatPDF = 17  # PDF 格式
+            # 保存为PDF
+            doc.SaveAs2(os.path.abspath(output_file), FileFormat=wdFormatPDF)
+        finally:
+            # 关闭文档
+            doc.Close(False)
+
+    def healthy(self):
+        try:
+            return self._word is not None and bool(self._word.Version)
+        except Exception:
+            return False
+
+    def kill(self):
+        # 只使用进程号，不在其他线程中调用 COM 对象
+        if self._pid is None:
+            return False
+        try:
+            os.kill(self._pid, signal.SIGTERM)  # Windows 上为 TerminateProcess
+        except OSError:
+            pass
+        return True
+
+    def stop(self):
+        import pythoncom
+        try:
+            if self._word is not None:
+                # 退出 Word
+                self._word.Quit()
+        except Exception as e:
+            app_logger.warning(f"Failed to quit Word: {str(e)}")
+        finally:
+            self._word = self._pid = None
+            pythoncom.CoUninitialize()
+
+def _process_rss(pid):
+    """读取进程及其子进程的常驻内存（字节），仅支持 Linux"""
+    total = 0
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    total += int(line.split()[1]) * 1024
+                    break
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            for child in f.read().split():
+                total += _process_rss(int(child)) or 0
+    except (OSError, ValueError):
+        return None
+    return total
+
+class LibreOfficeBackend(DocxBackend):
+    """
+    常驻的无界面 LibreOffice 进程，通过 UNO 套接字连接进行转换，支持 Linux
+    需要 LibreOffice 及其 Python UNO 绑定（python3-uno）
+    """
+
+    name = 'libreoffice'
+
+    def __init__(self, soffice='soffice', start_timeout=30):
+        self.soffice = soffice
+        self.start_timeout = start_timeout
+        self._process = None
+        self._profile = None
+        self._desktop = None
+
+    @staticmethod
+    def _free_port():
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            return s.getsockname()[1]
+
+    def start(self):
+        import uno
+        port = self._free_port()
+        # 每个进程使用独立的用户配置目录，避免多个实例互相转发请求
+        self._profile = tempfile.mkdtemp(prefix='lo-profile-')
+        self._process = subprocess.Popen([
+            self.soffice, '--headless', '--invisible', '--nologo', '--norestore',
+            '--nodefault', '--nolockcheck',
+            f'-env:UserInstallation={uno.systemPathToFileUrl(self._profile)}',
+            f'--accept=socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext'
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext('com.sun.star.bridge.UnoUrlResolver', local)
+        deadline = time.time() + self.start_timeout
+        while True:
+            try:
+                context = resolver.resolve(
+                    f'uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext')
+                break
+            except Exception:
+                if self._process.poll() is not None or time.time() > deadline:
+                    self.stop()
+                    raise RuntimeError('LibreOffice 启动失败')
+                time.sleep(0.2)
+        self._desktop = context.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', context)
+
+    @staticmethod
+    def _props(**values):
+        from com.sun.star.beans import PropertyValue
+        props = []
+        for name, value in values.items():
+            prop = PropertyValue()
+            prop.Name = name
+            prop.Value = value
+            props.append(prop)
+        return tuple(props)
+
+    def convert(self, docx_file, output_file):
+        import uno
+        doc = self._desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(docx_file)), '_blank', 0, self._props(Hidden=True))
+        if doc is None:
+            raise RuntimeError('LibreOffice 无法打开文档')
+        try:
+            doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(output_file)),
+                           self._props(FilterName='writer_pdf_Export'))
+        finally:
+            doc.close(True)
+
+    def healthy(self):
+        if self._process is None or self._process.poll() is not None or self._desktop is None:
+            return False
+        try:
+            self._desktop.getComponents()
+            return True
+        except Exception:
+            return False
+
+    def memory_usage(self):
+        return _process_rss(self._process.pid) if self._process else None
+
+    def _kill_process(self):
+        # soffice 启动脚本会再派生 soffice.bin，按进程组一并终止
+        if hasattr(os, 'killpg'):
+            try:
+                os.killpg(self._process.pid, signal.SIGKILL)
+                return
+            except OSError:
+                pass
+        self._process.kill()
+
+    def kill(self):
+        if self._process is not None:
+            self._kill_process()
+        return True
+
+    def stop(self):
+        try:
+            if self._desktop is not None and self._process.poll() is None:
+                self._desktop.terminate()
+        except Exception:
+            pass
+        if self._process is not None:
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._kill_process()
+                self._process.wait()
+        if self._profile:
+            shutil.rmtree(self._profile, ignore_errors=True)
+        self._process = self._profile = self._desktop = None
+
+_BACKENDS = {
+    WordComBackend.name: WordComBackend,
+    LibreOfficeBackend.name: LibreOfficeBackend,
+}
+
+def resolve_backend_name(name):
+    """'auto' 在 Windows 上使用 Word，其他平台使用 LibreOffice"""
+    if name == 'auto':
+        return WordComBackend.name if sys.platform == 'win32' else LibreOfficeBackend.name
+    if name not in _BACKENDS:
+        raise ValueError(f"不支持的DOCX转换后端: {name}")
+    return name
+
+def create_docx_backend(name, soffice='soffice'):
+    """按名称创建后端实例，soffice 为 LibreOffice 可执行文件路径"""
+    name = resolve_backend_name(name)
+    if name == LibreOfficeBackend.name:
+        return LibreOfficeBackend(soffice=soffice)
+    return _BACKENDS[name]()
+
+class _PoolJob:
+    def __init__(self, docx_file, output_file):
+        self.docx_file = docx_file
+        self.output_file = output_file
+        self.future = Future()
+        self.started = threading.Event()
+        self.worker = None
+        self.aborted = False  # 由执行它的工作线程的 _lock 保护
+
+class _PoolWorker:
+    """常驻工作线程，持有一个预先启动的后端实例"""
+
+    def __init__(self, pool, index):
+        self.pool = pool
+        self.index = index
+        self.backend = None
+        self.jobs_done = 0
+        self.restarts = 0
+        self.aborted = False
+        self.current = None  # 正在执行的任务，与 aborted 一起由 _lock 保护
+        self._lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name=f'docx-worker-{index}', daemon=True)
+
+    def _start_backend(self):
+        backend = self.pool.backend_factory()
+        backend.start()
+        self.backend = backend
+        self.jobs_done = 0
+        self.aborted = False
+        app_logger.info(f"DOCX converter started - Worker: {self.index}, Backend: {backend.name}")
+
+    def _stop_backend(self, reason):
+        if self.backend is not None:
+            app_logger.info(f"Recycling DOCX converter - Worker: {self.index}, Reason: {reason}")
+            try:
+                self.backend.stop()
+            except Exception as e:
+                app_logger.warning(f"Failed to stop DOCX converter: {str(e)}")
+            self.backend = None
+            self.restarts += 1
+
+    def _ensure_backend(self):
+        if self.backend is not None and not self.backend.healthy():
+            self._stop_backend('health check failed')
+        if self.backend is None:
+            self._start_backend()
+
+    def _recycle_reason(self):
+        if self.aborted:
+            return 'job timeout'
+        if self.jobs_done >= self.pool.max_jobs:
+            return f'{self.jobs_done} jobs'
+        memory = self.backend.memory_usage()
+        if memory is not None and memory > self.pool.max_memory:
+            return f'memory {memory // 1024 // 1024}MB'
+        return None
+
+    def _run(self):
+        # 预先启动，第一个任务无需等待转换程序启动
+        try:
+            self._start_backend()
+        except Exception as e:
+            app_logger.warning(f"DOCX converter failed to start - Worker: {self.index}, Error: {str(e)}")
+
+        while True:
+            try:
+                job = self.pool._queue.get(timeout=self.pool.health_interval)
+            except queue.Empty:
+                # 空闲时定期检查健康状态
+                if self.backend is not None and not self.backend.healthy():
+                    self._stop_backend('health check failed')
+                continue
+            if job is None:
+                break
+            # 先登记再标记为执行中：调用方取消失败时，可以通过 job.worker 终止该任务
+            job.worker = self
+            with self._lock:
+                self.current = job
+            if not job.future.set_running_or_notify_cancel():
+                with self._lock:
+                    self.current = None
+                continue
+
+            try:
+                self._ensure_backend()
+                with self._lock:
+                    # 等待转换程序启动期间已超时
+                    if job.aborted:
+                        raise TimeoutError('转换超时')
+                job.started.set()
+                self.backend.convert(job.docx_file, job.output_file)
+                job.future.set_result(job.output_file)
+            except Exception as e:
+                job.future.set_exception(e)
+                if self.backend is not None and not self.aborted and not self.backend.healthy():
+                    self._stop_backend('health check failed')
+            finally:
+                # 此后到达的超时终止请求针对的是已结束的任务，不再影响下一个任务
+                with self._lock:
+                    self.current = None
+                job.started.set()
+                self.jobs_done += 1
+
+            reason = self._recycle_reason() if self.backend is not None else None
+            if reason:
+                self._stop_backend(reason)
+
+        self._stop_backend('shutdown')
+
+    def abort(self, job):
+        """
+        任务超时：终止正在执行该任务的转换程序，任务结束后重新启动
+        任务已经结束时不做处理，避免误杀同一工作线程接着执行的其他任务
+        :return: 是否终止了转换程序
+        """
+        with self._lock:
+            if self.current is not job:
+                return False
+            job.aborted = True
+            if self.backend is None:
+                # 转换程序仍在启动，启动完成后不再执行该任务
+                return False
+            self.aborted = True
+            if not self.backend.kill():
+                app_logger.warning(f"DOCX converter cannot be killed, waiting for it to finish - Worker: {self.index}")
+                return False
+            return True
+
+class DocxConverterPool:
+    """
+    常驻的DOCX转PDF转换进程池
+    :param backend_factory: 创建后端实例的函数
+    :param workers: 常驻转换进程数
+    :param max_jobs: 单个转换进程处理多少个任务后重启
+    :param max_memory: 转换进程内存超过该值（字节）后重启
+    :param timeout: 单个任务的超时（秒），排队等待和执行分别计时
+    :param health_interval: 空闲时的健康检查间隔（秒）
+    """
+
+    def __init__(self, backend_factory, workers=2, max_jobs=50, max_memory=1024 * 1024 * 1024,
+                 timeout=120, health_interval=30):
+        self.backend_factory = backend_factory
+        self.max_jobs = max_jobs
+        self.max_memory = max_memory
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self._queue = queue.Queue()
+        self._workers = [_PoolWorker(self, index) for index in range(workers)]
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        """启动工作线程并预先启动转换程序，重复调用无副作用"""
+        with self._lock:
+            if not self._started:
+                for worker in self._workers:
+                    worker.thread.start()
+                self._started = True
+        return self
+
+    def convert(self, docx_file, output_file):
+        """
+        转换文档，阻塞直到完成
+        排队超时时取消任务；执行超时时终止对应的转换进程；两种情况均抛出 TimeoutError
+        """
+        self.start()
+        job = _PoolJob(docx_file, output_file)
+        self._queue.put(job)
+        if not job.started.wait(self.timeout):
+            # 仍在排队时直接取消，已被工作线程取走（正在启动转换程序）时按执行超时处理
+            if not job.future.cancel():
+                job.worker.abort(job)
+            app_logger.error(f"DOCX conversion not started after {self.timeout}s - File: {docx_file}")
+            raise TimeoutError(f'转换排队超时（{self.timeout}秒）')
+        try:
+            return job.future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            app_logger.error(f"DOCX conversion timed out after {self.timeout}s - File: {docx_file}")
+            job.worker.abort(job)
+            raise TimeoutError(f'转换超时（{self.timeout}秒）')
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'workers': [{
+                'index': worker.index,
+                'running': worker.backend is not None,
+                'jobs_done': worker.jobs_done,
+                'restarts': worker.restarts,
+                'memory': worker.backend.memory_usage() if worker.backend is not None else None
+            } for worker in self._workers]
+        }
+
+    def shutdown(self):
+        for _ in self._workers:
+            self._queue.put(None)
@@ -0,0 +1,239 @@
+import os
+import sys
+import csv
+import json
+import mmap
+import struct
+import socket
+import bisect
+import tempfile
+import threading
+from array import array
+import numpy as np
+
+# 离线IP归属地索引
+# 文件布局（本机字节序，构建一次后由各工作进程只读映射共享）：
+#   头部      magic, 字节序, IPv4区间数, IPv6区间数, 归属地表长度
+#   IPv4段    起始地址 uint32[n4]，结束地址 uint32[n4]，归属地编号 uint32[n4]
+#   IPv6段    起始地址 16字节[n6]，结束地址 16字节[n6]，归属地编号 uint32[n6]
+#   归属地表  JSON 数组，每项为 [country, region, city, isp]
+
+_MAGIC = b'GEOIDX01'
+_HEADER = struct.Struct('<8s4sIII')
+_BYTEORDER = sys.byteorder.encode().ljust(4, b'\0')[:4]
+# 批量查询的地址数不少于该值时使用 numpy 整批查找
+_VECTORIZE_MIN = 16
+
+class _V6Keys:
+    """以大端16字节序列表示的IPv6地址列，按字节比较即按数值比较，可直接用于 bisect"""
+
+    def __init__(self, view, count):
+        self._view = view
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        offset = index * 16
+        return self._view[offset:offset + 16].tobytes()
+
+def _parse_ip(text):
+    """解析CSV中的地址：点分/冒号形式，或十进制整数（不超过32位视为IPv4）"""
+    text = text.strip()
+    if text.isdigit():
+        value = int(text)
+        if value <= 0xFFFFFFFF:
+            return 4, value
+        if value < 1 << 128:
+            return 6, value
+        raise ValueError(f"无效的IP地址: {text}")
+    for version, family in ((4, socket.AF_INET), (6, socket.AF_INET6)):
+        try:
+            return version, int.from_bytes(socket.inet_pton(family, text), 'big')
+        except (OSError, ValueError):
+            continue
+    raise ValueError(f"无效的IP地址: {text}")
+
+def _read_csv(csv_path):
+    """
+    读取归属地CSV，每行为 start,end,country,region,city,isp
+    start/end 可为IP地址或十进制整数；首行无法解析时视为表头跳过
+    """
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        for line_no, row in enumerate(csv.reader(f), 1):
+            if not row or not row[0].strip() or row[0].lstrip().startswith('#'):
+                continue
+            try:
+                version, start = _parse_ip(row[0])
+                end_version, end = _parse_ip(row[1])
+            except (ValueError, IndexError):
+                if line_no == 1:
+                    continue
+                raise ValueError(f"第{line_no}行地址格式错误: {row}")
+            if version != end_version or start > end:
+                raise ValueError(f"第{line_no}行地址范围无效: {row}")
+            fields = [field.strip() for field in row[2:6]]
+            fields += [''] * (4 - len(fields))
+            yield version, start, end, tuple(field or '未知' for field in fields)
+
+def build_geo_index(csv_path, index_path):
+    """
+    由CSV构建二进制索引文件，先写临时文件再原子替换，可与正在读取的进程并存
+    :return: (IPv4区间数, IPv6区间数)
+    """
+    rows = {4: [], 6: []}
+    locations = {}
+    for version, start, end, location in _read_csv(csv_path):
+        loc_id = locations.setdefault(location, len(locations))
+        rows[version].append((start, end, loc_id))
+
+    for version, ranges in rows.items():
+        ranges.sort()
+        for previous, current in zip(ranges, ranges[1:]):
+            if current[0] <= previous[1]:
+                raise ValueError(f"地址范围重叠: IPv{version} {previous[0]}-{previous[1]} / {current[0]}-{current[1]}")
+
+    v4, v6 = rows[4], rows[6]
+    location_blob = json.dumps([list(location) for location in locations],
+                               ensure_ascii=False).encode('utf-8')
+
+    folder = os.path.dirname(os.path.abspath(index_path))
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.geoip-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, _BYTEORDER, len(v4), len(v6), len(location_blob)))
+            for column in range(3):
+                f.write(array('I', (row[column] for row in v4)).tobytes())
+            for column in range(2):
+                f.write(b''.join(row[column].to_bytes(16, 'big') for row in v6))
+            f.write(array('I', (row[2] for row in v6)).tobytes())
+            f.write(location_blob)
+        os.replace(tmp_path, index_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(v4), len(v6)
+
+class GeoIndex:
+    """只读映射的IP区间索引，单次查询为一次二分查找，不访问网络"""
+
+    def __init__(self, index_path):
+        self.path = index_path
+        with open(index_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+
+        magic, byteorder, n4, n6, loc_size = _HEADER.unpack_from(view, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"无效的归属地索引文件: {index_path}")
+        if byteorder != _BYTEORDER:
+            raise ValueError(f"归属地索引字节序与本机不一致，请重新构建: {index_path}")
+
+        offset = _HEADER.size
+        v4_columns = []
+        for _ in range(3):
+            v4_columns.append(view[offset:offset + n4 * 4].cast('I'))
+            offset += n4 * 4
+        self._v4_starts, self._v4_ends, self._v4_locs = v4_columns
+
+        self._v6_starts = _V6Keys(view[offset:offset + n6 * 16], n6)
+        offset += n6 * 16
+        self._v6_ends = _V6Keys(view[offset:offset + n6 * 16], n6)
+        offset += n6 * 16
+        self._v6_locs = view[offset:offset + n6 * 4].cast('I')
+        offset += n6 * 4
+
+        # 批量查询使用的 numpy 视图，与上面的列共享同一映射，不复制数据
+        # IPv6 地址以定长16字节串（S16）比较，大端存储时字节序即数值序
+        header = _HEADER.size
+        v6_offset = header + n4 * 12
+        self._arrays = {
+            4: (np.frombuffer(self._mmap, np.uint32, n4, header),
+                np.frombuffer(self._mmap, np.uint32, n4, header + n4 * 4),
+                np.frombuffer(self._mmap, np.uint32, n4, header + n4 * 8)),
+            6: (np.frombuffer(self._mmap, 'S16', n6, v6_offset),
+                np.frombuffer(self._mmap, 'S16', n6, v6_offset + n6 * 16),
+                np.frombuffer(self._mmap, np.uint32, n6, v6_offset + n6 * 32))
+        }
+
+        self._locations = [tuple(location) for location in
+                           json.loads(bytes(view[offset:offset + loc_size]).decode('utf-8'))]
+        self.counts = {'ipv4_ranges': n4, 'ipv6_ranges': n6, 'locations': len(self._locations)}
+
+    def _columns(self, version):
+        if version == 4:
+            return self._v4_starts, self._v4_ends, self._v4_locs
+        return self._v6_starts, self._v6_ends, self._v6_locs
+
+    @staticmethod
+    def _key(version, value):
+        return value if version == 4 else value.to_bytes(16, 'big')
+
+    def lookup_int(self, version, value):
+        """按整数地址查询，返回 (country, region, city, isp)，未收录时返回 None"""
+        starts, ends, locs = self._columns(version)
+        key = self._key(version, value)
+        index = bisect.bisect_right(starts, key) - 1
+        if index >= 0 and ends[index] >= key:
+            return self._locations[locs[index]]
+        return None
+
+    def lookup(self, ip):
+        return self.lookup_int(*_parse_ip(ip))
+
+    def lookup_many(self, addresses):
+        """
+        批量查询，addresses 为 (version, int) 列表
+        按地址族分组后以 numpy.searchsorted 对映射的起始地址列整批二分查找；
+        少量地址时构造数组的开销大于查找本身，逐个二分查找
+        :return: 与输入顺序一致的归属地列表
+        """
+        if len(addresses) < _VECTORIZE_MIN:
+            return [self.lookup_int(version, value) for version, value in addresses]
+        results = [None] * len(addresses)
+        for version in (4, 6):
+            starts, ends, locs = self._arrays[version]
+            positions = [i for i, (v, _) in enumerate(addresses) if v == version]
+            if not positions or not len(starts):
+                continue
+            if version == 4:
+                keys = np.fromiter((addresses[i][1] for i in positions), np.uint32, len(positions))
+            else:
+                keys = np.array([addresses[i][1].to_bytes(16, 'big') for i in positions], 'S16')
+            index = np.searchsorted(starts, keys, side='right') - 1
+            found = index >= 0
+            index[~found] = 0
+            found &= ends[index] >= keys
+            for position, hit, loc in zip(positions, found.tolist(), locs[index].tolist()):
+                if hit:
+                    results[position] = self._locations[loc]
+        return results
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_geo_index(index_path, csv_path=None):
+    """
+    获取进程内共享的索引实例，首次调用时映射索引文件
+    提供 csv_path 且索引不存在或早于CSV时，先重新构建索引
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                if csv_path and (not os.path.exists(index_path) or
+                                 os.path.getmtime(index_path) < os.path.getmtime(csv_path)):
+                    build_geo_index(csv_path, index_path)
+                _index = GeoIndex(index_path)
+    return _index
+
+if __name__ == '__main__':
+    # 用法: python -m utils.geoip <csv文件> <索引文件>
+    if len(sys.argv) != 3:
+        print('用法: python -m utils.geoip <csv文件> <索引文件>')
+        sys.exit(1)
+    n4, n6 = build_geo_index(sys.argv[1], sys.argv[2])
+    print(f'索引构建完成: IPv4区间 {n4} 条, IPv6区间 {n6} 条 -> {sys.argv[2]}')
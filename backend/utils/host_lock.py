@@ -0,0 +1,96 @@
+import os
+import threading
+from contextlib import contextmanager
+from utils.logger import app_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+class HostLock:
+    """
+    同一主机上多个进程之间的选举：持有锁文件排他锁的进程即为执行者
+    锁由操作系统在进程退出时自动释放，其他进程下次尝试时即可接替，不会因进程崩溃留下失效的锁
+    fork 出的子进程不继承父进程的持有状态，需要自行获取
+    :param path: 锁文件路径，各进程须使用同一路径
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def held(self):
+        return self._fd is not None and self._pid == os.getpid()
+
+    def acquire(self):
+        """尝试获取锁，不等待；已持有时直接返回 True"""
+        with self._lock:
+            if self.held():
+                return True
+            folder = os.path.dirname(self.path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            except OSError:
+                os.close(fd)
+                return False
+            # 写入持有者进程号，便于排查（msvcrt 锁定的是第1个字节，写在其后）
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, f" {os.getpid()}\n".encode())
+            os.ftruncate(fd, os.lseek(fd, 0, os.SEEK_CUR))
+            self._fd, self._pid = fd, os.getpid()
+        app_logger.info(f"Background task lock acquired - PID: {self._pid}, Path: {self.path}")
+        return True
+
+    def release(self):
+        with self._lock:
+            if not self.held():
+                return
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            os.close(self._fd)
+            self._fd = self._pid = None
+
+    def elected(self, fn):
+        """包装任务函数：只有获得锁的进程执行，其余进程跳过"""
+        def run(*args, **kwargs):
+            if self.acquire():
+                return fn(*args, **kwargs)
+            return None
+        run.__name__ = getattr(fn, '__name__', 'elected')
+        return run
+
+# Windows 下只有单进程服务（无 gunicorn），文件锁退化为进程内的锁
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+@contextmanager
+def file_lock(path):
+    """
+    同一主机上多个进程（及线程）之间的互斥，阻塞等待，用于保护较短的临界区
+    锁文件不会被删除，调用方负责在不再需要时清理
+    """
+    if fcntl is None:
+        with _local_locks_guard:
+            lock = _local_locks.setdefault(path, threading.Lock())
+        with lock:
+            yield
+        return
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
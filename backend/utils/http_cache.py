@@ -0,0 +1,47 @@
+import json
+import hashlib
+from flask import Response, current_app, request
+from utils.cache import TTLCache
+
+class ResponseCache:
+    """
+    纯计算接口的结果缓存：以接口名和规范化后的参数为键，在有界LRU中保存序列化后的响应体及其ETag，
+    命中时既不重复计算也不重复序列化；响应附带强ETag和 Cache-Control，
+    GET/HEAD 请求的 If-None-Match 与当前ETag一致时返回 304
+    :param maxsize: 最多缓存的响应数
+    :param max_body: 单个响应体超过该字节数时不缓存（仍返回ETag）
+    :param max_age: Cache-Control 的 max-age（秒），同时作为服务端缓存时间
+    """
+
+    def __init__(self, maxsize=2048, max_body=512 * 1024, max_age=3600):
+        self.max_body = max_body
+        self.max_age = max_age
+        self._cache = TTLCache(maxsize=maxsize, ttl=max_age, name='responses')
+
+    @staticmethod
+    def key(name, params):
+        """参数可为任意可JSON序列化的值，键为其摘要，长度与参数大小无关"""
+        text = json.dumps([name, params], ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def respond(self, name, params, compute):
+        """
+        :param params: 已规范化的参数，相同语义的请求应得到相同的参数
+        :param compute: 缓存未命中时调用，返回响应的JSON对象；抛出的异常不缓存，由调用方处理
+        """
+        key = self.key(name, params)
+        entry = self._cache.get(key)
+        if entry is None:
+            body = current_app.json.dumps(compute()).encode('utf-8') + b'\n'
+            entry = (body, hashlib.sha256(body).hexdigest()[:32])
+            if len(body) <= self.max_body:
+                self._cache.set(key, entry)
+
+        body, etag = entry
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = f'public, max-age={self.max_age}'
+        return response.make_conditional(request)
+
+    def stats(self):
+        return self._cache.stats()
@@ -0,0 +1,174 @@
+import numpy as np
+from utils.ip_tools import (
+    ip_dec_to_bin, ip_bin_to_dec,
+    ip_dec_to_hex, ip_hex_to_dec,
+    mask_to_cidr, cidr_to_mask
+)
+
+# IP格式批量转换引擎
+# 输入先整体转换为定长的字符码矩阵，逐列（而不是逐条）解析为 uint32 地址数组，
+# 再通过 256 项的字节字符串表批量格式化输出。
+# 快速路径只接受标准写法；未通过的行交给逐条转换函数处理，
+# 因此结果与错误信息与逐条转换完全一致，单行错误不影响整批。
+
+# 超过该长度的输入不进入字符码矩阵，避免个别超长输入放大整批内存
+_MAX_WIDTH = 64
+
+# 字符码 -> 数值，-1 为非法字符，-2 为分隔点，-3 为填充
+_DOT, _PAD, _BAD = -2, -3, -1
+
+def _char_table(base):
+    table = np.full(256, _BAD, dtype=np.int16)
+    for value in range(base):
+        for char in {format(value, 'x'), format(value, 'X')}:
+            table[ord(char)] = value
+    table[ord('.')] = _DOT
+    table[0] = _PAD
+    return table
+
+_TABLES = {base: _char_table(base) for base in (2, 10, 16)}
+
+# 单字节的格式化表
+_DEC_OCTETS = np.array([str(i) for i in range(256)], dtype=object)
+_BIN_OCTETS = np.array([format(i, '08b') for i in range(256)], dtype=object)
+_HEX_OCTETS = np.array([format(i, '02X') for i in range(256)], dtype=object)
+_PREFIX_STRINGS = np.array([str(i) for i in range(33)], dtype=object)
+# 单字节中1的个数
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+def _char_matrix(texts):
+    """
+    将字符串列表转换为 (n, 宽度) 的字符码矩阵，非ASCII字符统一映射为非法字符
+    :return: (字符码矩阵, 超长或非字符串的行)
+    """
+    valid = np.array([isinstance(text, str) and len(text) <= _MAX_WIDTH for text in texts], dtype=bool)
+    padded = np.array([text if ok else '' for text, ok in zip(texts, valid)], dtype=str)
+    codes = padded.view(np.uint32).reshape(len(texts), -1)
+    return np.minimum(codes, 255).astype(np.uint8), ~valid
+
+def _parse_parts(codes, base, parts, digits=None):
+    """
+    按列解析以点分隔的数字，所有行同时推进，每段结束时并入地址
+    :param parts: 每行的段数
+    :param digits: 每段固定位数，None 表示1位以上任意位数
+    :return: (uint32 地址数组, 解析成功的行)
+    """
+    n, width = codes.shape
+    table = _TABLES[base]
+    address = np.zeros(n, dtype=np.uint32)
+    current = np.zeros(n, dtype=np.int32)
+    count = np.zeros(n, dtype=np.int32)
+    part = np.zeros(n, dtype=np.int32)
+    ok = np.ones(n, dtype=bool)
+    ended = np.zeros(n, dtype=bool)
+
+    def close(mask):
+        # 当前段结束：校验位数和取值范围，并入地址
+        valid = (count >= 1) & (current <= 255)
+        if digits is not None:
+            valid &= count == digits
+        ok[mask & ~valid] = False
+        np.copyto(address, (address << 8) | np.minimum(current, 255).astype(np.uint32), where=mask)
+
+    for column in range(width):
+        kind = table[codes[:, column]]
+        is_pad = kind == _PAD
+        is_dot = kind == _DOT
+        is_digit = kind >= 0
+        # 填充只能出现在末尾
+        ok &= (kind != _BAD) & (is_pad | ~ended)
+        closing = is_dot | (is_pad & ~ended)
+        close(closing)
+        ended |= is_pad
+        part += is_dot
+        # 超出单字节的段已判为失败，截断以免溢出
+        current = np.where(is_digit, np.minimum(current * base + kind, 4096), np.where(closing, 0, current))
+        count = np.where(is_digit, count + 1, np.where(closing, 0, count))
+
+    close(~ended)
+    ok &= part == parts - 1
+    return address, ok
+
+def _octets(addresses):
+    """uint32 地址数组 -> 4 个字节数组"""
+    return [(addresses >> shift) & 0xFF for shift in (24, 16, 8, 0)]
+
+def _join_octets(addresses, table):
+    """按字节查表后以点拼接，每行一次 str.join"""
+    columns = [table[octet] for octet in _octets(addresses)]
+    return list(map('.'.join, zip(*columns)))
+
+def _parse_dotted(codes, base, digits=None):
+    return _parse_parts(codes, base, 4, digits)
+
+def _dec2bin(codes):
+    addresses, ok = _parse_dotted(codes, 10)
+    return _join_octets(addresses, _BIN_OCTETS), ok
+
+def _bin2dec(codes):
+    addresses, ok = _parse_dotted(codes, 2, digits=8)
+    return _join_octets(addresses, _DEC_OCTETS), ok
+
+def _dec2hex(codes):
+    addresses, ok = _parse_dotted(codes, 10)
+    return _join_octets(addresses, _HEX_OCTETS), ok
+
+def _hex2dec(codes):
+    addresses, ok = _parse_dotted(codes, 16)
+    return _join_octets(addresses, _DEC_OCTETS), ok
+
+def _mask2cidr(codes):
+    masks, ok = _parse_dotted(codes, 10)
+    inverted = ~masks
+    # 合法掩码取反后形如 0...01...1，加1后与自身无公共位
+    ok &= (inverted & (inverted + np.uint32(1))) == 0
+    ones = sum(_POPCOUNT[octet].astype(np.int64) for octet in _octets(masks))
+    return _PREFIX_STRINGS[np.where(ok, ones, 0)].tolist(), ok
+
+def _cidr2mask(codes):
+    values, ok = _parse_parts(codes, 10, 1)
+    ok &= values <= 32
+    prefixes = np.where(ok, values, 0).astype(np.uint64)
+    masks = ((np.uint64(0xFFFFFFFF) << (np.uint64(32) - prefixes)) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+    return _join_octets(masks, _DEC_OCTETS), ok
+
+# 转换类型 -> (批量转换, 逐条转换)
+CONVERTERS = {
+    'dec2bin': (_dec2bin, ip_dec_to_bin),
+    'bin2dec': (_bin2dec, ip_bin_to_dec),
+    'dec2hex': (_dec2hex, ip_dec_to_hex),
+    'hex2dec': (_hex2dec, ip_hex_to_dec),
+    'mask2cidr': (_mask2cidr, mask_to_cidr),
+    'cidr2mask': (_cidr2mask, cidr_to_mask)
+}
+
+def convert_batch(convert_type, inputs):
+    """
+    批量转换IP格式
+    :param convert_type: 转换类型，见 CONVERTERS
+    :param inputs: 输入字符串列表
+    :return: (结果列表, 错误列表)，转换失败的行在结果中为 None，
+             错误列表每项为 {'index', 'input', 'error'}
+    """
+    if convert_type not in CONVERTERS:
+        raise ValueError('不支持的转换类型')
+    batch, single = CONVERTERS[convert_type]
+    texts = [text.strip() if isinstance(text, str) else text for text in inputs]
+    if not texts:
+        return [], []
+
+    codes, rejected = _char_matrix(texts)
+    results, ok = batch(codes)
+    ok &= ~rejected
+
+    errors = []
+    for index in np.flatnonzero(~ok).tolist():
+        text = texts[index]
+        try:
+            if not isinstance(text, str):
+                raise ValueError('输入必须是字符串')
+            results[index] = single(text)
+        except ValueError as e:
+            results[index] = None
+            errors.append({'index': index, 'input': text, 'error': str(e)})
+    return results, errors
@@ -0,0 +1,173 @@
+import io
+import csv
+import json
+from itertools import islice
+from utils.ip_tools import (
+    parse_ip_interval, merge_ip_intervals, interval_to_cidrs, format_interval,
+    convert_ip_v4_to_v6, convert_ip_v6_to_v4, query_ip_locations
+)
+from utils.ip_batch import convert_batch
+
+# 文件输入的流式处理管道：逐行读取上传文件 -> 分批处理 -> 逐批输出 CSV/NDJSON
+# 各阶段均为生成器，内存占用只与批大小有关，与文件行数无关（IP汇总为合并后的区间数）
+
+# 每批处理的行数
+BATCH_SIZE = 10000
+# 归属地查询每批的行数，在线查询时每批结束即输出，避免长时间无响应
+LOCATION_BATCH_SIZE = 1000
+
+RESULT_FIELDS = ('line', 'input', 'result', 'error')
+LOCATION_FIELDS = ('line', 'ip', 'country', 'region', 'city', 'isp')
+MEMBERSHIP_FIELDS = ('line', 'input', 'covered', 'overlaps', 'error')
+LPM_FIELDS = ('line', 'ip', 'prefix', 'label', 'error')
+
+# 输出格式 -> MIME类型
+OUTPUT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+def read_lines(stream, column=None, skip_header=False):
+    """
+    逐行读取上传的文本/CSV文件，跳过空行和以 # 开头的注释行
+    :param stream: 二进制文件流
+    :param column: CSV 列序号，None 表示按纯文本处理，整行为一个输入
+    :param skip_header: 是否跳过首行
+    :return: (行号, 内容) 生成器
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+    try:
+        rows = csv.reader(text) if column is not None else ((line,) for line in text)
+        for line_no, row in enumerate(rows, 1):
+            if line_no == 1 and skip_header:
+                continue
+            value = (row[column] if column < len(row) else '') if column is not None else row[0]
+            value = value.strip()
+            if value and not value.startswith('#'):
+                yield line_no, value
+    finally:
+        # 文件由请求负责关闭
+        text.detach()
+
+def batched(items, size):
+    """将生成器按 size 分批"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def _result_row(line_no, text, result=None, error=None):
+    return {'line': line_no, 'input': text, 'result': result, 'error': error}
+
+def iter_summary_rows(lines, output='range'):
+    """
+    流式汇总：解析后的区间先暂存，暂存数量达到已合并区间数时才一并合并，
+    每次合并后已合并区间至少翻倍或暂存区被大幅压缩，总耗时与一次性排序相当，
+    内存不超过合并后区间数的两倍（另加一批）
+    无法解析的行作为错误行先行输出，汇总结果在读完文件后输出
+    参数在调用时即校验，而不是在开始输出后
+    """
+    if output not in ('range', 'cidr'):
+        raise ValueError(f"不支持的输出格式: {output}")
+    return _summary_batches(lines, output)
+
+def _summary_batches(lines, output):
+    merged, pending = [], []
+    for batch in batched(lines, BATCH_SIZE):
+        errors = []
+        for line_no, text in batch:
+            try:
+                pending.append(parse_ip_interval(text))
+            except Exception as e:
+                errors.append(_result_row(line_no, text, error=str(e)))
+        # 每批都与已合并的区间重新合并时总耗时随区间数平方增长
+        if len(pending) >= max(len(merged), BATCH_SIZE):
+            merged, pending = merge_ip_intervals(merged + pending), []
+        if errors:
+            yield errors
+    merged = merge_ip_intervals(merged + pending)
+
+    for chunk in batched(merged, BATCH_SIZE):
+        rows = []
+        for version, start, end in chunk:
+            if output == 'cidr':
+                rows.extend(_result_row(None, None, cidr) for cidr in interval_to_cidrs(version, start, end))
+            else:
+                rows.append(_result_row(None, None, format_interval(version, start, end)))
+        yield rows
+
+def iter_format_rows(lines, convert_type):
+    """流式格式转换，每批交给向量化批量引擎"""
+    for batch in batched(lines, BATCH_SIZE):
+        results, errors = convert_batch(convert_type, [text for _, text in batch])
+        errors = {error['index']: error['error'] for error in errors}
+        yield [_result_row(line_no, text, results[index], errors.get(index))
+               for index, (line_no, text) in enumerate(batch)]
+
+def iter_convert_rows(lines, direction, ipv6_prefix=''):
+    """流式 IPv4/IPv6 转换，单行错误不影响其他行，参数在调用时即校验"""
+    if direction == 'v4tov6':
+        if not ipv6_prefix:
+            raise ValueError('IPv6前缀不能为空')
+        convert = lambda text: convert_ip_v4_to_v6([text], ipv6_prefix)[0]
+    elif direction == 'v6tov4':
+        convert = lambda text: convert_ip_v6_to_v4([text])[0]
+    else:
+        raise ValueError('无效的转换方向')
+    return _convert_batches(lines, convert)
+
+def _convert_batches(lines, convert):
+    for batch in batched(lines, BATCH_SIZE):
+        rows = []
+        for line_no, text in batch:
+            try:
+                rows.append(_result_row(line_no, text, convert(text)))
+            except ValueError as e:
+                rows.append(_result_row(line_no, text, error=str(e)))
+        yield rows
+
+def iter_location_rows(lines):
+    """流式归属地查询，每批去重后批量查询"""
+    for batch in batched(lines, LOCATION_BATCH_SIZE):
+        results = query_ip_locations([text for _, text in batch])
+        yield [dict(result, line=line_no) for (line_no, _), result in zip(batch, results)]
+
+def iter_membership_rows(lines, ipset):
+    """流式判断每行地址/网段是否被 IPSet 覆盖"""
+    for batch in batched(lines, BATCH_SIZE):
+        results = ipset.check([text for _, text in batch])
+        yield [dict(result, line=line_no) for (line_no, _), result in zip(batch, results)]
+
+def iter_lpm_rows(lines, table):
+    """流式最长前缀匹配"""
+    for batch in batched(lines, BATCH_SIZE):
+        results = table.lookup_many([text for _, text in batch])
+        yield [dict(result, line=line_no) for (line_no, _), result in zip(batch, results)]
+
+def serialize(batches, fields, output_format='ndjson'):
+    """
+    将各批结果序列化为文本块，每批输出一次
+    :param output_format: 'ndjson' 或 'csv'，CSV 首块为表头
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"不支持的输出格式: {output_format}")
+
+    if output_format == 'ndjson':
+        for rows in batches:
+            yield ''.join(json.dumps({field: row.get(field) for field in fields}, ensure_ascii=False) + '\n'
+                          for row in rows)
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(fields)
+    for rows in batches:
+        writer.writerows([('' if row.get(field) is None else row.get(field)) for field in fields]
+                         for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -1,6 +1,37 @@
 import ipaddress
 import socket
+import threading
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import config
+from utils.cache import TTLCache
+from utils.geoip import get_geo_index
+from utils.metrics import UPSTREAM_SECONDS, UPSTREAM_THROTTLED
+from utils.rate_limit import TokenBucket, SingleFlight
+
+# IP归属地缓存：内存LRU + 可选SQLite持久化
+_location_cache = TTLCache(
+    maxsize=config.GEO_CACHE_SIZE,
+    ttl=config.GEO_CACHE_TTL,
+    persist_path=config.GEO_CACHE_DB or None,
+    name='ip_location'
+)
+
+# ip-api 的频率限制（免费接口：单个查询 45 次/分钟，批量接口 15 次/分钟），进程内所有线程共享
+# 上游按来源IP计数，多进程部署时按工作进程数均分，整台主机的请求频率不超过配置值
+_rate_limits = {
+    'json': TokenBucket(config.IP_API_RATE_LIMIT / config.WEB_WORKERS, burst=config.per_worker(config.IP_API_BURST)),
+    'batch': TokenBucket(config.IP_API_BATCH_RATE_LIMIT / config.WEB_WORKERS, burst=config.per_worker(config.IP_API_BURST))
+}
+# 正在向上游查询的IP，相同IP的并发查询共享一次上游调用
+_inflight = SingleFlight()
+_THROTTLED_ERROR = '查询错误: 查询过于频繁，请稍后再试'
+
+# 上游查询共享的 HTTP 会话和线程池，首次使用时创建
+_session = None
+_executor = None
+_session_lock = threading.Lock()
 
 def get_network_info(ip, mask):
     """计算网络信息"""
@@ -25,40 +56,106 @@ def get_network_info(ip, mask):
     except Exception as e:
         raise ValueError(f"网络计算错误: {str(e)}")
 
-def summarize_ip_ranges(ip_ranges):
-    """汇总IP地址"""
+_ADDRESS_FAMILIES = {4: (socket.AF_INET, 4, 32), 6: (socket.AF_INET6, 16, 128)}
+
+def _parse_address(text):
+    """将IP地址字符串解析为 (version, int)"""
+    for version, (family, _, _) in _ADDRESS_FAMILIES.items():
+        try:
+            return version, int.from_bytes(socket.inet_pton(family, text), 'big')
+        except (OSError, ValueError):
+            continue
+    raise ValueError(f"无效的IP地址: {text}")
+
+def format_address(version, value):
+    """将整数地址格式化为IP地址字符串"""
+    if version == 6 and value >> 32 in (0, 0xFFFF):
+        # inet_ntop 将 ::/96、::ffff:0:0/96 中的地址写成点分形式，与 ipaddress 不一致
+        return str(ipaddress.IPv6Address(value))
+    family, size, _ = _ADDRESS_FAMILIES[version]
+    return socket.inet_ntop(family, value.to_bytes(size, 'big'))
+
+def parse_ip_interval(ip_range):
+    """解析IP/网段/地址范围为整数区间 (version, start, end)"""
+    text = ip_range.strip()
+    if '-' in text:
+        first, last = (part.strip() for part in text.split('-', 1))
+        version, start = _parse_address(first)
+        end_version, end = _parse_address(last)
+        if version != end_version:
+            raise ValueError(f"地址范围版本不一致: {text}")
+        if start > end:
+            raise ValueError(f"起始地址大于结束地址: {text}")
+        return version, start, end
+
+    address, _, prefix = text.partition('/')
+    if prefix and not prefix.isdigit():
+        # 掩码写法（如 /255.255.255.0）交给 ipaddress 处理
+        ip_network = ipaddress.ip_network(text, strict=False)
+        return (ip_network.version,
+                int(ip_network.network_address),
+                int(ip_network.broadcast_address))
+
+    version, value = _parse_address(address)
+    max_prefixlen = _ADDRESS_FAMILIES[version][2]
+    prefixlen = int(prefix) if prefix else max_prefixlen
+    if prefixlen > max_prefixlen:
+        raise ValueError(f"无效的前缀长度: {text}")
+    host_bits = max_prefixlen - prefixlen
+    start = value >> host_bits << host_bits
+    return version, start, start | ((1 << host_bits) - 1)
+
+def merge_ip_intervals(intervals):
+    """排序并合并重叠或相邻的整数区间"""
+    merged = []
+    for version, start, end in sorted(intervals):
+        if merged and merged[-1][0] == version and start <= merged[-1][2] + 1:
+            if end > merged[-1][2]:
+                merged[-1][2] = end
+        else:
+            merged.append([version, start, end])
+    return [tuple(interval) for interval in merged]
+
+def interval_to_cidrs(version, start, end):
+    """将整数区间拆分为最少数量的CIDR网段"""
+    max_prefixlen = _ADDRESS_FAMILIES[version][2]
+    cidrs = []
+    while start <= end:
+        # 起始地址对齐所允许的最大块，且不能超出区间
+        block_bits = (start & -start).bit_length() - 1 if start else max_prefixlen
+        span_bits = (end - start + 1).bit_length() - 1
+        bits = min(block_bits, span_bits)
+        cidrs.append(f"{format_address(version, start)}/{max_prefixlen - bits}")
+        start += 1 << bits
+    return cidrs
+
+def format_interval(version, start, end):
+    """将整数区间格式化为单个地址或 'start-end' 地址范围"""
+    if start == end:
+        return format_address(version, start)
+    return f"{format_address(version, start)}-{format_address(version, end)}"
+
+def summarize_ip_ranges(ip_ranges, output='range'):
+    """
+    汇总IP地址
+    :param ip_ranges: IP地址、网段或地址范围（如 '10.0.0.1-10.0.0.9'）列表
+    :param output: 'range' 输出合并后的地址范围，'cidr' 输出最少数量的CIDR网段
+    :return: 汇总结果列表，IPv4在前、IPv6在后，均按地址排序
+    """
     try:
-        address_list = []
-        for ip_range in ip_ranges:
-            if not ip_range.strip():
-                continue
-            ip_network = ipaddress.ip_network(ip_range.strip(), strict=False)
-            for ip in ip_network:
-                address_list.append(ip)
-                
-        address_list = sorted(set(address_list))
+        if output not in ('range', 'cidr'):
+            raise ValueError(f"不支持的输出格式: {output}")
+
+        intervals = [parse_ip_interval(ip_range)
+                     for ip_range in ip_ranges if ip_range.strip()]
         result = []
-        
-        if address_list:
-            start_address = address_list[0]
-            end_address = start_address
-            
-            for address in address_list[1:]:
-                if address == end_address + 1:
-                    end_address = address
-                else:
-                    if end_address == start_address:
-                        result.append(str(start_address))
-                    else:
-                        result.append(f"{start_address}-{end_address}")
-                    start_address = address
-                    end_address = start_address
-                    
-            if end_address == start_address:
-                result.append(str(start_address))
+
+        for version, start, end in merge_ip_intervals(intervals):
+            if output == 'cidr':
+                result.extend(interval_to_cidrs(version, start, end))
             else:
-                result.append(f"{start_address}-{end_address}")
-                
+                result.append(format_interval(version, start, end))
+
         return result
     except Exception as e:
         raise ValueError(f"IP汇总错误: {str(e)}")
@@ -190,102 +287,364 @@ def cidr_to_mask(cidr):
     except ValueError as e:
         raise ValueError(str(e))
 
-def divide_network(network, divide_type, value):
+def plan_division(network, divide_type, value):
     """
-    划分子网
-    :param network: 主网段，如 '192.168.0.0/24'
-    :param divide_type: 划分方式，'count' 表示按子网数量，'hosts' 表示按主机数量
-    :param value: 划分值，当 divide_type 为 'count' 时表示子网数量，为 'hosts' 时表示每个子网的主机数
-    :return: 划分结果列表
+    计算子网划分方案（不生成子网）
+    :return: (主网段, 新前缀长度, 子网总数)
     """
     try:
         net = ipaddress.ip_network(network)
-        
+        max_prefixlen = net.max_prefixlen
+
         if divide_type == 'count':
             # 按子网数量划分
             subnets_needed = int(value)
+            if subnets_needed < 1:
+                raise ValueError('子网数量必须大于0')
             # 计算所需的额外位数
             bits_needed = (subnets_needed - 1).bit_length()
             new_prefix = net.prefixlen + bits_needed
-            
-            if new_prefix > 32:
+
+            if new_prefix > max_prefixlen:
                 raise ValueError('子网数量过大')
-                
+
+            # 只返回需要的子网数量
+            total = subnets_needed
         else:  # hosts
             # 按主机数量划分
             hosts_needed = int(value)
             # 计算所需的主机位数（不需要+2，因为ipaddress.hosts()已经考虑了网络地址和广播地址）
             host_bits = hosts_needed.bit_length()
-            new_prefix = 32 - host_bits
-            
+            new_prefix = max_prefixlen - host_bits
+
             if new_prefix < net.prefixlen:
                 raise ValueError('主机数量过大')
-            
-        # 生成子网
-        subnets = list(net.subnets(new_prefix=new_prefix))
-        results = []
-        
-        # 只返回需要的子网数量
-        if divide_type == 'count':
-            subnets = subnets[:value]
-            
-        for subnet in subnets:
-            hosts = list(subnet.hosts())
-            results.append({
-                'subnet': str(subnet),
-                'netmask': str(subnet.netmask),
-                'network': str(subnet.network_address),
-                'broadcast': str(subnet.broadcast_address),
-                'hosts': subnet.num_addresses - 2,  # 减去网络地址和广播地址
-                'range': f"{hosts[0]} - {hosts[-1]}" if hosts else 'N/A'
-            })
-        
-        return results
+
+            total = 1 << (new_prefix - net.prefixlen)
+
+        return net, new_prefix, total
     except ValueError as e:
         raise ValueError(f'网段格式错误: {str(e)}')
     except Exception as e:
         raise Exception(f'划分失败: {str(e)}')
 
-def query_ip_location(ip):
-    """查询IP地址归属地"""
+def _subnet_info(version, network_int, prefixlen):
+    """按整数运算生成单个子网的信息"""
+    max_prefixlen = _ADDRESS_FAMILIES[version][2]
+    host_bits = max_prefixlen - prefixlen
+    num_addresses = 1 << host_bits
+    broadcast_int = network_int + num_addresses - 1
+    netmask_int = ((1 << max_prefixlen) - 1) ^ (num_addresses - 1)
+
+    # 与 ipaddress 的 hosts() 保持一致
+    if host_bits == 0:
+        first_host, last_host = network_int, network_int
+    elif host_bits == 1:
+        first_host, last_host = network_int, broadcast_int
+    elif version == 4:
+        first_host, last_host = network_int + 1, broadcast_int - 1
+    else:
+        first_host, last_host = network_int + 1, broadcast_int
+
+    network_address = format_address(version, network_int)
+    return {
+        'subnet': f"{network_address}/{prefixlen}",
+        'netmask': format_address(version, netmask_int),
+        'network': network_address,
+        'broadcast': format_address(version, broadcast_int),
+        'hosts': num_addresses - 2,  # 减去网络地址和广播地址
+        'range': f"{format_address(version, first_host)} - {format_address(version, last_host)}"
+    }
+
+def iter_divided_subnets(net, new_prefix, total, offset=0, limit=None):
+    """按需逐个生成划分后的子网，内存占用与子网数量无关"""
+    version = net.version
+    step = 1 << (net.max_prefixlen - new_prefix)
+    base = int(net.network_address)
+
+    start = max(int(offset), 0)
+    stop = total if limit is None else min(total, start + max(int(limit), 0))
+    for index in range(start, stop):
+        yield _subnet_info(version, base + index * step, new_prefix)
+
+def divide_network(network, divide_type, value, offset=0, limit=None):
+    """
+    划分子网
+    :param network: 主网段，如 '192.168.0.0/24'
+    :param divide_type: 划分方式，'count' 表示按子网数量，'hosts' 表示按主机数量
+    :param value: 划分值，当 divide_type 为 'count' 时表示子网数量，为 'hosts' 时表示每个子网的主机数
+    :param offset: 分页起始位置
+    :param limit: 分页大小，None 表示返回全部
+    :return: 划分结果列表
+    """
+    net, new_prefix, total = plan_division(network, divide_type, value)
+    return list(iter_divided_subnets(net, new_prefix, total, offset, limit))
+
+def _location_result(ip, country='查询失败', region='未知', city='未知', isp='未知'):
+    """构造归属地查询结果"""
+    return {
+        'ip': ip,
+        'country': country,
+        'region': region,
+        'city': city,
+        'isp': isp
+    }
+
+def _get_session():
+    """获取共享的 HTTP 会话（keep-alive 连接池）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=config.IP_API_POOL_SIZE,
+                    pool_maxsize=config.IP_API_POOL_SIZE
+                )
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+def _get_executor():
+    """获取批量查询使用的共享线程池"""
+    global _executor
+    if _executor is None:
+        with _session_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=config.IP_API_MAX_WORKERS,
+                    thread_name_prefix='ip-api'
+                )
+    return _executor
+
+def _offline_index():
+    """获取离线归属地索引"""
+    return get_geo_index(config.GEO_INDEX_PATH, config.GEO_CSV_PATH or None)
+
+def _offline_result(ip, location):
+    """将离线索引的查询结果转换为归属地结果"""
+    if location is None:
+        return _location_result(ip, country='未知')
+    country, region, city, isp = location
+    return _location_result(ip, country=country, region=region, city=city, isp=isp)
+
+def _query_offline(ips):
+    """通过离线索引批量查询，不经过缓存和网络"""
+    addresses = {}
+    results = {}
+    for ip in ips:
+        try:
+            addresses[ip] = _parse_address(ip)
+        except ValueError:
+            results[ip] = _location_result(ip, country='查询错误: 无效的IP地址格式')
+
+    pending = list(addresses)
+    locations = _offline_index().lookup_many([addresses[ip] for ip in pending])
+    for ip, location in zip(pending, locations):
+        results[ip] = _offline_result(ip, location)
+    return results
+
+def _resolve_locally(ip):
+    """
+    无需访问上游即可得出结果的查询：缓存命中、无效地址、私有/保留地址
+    :return: 查询结果，需要访问上游时返回 None
+    """
+    cached = _location_cache.get(ip)
+    if cached is not None:
+        return dict(cached)
+
+    # 判断IP类型
     try:
-        # 判断IP类型
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return _location_result(ip, country='查询错误: 无效的IP地址格式')
+
+    # 私有/保留地址无需查询上游，直接负缓存
+    if not address.is_global:
+        result = _location_result(ip)
+        _location_cache.set(ip, result, ttl=config.GEO_CACHE_NEGATIVE_TTL)
+        return dict(result)
+
+    return None
+
+def _store_location(ip, data):
+    """将上游返回的数据转换为查询结果并写入缓存"""
+    if data.get('status') == 'success':
+        result = _location_result(
+            ip,
+            country=data.get('country', '未知'),
+            region=data.get('regionName', '未知'),
+            city=data.get('city', '未知'),
+            isp=data.get('isp', '未知')
+        )
+        _location_cache.set(ip, result)
+    else:
+        result = _location_result(ip)
+        _location_cache.set(ip, result, ttl=config.GEO_CACHE_NEGATIVE_TTL)
+    return dict(result)
+
+def _observe_upstream(target, started, elapsed):
+    """记录上游接口耗时，elapsed 为 None 表示请求失败或返回数据无效"""
+    if elapsed is None:
+        UPSTREAM_SECONDS.observe(time.perf_counter() - started, 'ip-api', target, 'error')
+    else:
+        UPSTREAM_SECONDS.observe(elapsed, 'ip-api', target, 'ok')
+
+def _throttle(target, deadline):
+    """等待上游配额，截止时间前无法发出时返回 False"""
+    wait = _rate_limits[target].reserve(deadline - time.monotonic())
+    if wait is None:
+        UPSTREAM_THROTTLED.inc('ip-api', target, 'shed')
+        return False
+    if wait > 0:
+        UPSTREAM_THROTTLED.inc('ip-api', target, 'delayed')
+        time.sleep(wait)
+    return True
+
+def _sync_rate_limit(target, response):
+    """按上游返回的剩余次数（X-Rl）和窗口重置时间（X-Ttl）同步令牌桶，配额用尽时暂停发送"""
+    if response.status_code == 429 or response.headers.get('X-Rl') == '0':
         try:
-            socket.inet_pton(socket.AF_INET, ip)
-            ip_type = 'ipv4'
-        except socket.error:
-            try:
-                socket.inet_pton(socket.AF_INET6, ip)
-                ip_type = 'ipv6'
-            except socket.error:
-                raise ValueError("无效的IP地址格式")
+            seconds = int(response.headers.get('X-Ttl', 60))
+        except ValueError:
+            seconds = 60
+        _rate_limits[target].pause(seconds)
+    if response.status_code == 429:
+        raise ValueError('上游查询过于频繁')
+
+def _fetch_location(ip, deadline):
+    """向上游查询单个IP"""
+    if not _throttle('json', deadline):
+        return _location_result(ip, country=_THROTTLED_ERROR)
 
+    started = time.perf_counter()
+    elapsed = None
+    try:
         # 调用IP地址查询API
-        api_url = f"http://ip-api.com/json/{ip}?lang=zh-CN"
-        response = requests.get(api_url, timeout=5)
+        api_url = f"{config.IP_API_BASE_URL}/json/{ip}"
+        response = _get_session().get(api_url, params={'lang': 'zh-CN'}, timeout=config.IP_API_TIMEOUT)
+        _sync_rate_limit('json', response)
         data = response.json()
+        elapsed = time.perf_counter() - started
+        return _store_location(ip, data)
+    except Exception as e:
+        # 网络错误等临时性失败不缓存
+        return _location_result(ip, country=f'查询错误: {str(e)}')
+    finally:
+        _observe_upstream('json', started, elapsed)
 
-        if data['status'] == 'success':
-            return {
-                'ip': ip,
-                'country': data.get('country', '未知'),
-                'region': data.get('regionName', '未知'),
-                'city': data.get('city', '未知'),
-                'isp': data.get('isp', '未知')
-            }
-        else:
-            return {
-                'ip': ip,
-                'country': '查询失败',
-                'region': '未知',
-                'city': '未知',
-                'isp': '未知'
-            }
+def _query_location_batch(ips, deadline):
+    """通过上游批量接口查询一组IP"""
+    if not _throttle('batch', deadline):
+        return {ip: _location_result(ip, country=_THROTTLED_ERROR) for ip in ips}
+
+    started = time.perf_counter()
+    elapsed = None
+    try:
+        api_url = f"{config.IP_API_BASE_URL}/batch"
+        response = _get_session().post(api_url, params={'lang': 'zh-CN'}, json=ips, timeout=config.IP_API_TIMEOUT)
+        _sync_rate_limit('batch', response)
+        data = response.json()
+        if not isinstance(data, list) or len(data) != len(ips):
+            raise ValueError("批量查询返回数据格式错误")
+        elapsed = time.perf_counter() - started
+        return {ip: _store_location(ip, item) for ip, item in zip(ips, data)}
     except Exception as e:
-        return {
-            'ip': ip,
-            'country': f'查询错误: {str(e)}',
-            'region': '未知',
-            'city': '未知',
-            'isp': '未知'
-        } 
\ No newline at end of file
+        return {ip: _location_result(ip, country=f'查询错误: {str(e)}') for ip in ips}
+    finally:
+        _observe_upstream('batch', started, elapsed)
+
+def _wait_inflight(waiting, deadline):
+    """等待其他请求正在进行的相同IP查询，查询方出现的异常在此抛出"""
+    if waiting:
+        UPSTREAM_THROTTLED.inc('ip-api', 'inflight', 'coalesced', amount=len(waiting))
+    results = {}
+    for ip, future in waiting.items():
+        try:
+            timeout = max(deadline - time.monotonic(), 0) + config.IP_API_TIMEOUT
+            results[ip] = dict(future.result(timeout=timeout))
+        except FutureTimeoutError:
+            results[ip] = _location_result(ip, country='查询错误: 等待查询结果超时')
+    return results
+
+def query_ip_location(ip):
+    """
+    查询IP地址归属地
+    在线后端的上游调用受令牌桶限制；相同IP正在被其他请求查询时等待其结果，不重复调用上游
+    """
+    if config.GEO_BACKEND == 'offline':
+        return _query_offline([ip.strip()])[ip.strip()]
+
+    result = _resolve_locally(ip)
+    if result is not None:
+        return result
+
+    deadline = time.monotonic() + config.IP_API_MAX_WAIT
+    owned, waiting = _inflight.claim([ip])
+    if waiting:
+        return _wait_inflight(waiting, deadline)[ip]
+    try:
+        result = _fetch_location(ip, deadline)
+    except BaseException as e:
+        _inflight.reject(ip, e)
+        raise
+    _inflight.resolve(ip, result)
+    return result
+
+def query_ip_locations(ips):
+    """
+    批量查询IP地址归属地
+    离线后端直接在本地索引中批量查找；在线后端相同IP只查询一次，
+    未命中缓存的IP按批次并发提交到上游批量接口，各批次按令牌桶排队，
+    截止时间（IP_API_MAX_WAIT）前无法发出的批次直接返回限流错误；
+    已由其他请求在查询中的IP等待其结果
+    :return: 查询结果列表，顺序与输入一致
+    """
+    ips = [ip.strip() for ip in ips]
+    if config.GEO_BACKEND == 'offline':
+        results = _query_offline(dict.fromkeys(ips))
+        return [dict(results[ip]) for ip in ips]
+
+    results = {}
+    pending = []
+
+    # 去重并保持输入顺序
+    for ip in dict.fromkeys(ips):
+        result = _resolve_locally(ip)
+        if result is None:
+            pending.append(ip)
+        else:
+            results[ip] = result
+
+    deadline = time.monotonic() + config.IP_API_MAX_WAIT
+    owned, waiting = _inflight.claim(pending)
+    try:
+        batch_size = config.IP_API_BATCH_SIZE
+        batches = [owned[i:i + batch_size] for i in range(0, len(owned), batch_size)]
+        if len(batches) == 1:
+            results.update(_query_location_batch(batches[0], deadline))
+        elif batches:
+            for batch_results in _get_executor().map(_query_location_batch, batches, [deadline] * len(batches)):
+                results.update(batch_results)
+    except BaseException as e:
+        # 等待同一IP的其他请求收到同一个异常
+        for ip in owned:
+            if ip not in results:
+                _inflight.reject(ip, e)
+        raise
+    finally:
+        for ip in owned:
+            _inflight.resolve(ip, results.get(ip) or _location_result(ip, country='查询错误: 查询中断'))
+    results.update(_wait_inflight(waiting, deadline))
+
+    return [dict(results[ip]) for ip in ips]
+
+def get_rate_limit_stats():
+    """上游限流统计"""
+    return dict({target: bucket.stats() for target, bucket in _rate_limits.items()},
+                inflight=_inflight.inflight())
+
+def get_location_cache_stats():
+    """获取归属地缓存统计信息"""
+    return _location_cache.stats()
@@ -0,0 +1,230 @@
+from array import array
+from bisect import bisect_right
+from utils.ip_tools import (
+    parse_ip_interval, merge_ip_intervals, interval_to_cidrs, format_interval
+)
+
+def _empty_column(version):
+    # IPv4 地址以 uint32 紧凑存储；IPv6 超出机器字长，使用整数列表
+    return array('I') if version == 4 else []
+
+class IPSet:
+    """
+    IP地址集合，按版本保存排序且互不重叠、互不相邻的整数区间（起始/结束地址两列）
+    成员判断为一次二分查找；并、交、差运算为两个有序区间列表的线性归并，
+    地址不会被展开，集合大小只与区间数有关
+    """
+
+    __slots__ = ('_columns',)
+
+    def __init__(self, items=()):
+        """
+        :param items: IP地址、网段或地址范围字符串，格式同 parse_ip_interval
+        """
+        intervals = [parse_ip_interval(item) for item in items if item.strip()]
+        self._columns = {}
+        self._load(merge_ip_intervals(intervals))
+
+    @classmethod
+    def from_intervals(cls, intervals):
+        """由 (version, start, end) 区间构建，区间可无序、可重叠"""
+        ipset = cls.__new__(cls)
+        ipset._columns = {}
+        ipset._load(merge_ip_intervals(intervals))
+        return ipset
+
+    @classmethod
+    def _from_merged(cls, columns):
+        """由各版本已合并的 [(start, end)] 列表构建"""
+        ipset = cls.__new__(cls)
+        ipset._columns = {}
+        ipset._load((version, start, end) for version, ranges in columns.items() for start, end in ranges)
+        return ipset
+
+    def _load(self, merged):
+        for version, start, end in merged:
+            if version not in self._columns:
+                self._columns[version] = (_empty_column(version), _empty_column(version))
+            starts, ends = self._columns[version]
+            starts.append(start)
+            ends.append(end)
+
+    def _ranges(self, version):
+        starts, ends = self._columns.get(version, ((), ()))
+        return list(zip(starts, ends))
+
+    def intervals(self):
+        """按版本、地址顺序返回所有 (version, start, end) 区间"""
+        for version in sorted(self._columns):
+            starts, ends = self._columns[version]
+            for start, end in zip(starts, ends):
+                yield version, start, end
+
+    def __iter__(self):
+        return self.intervals()
+
+    def __len__(self):
+        """区间数"""
+        return sum(len(starts) for starts, _ in self._columns.values())
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __eq__(self, other):
+        return isinstance(other, IPSet) and list(self.intervals()) == list(other.intervals())
+
+    def num_addresses(self, version=None):
+        """地址总数，version 为 None 时统计所有版本"""
+        versions = [version] if version is not None else self._columns
+        return sum(end - start + 1 for v in versions for start, end in self._ranges(v))
+
+    # ---- 成员判断 ----
+
+    def _find(self, version, value):
+        """包含 value 的区间下标，不存在时返回 -1"""
+        starts, ends = self._columns.get(version, ((), ()))
+        index = bisect_right(starts, value) - 1
+        return index if index >= 0 and ends[index] >= value else -1
+
+    def contains_interval(self, version, start, end):
+        """区间是否完全被集合覆盖"""
+        index = self._find(version, start)
+        return index >= 0 and self._columns[version][1][index] >= end
+
+    def overlaps_interval(self, version, start, end):
+        """区间是否与集合有交集"""
+        starts, ends = self._columns.get(version, ((), ()))
+        index = bisect_right(starts, end) - 1
+        return index >= 0 and ends[index] >= start
+
+    def __contains__(self, item):
+        """item 为IP地址、网段或地址范围字符串，完全覆盖时为 True"""
+        return self.contains_interval(*parse_ip_interval(item))
+
+    def check(self, items):
+        """
+        批量判断覆盖情况
+        :return: 每项为 {'input', 'covered', 'overlaps', 'error'} 的列表，
+                 covered 表示完全覆盖，overlaps 表示部分或完全重叠
+        """
+        results = []
+        for item in items:
+            text = item.strip()
+            try:
+                version, start, end = parse_ip_interval(text)
+            except Exception as e:
+                results.append({'input': text, 'covered': False, 'overlaps': False, 'error': str(e)})
+                continue
+            covered = self.contains_interval(version, start, end)
+            results.append({
+                'input': text,
+                'covered': covered,
+                'overlaps': covered or self.overlaps_interval(version, start, end),
+                'error': None
+            })
+        return results
+
+    # ---- 集合运算 ----
+
+    def _combine(self, other, merge):
+        versions = set(self._columns) | set(other._columns)
+        return IPSet._from_merged({version: merge(self._ranges(version), other._ranges(version))
+                                   for version in versions})
+
+    def union(self, other):
+        return self._combine(other, _union)
+
+    def intersection(self, other):
+        return self._combine(other, _intersection)
+
+    def difference(self, other):
+        return self._combine(other, _difference)
+
+    def symmetric_difference(self, other):
+        return self.union(other).difference(self.intersection(other))
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+    __xor__ = symmetric_difference
+
+    def issubset(self, other):
+        return not self.difference(other)
+
+    def issuperset(self, other):
+        return other.issubset(self)
+
+    # ---- 输出 ----
+
+    def to_list(self, output='range'):
+        """
+        :param output: 'range' 输出地址范围，'cidr' 输出最少数量的CIDR网段
+        """
+        if output not in ('range', 'cidr'):
+            raise ValueError(f"不支持的输出格式: {output}")
+        if output == 'cidr':
+            return [cidr for interval in self.intervals() for cidr in interval_to_cidrs(*interval)]
+        return [format_interval(*interval) for interval in self.intervals()]
+
+    def stats(self):
+        return {
+            'ranges': len(self),
+            'ipv4_addresses': self.num_addresses(4),
+            'ipv6_addresses': str(self.num_addresses(6))  # 可能超出JSON整数范围
+        }
+
+    def __repr__(self):
+        return f"IPSet({self.to_list()!r})"
+
+# 以下归并函数的输入输出均为同一版本下排序、合并后的 [(start, end)] 列表
+
+def _union(a, b):
+    result = []
+    i = j = 0
+    while i < len(a) or j < len(b):
+        if j >= len(b) or (i < len(a) and a[i][0] <= b[j][0]):
+            start, end = a[i]
+            i += 1
+        else:
+            start, end = b[j]
+            j += 1
+        if result and start <= result[-1][1] + 1:
+            if end > result[-1][1]:
+                result[-1] = (result[-1][0], end)
+        else:
+            result.append((start, end))
+    return result
+
+def _intersection(a, b):
+    result = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start = max(a[i][0], b[j][0])
+        end = min(a[i][1], b[j][1])
+        if start <= end:
+            result.append((start, end))
+        # 先结束的区间不会再与后续区间相交
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+def _difference(a, b):
+    result = []
+    j = 0
+    for start, end in a:
+        # 跳过完全位于当前区间之前的减数区间
+        while j < len(b) and b[j][1] < start:
+            j += 1
+        k = j
+        while k < len(b) and b[k][0] <= end:
+            if b[k][0] > start:
+                result.append((start, b[k][0] - 1))
+            start = max(start, b[k][1] + 1)
+            if start > end:
+                break
+            k += 1
+        if start <= end:
+            result.append((start, end))
+    return result
@@ -0,0 +1,468 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from utils.logger import app_logger
+from utils.metrics import CONVERSION_PHASE_SECONDS
+
+# 转换任务状态
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCESS = 'success'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+_FINISHED = (SUCCESS, FAILED, CANCELLED)
+_PROGRESS = {QUEUED: 0, RUNNING: 50, SUCCESS: 100, FAILED: 100, CANCELLED: 100}
+
+_converter = None
+_job_store = None
+
+def _run_conversion(kind, file_path, filename, docx_engine, soffice):
+    """在工作进程中执行转换，每个进程复用一个 DocConverter"""
+    global _converter
+    if _converter is None:
+        from utils.doc_tools import DocConverter
+        _converter = DocConverter(docx_engine=docx_engine, soffice=soffice)
+    if kind == 'pdf2docx':
+        return _converter.pdf_to_docx(file_path, filename)
+    return _converter.docx_to_pdf(file_path, filename)
+
+def _run_job(db_path, job_id, *args):
+    """转换进程中的任务入口：任务状态保存在共享数据库中时，开始执行前标记为执行中"""
+    global _job_store
+    if db_path:
+        if _job_store is None or _job_store.path != db_path:
+            _job_store = JobStore(db_path)
+        _job_store.update(job_id, _mark_running)
+    return _run_conversion(*args)
+
+def _mark_running(job):
+    if job['status'] == QUEUED:
+        job['status'] = RUNNING
+        job['started_at'] = time.time()
+
+def _process_alive(pid):
+    """进程是否仍在运行；Windows 下只有单进程服务，且 os.kill 会终止目标进程，不做检查"""
+    if os.name == 'nt' or pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class JobQueueFull(Exception):
+    """排队中的任务过多"""
+
+class JobStore:
+    """
+    转换任务状态的 SQLite 存储，同一主机的所有工作进程共享，任一进程都可以查询、下载或取消任务
+    path 为 ':memory:' 时只在当前进程内有效
+    """
+
+    def __init__(self, path=':memory:'):
+        folder = os.path.dirname(path) if path != ':memory:' else ''
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._pid = os.getpid()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        if self.path != ':memory:':
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'job_id TEXT PRIMARY KEY, owner INTEGER NOT NULL, status TEXT NOT NULL, '
+            'finished_at REAL, data TEXT NOT NULL)'
+        )
+        return conn
+
+    def _connection(self):
+        """SQLite 连接不能跨 fork 使用，预加载后 fork 出的工作进程各自重新连接"""
+        if self._pid != os.getpid():
+            self._conn = self._connect()
+            self._pid = os.getpid()
+        return self._conn
+
+    @contextmanager
+    def _transaction(self):
+        """写事务：开始时即加写锁，读-改-写期间其他进程不会修改同一任务"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    @staticmethod
+    def _row(job):
+        return job['status'], job['finished_at'], json.dumps(job, ensure_ascii=False), job['job_id']
+
+    def add(self, job, max_pending=None):
+        """
+        写入新任务，提供 max_pending 时未结束的任务已达上限则不写入并返回 False
+        执行中被取消的任务仍占用转换进程，直到转换返回（记录 finished_at）前继续计数
+        """
+        with self._transaction() as conn:
+            if max_pending is not None:
+                pending = conn.execute('SELECT COUNT(*) FROM jobs WHERE finished_at IS NULL').fetchone()[0]
+                if pending >= max_pending:
+                    return False
+            conn.execute(
+                'INSERT INTO jobs (status, finished_at, data, job_id, owner) VALUES (?, ?, ?, ?, ?)',
+                self._row(job) + (os.getpid(),)
+            )
+        return True
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._connection().execute('SELECT data FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, job_id, fn):
+        """在事务中读取任务并调用 fn(job) 修改后写回，返回修改后的任务，任务不存在时返回 None"""
+        with self._transaction() as conn:
+            row = conn.execute('SELECT data FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = json.loads(row[0])
+            fn(job)
+            conn.execute('UPDATE jobs SET status = ?, finished_at = ?, data = ? WHERE job_id = ?', self._row(job))
+        return job
+
+    def unfinished(self):
+        """未结束的任务 [(job_id, 所属进程ID)]"""
+        with self._lock:
+            return self._connection().execute('SELECT job_id, owner FROM jobs WHERE finished_at IS NULL').fetchall()
+
+    def expired(self, before):
+        """在 before 之前结束的任务"""
+        with self._lock:
+            rows = self._connection().execute('SELECT data FROM jobs WHERE finished_at <= ?', (before,)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def delete(self, job_id):
+        """删除任务，返回是否由本次调用删除"""
+        with self._lock:
+            return self._connection().execute('DELETE FROM jobs WHERE job_id = ?', (job_id,)).rowcount == 1
+
+class ConversionJobManager:
+    """
+    文档转换任务管理：提交后立即返回任务ID，由有界进程池执行转换
+    任务状态保存在 JobStore 中，多个工作进程共享；执行中的 Future 只保存在提交任务的进程内，
+    其他进程取消的任务由所属进程在结束或定时清理时处理，所属进程退出后未结束的任务标记为失败
+    :param converter: 主进程中的 DocConverter，用于清理文件
+    :param max_workers: 转换进程数
+    :param job_ttl: 任务结束后保留结果的时间（秒），过期后删除任务及输出文件
+    :param max_pending: 最多同时排队/执行的任务数
+    :param store: 转换结果缓存（FileStore），命中时不再执行转换
+    :param db_path: 任务状态数据库路径，为空时任务状态只保存在当前进程内
+    """
+
+    def __init__(self, converter, max_workers=2, job_ttl=3600, max_pending=32, store=None, db_path=None):
+        self.converter = converter
+        self.store = store
+        self.max_workers = max_workers
+        self.job_ttl = job_ttl
+        self.max_pending = max_pending
+        self.db_path = db_path
+        self._jobs = JobStore(db_path or ':memory:')
+        self._executor = None
+        self._threads = None
+        self._local = {}  # 本进程提交的未结束任务：job_id -> (future, executor)
+        self._lock = threading.RLock()  # 取消排队任务时回调会在同一线程内同步执行
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def _reset_executor(self, broken):
+        """转换进程异常退出（如被 OOM 终止）后进程池不可用，丢弃后下次提交时重建"""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+        app_logger.warning("Conversion job pool broken, a worker process exited unexpectedly; recreating")
+
+    def _get_threads(self):
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.max_pending, thread_name_prefix='doc-job')
+        return self._threads
+
+    def _run_shared(self, job_id, convert, *args):
+        """在线程中等待共享常驻进程完成转换，开始前已被取消的任务不再执行"""
+        job = self._jobs.update(job_id, _mark_running)
+        if job is None or job['status'] == CANCELLED:
+            return None
+        return convert(*args)
+
+    def _start(self, job):
+        """
+        启动转换：由共享常驻进程执行的转换（PDF调度器、DOCX转换进程池）只在线程中等待，
+        其余转换在任务进程池中执行
+        :return: (future, 执行该任务的进程池)，在线程中等待时进程池为 None
+        """
+        job_id, kind, file_path, filename = job['job_id'], job['kind'], job['source_file'], job['filename']
+        if kind == 'pdf2docx' and self.converter.uses_shared_workers(kind):
+            def update(job, progress):
+                if job['status'] in (QUEUED, RUNNING):
+                    job['status'] = RUNNING
+                    job['progress'] = progress
+
+            def progress(done, total):
+                self._jobs.update(job_id, lambda job: update(job, 99 * done // total))
+            future = self._get_threads().submit(
+                self._run_shared, job_id, self.converter.pdf_to_docx, file_path, filename, progress
+            )
+            return future, None
+        if kind == 'docx2pdf' and self.converter.uses_shared_workers(kind):
+            return self._get_threads().submit(self._run_shared, job_id, self.converter.docx_to_pdf, file_path, filename), None
+        args = (_run_job, self.db_path, job_id, kind, file_path, filename,
+                self.converter.docx_engine, self.converter.soffice)
+        executor = self._get_executor()
+        try:
+            future = executor.submit(*args)
+        except BrokenProcessPool:
+            # 进程池已在之前的任务中损坏，与本任务无关，重建后重新提交
+            self._reset_executor(executor)
+            executor = self._get_executor()
+            future = executor.submit(*args)
+        return future, executor
+
+    def submit(self, kind, file_path, filename, cache_key=None):
+        """
+        提交转换任务，kind 为 'pdf2docx' 或 'docx2pdf'
+        提供 cache_key 且结果缓存命中时，任务直接以成功状态返回
+        """
+        self.purge_expired()
+        cached_file = self.store.get(cache_key) if self.store and cache_key else None
+        if cached_file:
+            return self._cached_job(kind, file_path, filename, cached_file)
+
+        job = self._new_job(kind, file_path, filename, cache_key)
+        job_id = job['job_id']
+        with self._lock:
+            # 排队上限对同一主机的所有工作进程生效
+            if not self._jobs.add(job, self.max_pending):
+                raise JobQueueFull('转换任务过多，请稍后再试')
+            try:
+                future, executor = self._start(job)
+            except Exception:
+                self._jobs.delete(job_id)
+                raise
+            self._local[job_id] = (future, executor)
+
+        app_logger.info(f"Conversion job submitted - ID: {job_id}, Type: {kind}, File: {filename}")
+        future.add_done_callback(lambda future: self._finish(job_id, future))
+        return self.status(job_id)
+
+    @staticmethod
+    def _new_job(kind, file_path, filename, cache_key=None):
+        return {
+            'job_id': uuid.uuid4().hex,
+            'kind': kind,
+            'filename': filename,
+            'source_file': file_path,
+            'cache_key': cache_key,
+            'status': QUEUED,
+            'result': None,
+            'error': None,
+            'progress': None,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None
+        }
+
+    def _cached_job(self, kind, file_path, filename, cached_file):
+        """由缓存的转换结果直接生成已完成的任务"""
+        job = self._new_job(kind, file_path, filename)
+        job['status'] = SUCCESS
+        job['finished_at'] = time.time()
+        job['result'] = {
+            'status': 'success',
+            'message': '转换成功',
+            'output_file': cached_file,
+            'output_filename': self.converter.output_filename(kind, filename),
+            'cached': True
+        }
+        self._jobs.add(job)
+        self.converter._cleanup_files(file_path)
+        app_logger.info(f"Conversion job served from cache - ID: {job['job_id']}, Type: {kind}, File: {filename}")
+        return self.status(job['job_id'])
+
+    def _finish(self, job_id, future):
+        """转换结束回调：记录结果并清理源文件"""
+        with self._lock:
+            _, executor = self._local.pop(job_id, (None, None))
+        if future.cancelled():
+            error = result = None
+        else:
+            error = future.exception()
+            result = None if error is not None else future.result()
+            if isinstance(error, BrokenProcessPool):
+                # 只有本任务失败，后续任务由重建的进程池执行
+                self._reset_executor(executor)
+
+        cancelled = []
+
+        def finish(job):
+            job['finished_at'] = time.time()
+            cancelled.append(job['status'] == CANCELLED)
+            if future.cancelled():
+                job['status'] = CANCELLED
+            elif cancelled[0]:
+                # 执行中被取消（可能由其他进程取消）的任务保持取消状态，结果随后丢弃
+                pass
+            elif error is not None:
+                job['status'], job['error'] = FAILED, str(error)
+            elif result.get('status') != 'success':
+                job['status'], job['error'] = FAILED, result.get('message', '转换失败')
+            else:
+                job['status'], job['result'] = SUCCESS, result
+
+        job = self._jobs.update(job_id, finish)
+        if job is None:
+            return
+        if job['status'] != CANCELLED:
+            # 从提交到结束的总耗时，包含排队时间
+            CONVERSION_PHASE_SECONDS.observe(job['finished_at'] - job['created_at'], job['kind'], 'job')
+
+        self.converter._cleanup_files(job['source_file'])
+        if cancelled[0] and result and result.get('output_file'):
+            self.converter._cleanup_files(result['output_file'])
+        elif job['status'] == SUCCESS and self.store and job['cache_key']:
+            try:
+                self.store.put(job['cache_key'], result['output_file'])
+            except Exception as e:
+                app_logger.warning(f"Failed to cache conversion result - ID: {job_id}, Error: {str(e)}")
+        app_logger.info(f"Conversion job finished - ID: {job_id}, Status: {job['status']}")
+
+    @staticmethod
+    def _owned_output(job):
+        """任务自己的输出文件；来自结果缓存的文件由缓存管理，不随任务删除"""
+        result = job['result']
+        return result['output_file'] if result and not result.get('cached') else None
+
+    def _get(self, job_id):
+        """读取任务；任务状态只保存在进程内时，由本进程的 Future 判断是否已开始执行"""
+        job = self._jobs.get(job_id)
+        if job is not None and job['status'] == QUEUED:
+            with self._lock:
+                future, _ = self._local.get(job_id, (None, None))
+            if future is not None and future.running():
+                job = self._jobs.update(job_id, _mark_running)
+        return job
+
+    def status(self, job_id):
+        """任务状态，任务不存在或已过期时返回 None"""
+        job = self._get(job_id)
+        if job is None:
+            return None
+        end = job['finished_at'] or time.time()
+        status = {
+            'job_id': job_id,
+            'status': job['status'],
+            'progress': job['progress'] if job['status'] == RUNNING and job['progress'] is not None
+                        else _PROGRESS[job['status']],
+            'filename': job['filename'],
+            'output_filename': job['result']['output_filename'] if job['result'] else None,
+            'error': job['error'],
+            'cached': bool(job['result'] and job['result'].get('cached')),
+            'elapsed': round(end - job['created_at'], 3)
+        }
+        if job['finished_at']:
+            status['expires_in'] = max(round(job['finished_at'] + self.job_ttl - time.time()), 0)
+        return status
+
+    def result(self, job_id):
+        """已完成任务的转换结果，未完成时返回 None"""
+        job = self._jobs.get(job_id)
+        return job['result'] if job and job['status'] == SUCCESS else None
+
+    def cancel(self, job_id):
+        """
+        取消任务：排队中的任务直接移出队列；执行中的任务无法中断进程，结束后丢弃结果
+        已完成的任务同时删除输出文件
+        :return: 取消后的任务状态，任务不存在时返回 None
+        """
+        output_files = []
+
+        def cancel(job):
+            output_files.append(self._owned_output(job))
+            if job['status'] == SUCCESS:
+                job['result'] = None
+            job['status'] = CANCELLED
+            job['error'] = None
+
+        if self._jobs.update(job_id, cancel) is None:
+            return None
+        with self._lock:
+            future, _ = self._local.get(job_id, (None, None))
+        if future is not None:
+            future.cancel()
+
+        if output_files[0]:
+            self.converter._cleanup_files(output_files[0])
+        app_logger.info(f"Conversion job cancelled - ID: {job_id}")
+        return self.status(job_id)
+
+    def purge_expired(self):
+        """
+        删除结束超过 job_ttl 的任务及其输出文件
+        同时取消本进程中已被其他进程取消的排队任务，并将所属进程已退出的未结束任务标记为失败
+        """
+        with self._lock:
+            local = list(self._local.items())
+        for job_id, (future, _) in local:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] == CANCELLED:
+                future.cancel()
+
+        def fail(job):
+            if job['finished_at'] is None:
+                job['finished_at'] = time.time()
+                if job['status'] != CANCELLED:
+                    job['status'], job['error'] = FAILED, '转换进程已退出'
+
+        for job_id, owner in self._jobs.unfinished():
+            if not _process_alive(owner):
+                job = self._jobs.update(job_id, fail)
+                if job is not None:
+                    self.converter._cleanup_files(job['source_file'])
+                    app_logger.warning(f"Conversion job orphaned, owner process {owner} exited - ID: {job_id}")
+
+        expired = 0
+        for job in self._jobs.expired(time.time() - self.job_ttl):
+            # 多个进程同时清理时，只由删除成功的进程删除输出文件
+            if not self._jobs.delete(job['job_id']):
+                continue
+            expired += 1
+            output_file = self._owned_output(job)
+            if output_file:
+                self.converter._cleanup_files(output_file)
+        if expired:
+            app_logger.info(f"Purged {expired} expired conversion jobs")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
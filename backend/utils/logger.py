@@ -1,29 +1,194 @@
 import os
+import json
+import queue
+import atexit
 import logging
+import threading
 from logging.handlers import TimedRotatingFileHandler
 from datetime import datetime
+import config
 
 # 创建日志目录
 LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs')
 if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
 
+# 日志异步写入：请求线程只把日志记录放入内存队列，
+# 由后台线程成批写入控制台和文件，每批只刷新一次，磁盘和终端I/O不再阻塞请求
+
+class _TextFormatter(logging.Formatter):
+    """文本格式；带 fields 的结构化日志（如访问日志）渲染为 'key: value | ...'"""
+
+    def format(self, record):
+        fields = getattr(record, 'fields', None)
+        if fields is not None:
+            record.msg = " | ".join([f"{k}: {v}" for k, v in fields.items()])
+            record.args = None
+        return super().format(record)
+
+class _JsonFormatter(logging.Formatter):
+    """JSON Lines 格式，每条日志一行，fields 中的字段直接作为顶层键"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'line': record.lineno,
+            'message': record.getMessage()
+        }
+        fields = getattr(record, 'fields', None)
+        if fields is not None:
+            entry.update(fields)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class _DeferredFlushMixin:
+    """逐条写入时不刷新缓冲区，由后台线程在每批写完后调用 flush_now()"""
+
+    def flush(self):
+        pass
+
+    def flush_now(self):
+        super().flush()
+
+class _ConsoleHandler(_DeferredFlushMixin, logging.StreamHandler):
+    pass
+
+class _FileHandler(_DeferredFlushMixin, TimedRotatingFileHandler):
+    pass
+
+_STOP = object()
+
+class _AsyncWriter:
+    """
+    后台写入线程：取出一条记录后再取出队列中已有的记录（最多 batch_size 条）一并写入，然后统一刷新
+    队列有界，写满时丢弃新日志并计数，而不是阻塞请求线程
+    进程 fork 后（如转换进程池）在子进程中首次写日志时重新创建队列和线程
+    """
+
+    def __init__(self, handlers, maxsize, batch_size):
+        self.handlers = handlers
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid != pid:
+                self._queue = queue.Queue(self.maxsize)
+                self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+                self._thread.start()
+                self._pid = pid
+
+    def put(self, record):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = False
+            for record in batch:
+                if record is _STOP:
+                    stop = True
+                    continue
+                try:
+                    self._write(record)
+                except Exception:
+                    pass  # 日志写入失败不能影响写入线程
+            for handler in self.handlers:
+                try:
+                    handler.flush_now()
+                except Exception:
+                    pass
+            if stop:
+                return
+
+    def stop(self, timeout=5):
+        """写完队列中剩余的日志后停止"""
+        if self._pid != os.getpid() or self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize() if self._pid == os.getpid() else 0,
+            'dropped': self.dropped
+        }
+
+class _QueueingHandler(logging.Handler):
+    """在调用线程中完成消息格式化（参数和异常堆栈不能跨线程延后处理），然后放入写入队列"""
+
+    def __init__(self, writer):
+        super().__init__()
+        self.writer = writer
+
+    def emit(self, record):
+        try:
+            if record.args:
+                record.msg = record.getMessage()
+                record.args = None
+            if record.exc_info:
+                if not record.exc_text:
+                    record.exc_text = logging.Formatter().formatException(record.exc_info)
+                record.exc_info = None
+            self.writer.put(record)
+        except Exception:
+            self.handleError(record)
+
+_writers = {}
+
+def _formatters():
+    if config.LOG_FORMAT == 'json':
+        json_format = _JsonFormatter()
+        return json_format, json_format, json_format
+    return (
+        _TextFormatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S'),
+        _TextFormatter('[%(asctime)s] %(levelname)s [%(name)s:%(lineno)d] - %(message)s', datefmt='%Y-%m-%d %H:%M:%S'),
+        # 异常堆栈由 Formatter 自动附加在消息之后
+        _TextFormatter('[%(asctime)s] %(levelname)s [%(name)s:%(lineno)d] - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    )
+
 def setup_logger(name):
     logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
+    # 不再传递给根日志记录器，避免第三方库配置的根处理器重复输出
+    logger.propagate = False
+
+    console_format, file_format, error_format = _formatters()
 
     # 控制台处理器
-    console_handler = logging.StreamHandler()
+    console_handler = _ConsoleHandler()
     console_handler.setLevel(logging.INFO)
-    console_format = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
     console_handler.setFormatter(console_format)
-    logger.addHandler(console_handler)
 
     # 文件处理器 - 按天切割
-    file_handler = TimedRotatingFileHandler(
+    file_handler = _FileHandler(
         filename=os.path.join(LOG_DIR, f'{name}.log'),
         when='midnight',
         interval=1,
@@ -31,15 +196,10 @@ def setup_logger(name):
         encoding='utf-8'
     )
     file_handler.setLevel(logging.INFO)
-    file_format = logging.Formatter(
-        '[%(asctime)s] %(levelname)s [%(name)s:%(lineno)d] - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
     file_handler.setFormatter(file_format)
-    logger.addHandler(file_handler)
 
     # 错误日志单独记录
-    error_handler = TimedRotatingFileHandler(
+    error_handler = _FileHandler(
         filename=os.path.join(LOG_DIR, f'{name}_error.log'),
         when='midnight',
         interval=1,
@@ -47,17 +207,27 @@ def setup_logger(name):
         encoding='utf-8'
     )
     error_handler.setLevel(logging.ERROR)
-    error_format = logging.Formatter(
-        '[%(asctime)s] %(levelname)s [%(name)s:%(lineno)d] - %(message)s\n'
-        'Exception:\n%(exc_info)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
     error_handler.setFormatter(error_format)
-    logger.addHandler(error_handler)
 
+    handlers = [file_handler, error_handler]
+    if config.LOG_CONSOLE:
+        handlers.insert(0, console_handler)
+    writer = _AsyncWriter(handlers,
+                          maxsize=config.LOG_QUEUE_SIZE, batch_size=config.LOG_BATCH_SIZE)
+    _writers[name] = writer
+    logger.addHandler(_QueueingHandler(writer))
     return logger
 
+def get_log_stats():
+    """各日志记录器的队列长度和丢弃数"""
+    return {name: writer.stats() for name, writer in _writers.items()}
+
+@atexit.register
+def _flush_logs():
+    for writer in _writers.values():
+        writer.stop()
+
 # 创建应用日志记录器
 app_logger = setup_logger('app')
 # 创建API日志记录器
-api_logger = setup_logger('api') 
\ No newline at end of file
+api_logger = setup_logger('api')
@@ -0,0 +1,274 @@
+import os
+import csv
+import time
+import threading
+from array import array
+from bisect import bisect_right
+import numpy as np
+from utils.ip_tools import _ADDRESS_FAMILIES, _parse_address, parse_ip_interval, format_address
+from utils.logger import app_logger
+
+# 最长前缀匹配（LPM）
+# 前缀表在加载时编译一次：按起始地址排序后用栈展开嵌套前缀，得到互不重叠的基本区间，
+# 每个区间记录覆盖它的最具体前缀（相当于把前缀树的叶子推平为一张有序区间表）。
+# 查询只需在区间起点上做一次二分查找，与前缀数量、前缀长度分布无关；
+# IPv4 批量查询使用 numpy.searchsorted 整批完成。
+
+def _empty_column(version):
+    return array('I') if version == 4 else []
+
+def _parse_prefix(text):
+    """解析前缀或单个地址为 (version, start, end)，不接受地址范围"""
+    text = text.strip()
+    if '-' in text:
+        raise ValueError(f"无效的前缀: {text}")
+    return parse_ip_interval(text)
+
+def _prefix_string(version, start, end):
+    prefixlen = _ADDRESS_FAMILIES[version][2] - (end - start).bit_length()
+    return f"{format_address(version, start)}/{prefixlen}"
+
+class PrefixTable:
+    """
+    编译后的只读前缀表，创建后不再修改，可被多个线程同时查询
+    :param entries: (前缀, 标签) 序列，前缀可为 '10.0.0.0/8' 或单个地址；重复前缀以最后一条为准
+    """
+
+    def __init__(self, entries, source=None):
+        prefixes = {}
+        for prefix, label in entries:
+            prefixes[_parse_prefix(prefix)] = label
+        self.source = source
+        self.loaded_at = time.time()
+        self._prefixes = [(_prefix_string(*interval), label) for interval, label in prefixes.items()]
+        self._columns = {}
+        for version in (4, 6):
+            nets = sorted(((start, -end, index)
+                           for index, (prefix_version, start, end) in enumerate(prefixes)
+                           if prefix_version == version))
+            if nets:
+                self._columns[version] = self._compile(version, nets)
+        self._v4_starts = np.frombuffer(self._columns[4][0], dtype=np.uint32) if 4 in self._columns else None
+
+    @staticmethod
+    def _compile(version, nets):
+        """
+        将按 (起始地址, -结束地址) 排序的前缀展开为基本区间
+        前缀之间只有嵌套或不相交两种关系，栈顶始终是当前位置最具体的前缀
+        """
+        starts, ends, targets = _empty_column(version), _empty_column(version), array('I')
+
+        def emit(start, end, index):
+            if start <= end:
+                starts.append(start)
+                ends.append(end)
+                targets.append(index)
+
+        stack = []  # (结束地址, 前缀编号)
+        cursor = 0
+        for start, negative_end, index in nets:
+            end = -negative_end
+            # 结束于当前前缀之前的外层前缀依次出栈
+            while stack and stack[-1][0] < start:
+                top_end, top_index = stack.pop()
+                emit(cursor, top_end, top_index)
+                cursor = top_end + 1
+            if stack:
+                emit(cursor, start - 1, stack[-1][1])
+            cursor = start
+            stack.append((end, index))
+        while stack:
+            top_end, top_index = stack.pop()
+            emit(cursor, top_end, top_index)
+            cursor = top_end + 1
+        return starts, ends, targets
+
+    def __len__(self):
+        return len(self._prefixes)
+
+    def _match(self, version, value):
+        columns = self._columns.get(version)
+        if columns is None:
+            return None
+        starts, ends, targets = columns
+        index = bisect_right(starts, value) - 1
+        if index >= 0 and ends[index] >= value:
+            return self._prefixes[targets[index]]
+        return None
+
+    def lookup(self, ip):
+        """
+        :return: (前缀, 标签)，没有匹配的前缀时返回 None
+        """
+        return self._match(*_parse_address(ip.strip()))
+
+    def lookup_many(self, ips):
+        """
+        批量查询
+        :return: 每项为 {'ip', 'prefix', 'label', 'error'} 的列表，顺序与输入一致
+        """
+        results = [None] * len(ips)
+        v4_rows, v4_values = [], []
+        for row, ip in enumerate(ips):
+            text = ip.strip()
+            try:
+                version, value = _parse_address(text)
+            except ValueError as e:
+                results[row] = {'ip': text, 'prefix': None, 'label': None, 'error': str(e)}
+                continue
+            if version == 4 and self._v4_starts is not None:
+                v4_rows.append(row)
+                v4_values.append(value)
+            else:
+                results[row] = self._result(text, self._match(version, value))
+
+        if v4_rows:
+            _, ends, targets = self._columns[4]
+            values = np.array(v4_values, dtype=np.uint32)
+            indexes = np.searchsorted(self._v4_starts, values, side='right') - 1
+            for row, value, index in zip(v4_rows, v4_values, indexes.tolist()):
+                match = self._prefixes[targets[index]] if index >= 0 and ends[index] >= value else None
+                results[row] = self._result(ips[row].strip(), match)
+        return results
+
+    @staticmethod
+    def _result(ip, match):
+        prefix, label = match if match else (None, None)
+        return {'ip': ip, 'prefix': prefix, 'label': label, 'error': None}
+
+    def stats(self):
+        return {
+            'prefixes': len(self._prefixes),
+            'ipv4_ranges': len(self._columns[4][0]) if 4 in self._columns else 0,
+            'ipv6_ranges': len(self._columns[6][0]) if 6 in self._columns else 0,
+            'source': self.source,
+            'loaded_at': round(self.loaded_at, 3)
+        }
+
+def read_prefix_file(path):
+    """
+    读取前缀表CSV，每行为 prefix[,label]，空行和 # 开头的行忽略，首行无法解析时视为表头
+    """
+    entries = []
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for line_no, row in enumerate(csv.reader(f), 1):
+            if not row or not row[0].strip() or row[0].lstrip().startswith('#'):
+                continue
+            prefix = row[0].strip()
+            label = row[1].strip() if len(row) > 1 else ''
+            try:
+                _parse_prefix(prefix)
+            except ValueError:
+                if line_no == 1:
+                    continue
+                raise ValueError(f"第{line_no}行前缀格式错误: {prefix}")
+            entries.append((prefix, label))
+    return entries
+
+class LpmService:
+    """
+    持有当前前缀表并支持热更新：新表在后台编译完成后整体替换引用，
+    正在进行的查询继续使用旧表，不会出现查询中断或读到半成品
+    多进程部署时各工作进程共享同一前缀表文件：replace() 写入文件后，其他进程在下次检查修改时间时加载新表
+    :param path: 前缀表文件，为空时只能通过 replace() 设置，且只对当前进程生效
+    :param reload_interval: 检查文件修改时间的最小间隔（秒），为0时只在首次查询时加载，工作进程之间不再同步
+    """
+
+    def __init__(self, path='', reload_interval=5):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._table = PrefixTable([], source=None)
+        self._mtime = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def table(self):
+        """当前前缀表；文件有更新时先重新加载"""
+        if self.path and (not self._checked_at or
+                          (self.reload_interval and time.time() - self._checked_at >= self.reload_interval)):
+            self._reload_if_changed()
+        return self._table
+
+    def _reload_if_changed(self):
+        if not self._lock.acquire(blocking=False):
+            # 其他线程正在加载，继续使用当前表
+            return
+        background = False
+        try:
+            self._checked_at = time.time()
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                return
+            if mtime == self._mtime:
+                return
+            if self._mtime is None:
+                # 首次加载同步完成
+                self._load_quietly(mtime)
+                return
+            # 更新在后台线程编译，期间所有查询继续使用旧表，由后台线程释放锁
+            threading.Thread(target=self._background_load, args=(mtime,),
+                             name='lpm-reload', daemon=True).start()
+            background = True
+        finally:
+            if not background:
+                self._lock.release()
+
+    def _background_load(self, mtime):
+        try:
+            self._load_quietly(mtime)
+        finally:
+            self._lock.release()
+
+    def _load_quietly(self, mtime):
+        try:
+            self._load(mtime)
+        except Exception:
+            pass  # 已记录日志，保留旧表
+
+    def _load(self, mtime):
+        try:
+            table = PrefixTable(read_prefix_file(self.path), source=self.path)
+        except Exception as e:
+            # 新表有误时保留旧表
+            app_logger.error(f"Failed to load prefix table {self.path}: {str(e)}")
+            self._mtime = mtime
+            raise
+        self._table, self._mtime = table, mtime
+        app_logger.info(f"Prefix table loaded - Source: {self.path}, Prefixes: {len(table)}")
+
+    def reload(self):
+        """立即从文件重新加载"""
+        if not self.path:
+            raise ValueError('未配置前缀表文件')
+        with self._lock:
+            self._checked_at = time.time()
+            self._load(os.path.getmtime(self.path))
+        return self._table
+
+    def _write(self, table):
+        """先写临时文件再原子替换，其他进程不会读到写了一半的文件"""
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerows(table._prefixes)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return os.path.getmtime(self.path)
+
+    def replace(self, entries, source='api'):
+        """以给定的 (前缀, 标签) 列表替换当前表，配置了前缀表文件时同时写入文件"""
+        table = PrefixTable(entries, source=source)
+        with self._lock:
+            if self.path:
+                self._mtime = self._write(table)
+                self._checked_at = time.time()
+            self._table = table
+        app_logger.info(f"Prefix table replaced - Source: {source}, Prefixes: {len(table)}")
+        return table
@@ -0,0 +1,241 @@
+import os
+import math
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+# 进程内指标，按 Prometheus 文本格式导出
+# 每个线程只写自己的分片（普通字典和列表上的自增，不加锁），导出时再汇总所有分片；
+# 已结束线程的分片在导出时并入归档值后释放，分片数量不会随线程的创建销毁无限增长。
+# 指标按进程统计，多进程部署时各进程分别导出。
+
+# 默认的耗时分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        if value.is_integer():
+            return str(int(value))
+        return repr(value)
+    return str(value)
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def reset(self):
+        """清空所有指标的值（fork 出的子进程不应继承父进程的计数）"""
+        for metric in self._metrics:
+            metric.reset()
+
+    def expose(self):
+        """Prometheus 文本格式"""
+        lines = []
+        for metric in list(self._metrics):
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []    # [(线程, {标签值元组: 值})]
+        self._retired = {}   # 已结束线程的累计值
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _shard(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            values = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), values))
+            self._local.values = values
+            return values
+
+    def _merge(self, target, values):
+        for labels, value in values.items():
+            target[labels] = target.get(labels, 0) + value
+
+    def _copy(self, values):
+        return dict(values)
+
+    def collect(self):
+        """汇总各线程分片，返回 {标签值元组: 值}"""
+        with self._lock:
+            alive = []
+            for thread, values in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, values))
+                else:
+                    self._merge(self._retired, values)
+            self._shards = alive
+            merged = self._copy(self._retired)
+        for _, values in alive:
+            # dict.copy 在持有 GIL 时一次完成，不会与写入线程的插入冲突
+            self._merge(merged, values.copy())
+        return merged
+
+    def reset(self):
+        # 可能在 fork 后的子进程中调用，父进程中被其他线程持有的锁不能再使用，直接替换
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = {}
+        self._local = threading.local()
+
+class Counter(_Metric):
+    """只增不减的计数"""
+    kind = 'counter'
+
+    def inc(self, *labelvalues, amount=1):
+        values = self._shard()
+        values[labelvalues] = values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+                for labels, value in sorted(self.collect().items())]
+
+class Gauge(Counter):
+    """可增可减的当前值，如进行中的请求数；各线程的增减汇总后即为当前值"""
+    kind = 'gauge'
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc(*labelvalues, amount=-amount)
+
+class GaugeFunction:
+    """导出时调用 fn 取值的指标，fn 返回数值，或在有标签时返回 {标签值元组: 值}"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, fn, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+        if registry is not None:
+            registry.register(self)
+
+    def samples(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        values = value if self.labelnames else {(): value}
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+                for labels, value in sorted(values.items())]
+
+    def reset(self):
+        pass
+
+class Histogram(_Metric):
+    """
+    分桶计数的耗时分布，可在 Prometheus 中用 histogram_quantile 计算 p50/p99
+    每个标签组合保存各桶（不累计）的计数和总和，导出时再换算为累计计数
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, *labelvalues):
+        values = self._shard()
+        row = values.get(labelvalues)
+        if row is None:
+            # 各桶计数 + 超出最大桶的计数 + 总和
+            row = values[labelvalues] = [0] * (len(self.buckets) + 2)
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def time(self, *labelvalues):
+        """计时上下文管理器"""
+        return _Timer(self, labelvalues)
+
+    def _merge(self, target, values):
+        for labels, row in values.items():
+            current = target.get(labels)
+            if current is None:
+                target[labels] = list(row)
+            else:
+                for index, value in enumerate(row):
+                    current[index] += value
+
+    def _copy(self, values):
+        return {labels: list(row) for labels, row in values.items()}
+
+    def samples(self):
+        lines = []
+        bounds = [_format_value(float(bound)) for bound in self.buckets] + ['+Inf']
+        for labels, row in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, row[:-1]):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames, labels, 'le="%s"' % bound)
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(float(row[-1]))}')
+            lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+class _Timer:
+    __slots__ = ('histogram', 'labelvalues', 'start')
+
+    def __init__(self, histogram, labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(perf_counter() - self.start, *self.labelvalues)
+        return False
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=REGISTRY.reset)
+
+# ---- 全局指标 ----
+
+HTTP_REQUESTS = Counter(
+    'http_requests_total', '按路由、方法和状态码统计的请求数', ('method', 'route', 'status'))
+HTTP_REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', '按路由统计的请求处理耗时（秒）', ('method', 'route'))
+HTTP_IN_FLIGHT = Gauge(
+    'http_requests_in_flight', '正在处理的请求数', ('route',))
+UPSTREAM_SECONDS = Histogram(
+    'upstream_request_duration_seconds',
+    '上游调用耗时（秒）：service 为 ip-api 或 dns，target 为接口或DNS服务器',
+    ('service', 'target', 'outcome'))
+UPSTREAM_THROTTLED = Counter(
+    'upstream_throttled_total',
+    '受限流影响的上游调用数：delayed 排队后发出，shed 因超过截止时间被拒绝，coalesced 合并到进行中的相同查询',
+    ('service', 'target', 'action'))
+CONVERSION_PHASE_SECONDS = Histogram(
+    'doc_conversion_phase_seconds', '文档转换各阶段耗时（秒）', ('kind', 'phase'),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600))
@@ -0,0 +1,214 @@
+import os
+import uuid
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from utils.logger import app_logger
+from utils.metrics import CONVERSION_PHASE_SECONDS
+
+# 以下函数在调度器的工作进程中执行，pdf2docx 仅在工作进程中导入
+
+def _page_count(pdf_file):
+    from utils.doc_tools import load_converter
+    with load_converter('pymupdf').open(pdf_file) as doc:
+        return doc.page_count
+
+def _convert_whole(pdf_file, output_file, settings):
+    """页数较少的文档直接在单个进程中完成转换"""
+    from utils.doc_tools import load_converter
+    cv = load_converter('pdf2docx')(pdf_file)
+    try:
+        cv.convert(output_file, multi_processing=False, **settings)
+    finally:
+        cv.close()
+
+def _merged_settings(cv, settings):
+    """parse/make_docx 不会自行补全默认参数（Converter.convert 才会），须与默认值合并后传入"""
+    return {**cv.default_settings, **settings}
+
+def _parse_pages(pdf_file, start, end, settings):
+    """解析 [start, end) 页，返回可序列化的版面数据"""
+    from utils.doc_tools import load_converter
+    cv = load_converter('pdf2docx')(pdf_file)
+    try:
+        cv.parse(start=start, end=end, **_merged_settings(cv, settings))
+        return cv.store()['pages']
+    finally:
+        cv.close()
+
+def _make_docx(pdf_file, output_file, page_count, pages, settings):
+    """由各页的版面数据生成 docx"""
+    from utils.doc_tools import load_converter
+    cv = load_converter('pdf2docx')(pdf_file)
+    try:
+        cv.restore({'page_cnt': page_count, 'pages': pages})
+        cv.make_docx(output_file, **_merged_settings(cv, settings))
+    finally:
+        cv.close()
+
+class PdfConversionScheduler:
+    """
+    全局的 PDF 转换调度器：所有请求共享一个固定大小的进程池
+    每个文档按页拆分为若干任务，调度时在各请求之间轮转取任务，
+    进程池中同时只放入与进程数相同的任务，避免先到的大文档独占全部进程
+    进程池中的进程异常退出（如被 OOM 终止）时重建进程池，受影响的任务最多重试 max_attempts 次
+    :param workers: 进程数
+    :param pages_per_task: 每个任务解析的页数
+    :param max_attempts: 每个任务因进程池损坏最多执行的次数
+    """
+
+    def __init__(self, workers, pages_per_task=4, max_attempts=2):
+        self.workers = workers
+        self.pages_per_task = pages_per_task
+        self.max_attempts = max_attempts
+        self._pool = None
+        self._queues = OrderedDict()  # 请求ID -> 待执行任务队列
+        self._inflight = 0
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def _reset_pool(self, broken):
+        """丢弃已损坏的进程池，下次提交时重建；其他回调已重建过时不再处理"""
+        with self._lock:
+            if self._pool is not broken:
+                return
+            self._pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+        app_logger.warning("PDF conversion pool broken, a worker process exited unexpectedly; recreating")
+
+    def _submit(self, request_id, fn, *args):
+        """将任务放入请求自己的队列，返回该任务的 Future"""
+        future = Future()
+        with self._lock:
+            self._queues.setdefault(request_id, deque()).append((future, fn, args, 1))
+        self._dispatch()
+        return future
+
+    def _retry(self, request_id, task):
+        """把任务放回请求队列的队首重新执行"""
+        with self._lock:
+            self._queues.setdefault(request_id, deque()).appendleft(task)
+            self._queues.move_to_end(request_id, last=False)
+
+    def _dispatch(self):
+        """按请求轮转，把任务放入进程池直到占满所有进程"""
+        while True:
+            with self._lock:
+                if self._inflight >= self.workers or not self._queues:
+                    return
+                request_id, queue = next(iter(self._queues.items()))
+                task = queue.popleft()
+                future, fn, args, attempt = task
+                # 取出一个任务后把该请求移到队尾，实现轮转
+                if queue:
+                    self._queues.move_to_end(request_id)
+                else:
+                    del self._queues[request_id]
+                # 重试的任务已处于执行状态
+                if not future.running() and not future.set_running_or_notify_cancel():
+                    continue
+                self._inflight += 1
+            pool = self._get_pool()
+            try:
+                pool_future = pool.submit(fn, *args)
+            except BrokenProcessPool:
+                # 进程池在上一批任务中已损坏，与本任务无关，重建后重新提交
+                self._task_done()
+                self._reset_pool(pool)
+                self._retry(request_id, task)
+                continue
+            except Exception as e:
+                self._task_done()
+                future.set_exception(e)
+                continue
+            pool_future.add_done_callback(
+                lambda done, pool=pool, request_id=request_id, task=task:
+                self._complete(pool, request_id, task, done))
+
+    def _task_done(self):
+        with self._lock:
+            self._inflight -= 1
+
+    def _complete(self, pool, request_id, task, pool_future):
+        self._task_done()
+        future, fn, args, attempt = task
+        error = pool_future.exception()
+        if isinstance(error, BrokenProcessPool):
+            self._reset_pool(pool)
+            if attempt < self.max_attempts:
+                app_logger.warning(f"Retrying PDF conversion task after pool failure - "
+                                   f"Task: {fn.__name__}, Attempt: {attempt + 1}/{self.max_attempts}")
+                self._retry(request_id, (future, fn, args, attempt + 1))
+                self._dispatch()
+                return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(pool_future.result())
+        self._dispatch()
+
+    def _cancel(self, request_id):
+        """丢弃请求中尚未执行的任务"""
+        with self._lock:
+            queue = self._queues.pop(request_id, None)
+        for future, _, _, _ in queue or ():
+            future.cancel()
+
+    def convert(self, pdf_file, output_file, settings, progress=None):
+        """
+        转换 PDF 为 docx，阻塞直到完成
+        :param progress: 进度回调，参数为 (已完成任务数, 总任务数)
+        """
+        request_id = uuid.uuid4().hex
+        with CONVERSION_PHASE_SECONDS.time('pdf2docx', 'page_count'):
+            page_count = self._submit(request_id, _page_count, pdf_file).result()
+        ranges = [(start, min(start + self.pages_per_task, page_count))
+                  for start in range(0, page_count, self.pages_per_task)]
+        app_logger.info(f"Scheduling PDF conversion - File: {os.path.basename(pdf_file)}, "
+                      f"Pages: {page_count}, Tasks: {len(ranges)}")
+
+        if len(ranges) <= 1:
+            with CONVERSION_PHASE_SECONDS.time('pdf2docx', 'convert'):
+                self._submit(request_id, _convert_whole, pdf_file, output_file, settings).result()
+            if progress:
+                progress(1, 1)
+            return
+
+        total = len(ranges) + 1
+        futures = [self._submit(request_id, _parse_pages, pdf_file, start, end, settings)
+                   for start, end in ranges]
+        pages = []
+        try:
+            with CONVERSION_PHASE_SECONDS.time('pdf2docx', 'parse'):
+                for done, future in enumerate(futures, 1):
+                    pages.extend(future.result())
+                    if progress:
+                        progress(done, total)
+        except BaseException:
+            self._cancel(request_id)
+            raise
+
+        with CONVERSION_PHASE_SECONDS.time('pdf2docx', 'make_docx'):
+            self._submit(request_id, _make_docx, pdf_file, output_file, page_count, pages, settings).result()
+        if progress:
+            progress(total, total)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'pages_per_task': self.pages_per_task,
+                'running': self._inflight,
+                'requests': len(self._queues),
+                'queued': sum(len(queue) for queue in self._queues.values())
+            }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,108 @@
+import time
+import threading
+from concurrent.futures import Future
+
+class TokenBucket:
+    """
+    线程安全的令牌桶，按预约方式排队：每次调用预约下一个可用令牌并返回需要等待的时间，
+    令牌不足时允许欠账，后到的调用依次排在后面，等待时间随之递增（先到先得）
+    预计等待超过调用方的截止时间时直接拒绝且不消耗令牌，不会为注定超时的请求占用名额
+    :param rate: 每分钟发放的令牌数
+    :param burst: 桶容量，即空闲后允许立即连续发出的请求数
+    """
+
+    def __init__(self, rate, burst=1, clock=time.monotonic):
+        self.interval = 60.0 / rate
+        self.burst = max(burst, 1)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()  # 令牌数的计算时刻，暂停期间位于未来，在此之前不补充令牌
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.delayed = 0
+        self.shed = 0
+
+    def _refill(self, now):
+        if now > self._updated:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) / self.interval)
+            self._updated = now
+
+    def reserve(self, max_wait):
+        """
+        预约一个令牌
+        :param max_wait: 最多愿意等待的秒数
+        :return: 需要等待的秒数，超过 max_wait 时返回 None（未消耗令牌）
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            remaining = self._tokens - 1
+            wait = max(self._updated - now, 0.0) + max(-remaining, 0.0) * self.interval
+            if wait > max_wait:
+                self.shed += 1
+                return None
+            self._tokens = remaining
+            self.granted += 1
+            if wait > 0:
+                self.delayed += 1
+            return wait
+
+    def pause(self, seconds):
+        """上游要求暂停（如返回429或剩余配额为0）时，seconds 秒内不再发放令牌，恢复时刻最多放行一个请求"""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._tokens = min(self._tokens, 1.0)
+            self._updated = max(self._updated, now + seconds)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rate_per_minute': round(60.0 / self.interval, 3),
+                'burst': self.burst,
+                'granted': self.granted,
+                'delayed': self.delayed,
+                'shed': self.shed
+            }
+
+class SingleFlight:
+    """
+    相同键的并发调用合并为一次：第一个调用方认领并执行，其余调用方等待其结果
+    认领方必须对认领的每个键调用 resolve() 或 reject()，否则等待方只能等到超时
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def claim(self, keys):
+        """
+        :return: (本次认领、需要自行执行的键列表, {已由其他调用方执行的键: Future})
+        """
+        owned, waiting = [], {}
+        with self._lock:
+            for key in keys:
+                future = self._calls.get(key)
+                if future is None:
+                    self._calls[key] = Future()
+                    owned.append(key)
+                else:
+                    waiting[key] = future
+        return owned, waiting
+
+    def resolve(self, key, result):
+        with self._lock:
+            future = self._calls.pop(key, None)
+        if future is not None:
+            future.set_result(result)
+
+    def reject(self, key, error):
+        """认领方执行失败，等待方收到同一个异常"""
+        with self._lock:
+            future = self._calls.pop(key, None)
+        if future is not None:
+            future.set_exception(error)
+
+    def inflight(self):
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,260 @@
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+from utils.logger import app_logger
+from utils.host_lock import file_lock
+
+# 文件扩展名对应的转换类型
+_KINDS = {'.pdf': 'pdf2docx', '.docx': 'docx2pdf'}
+# 分块上传会话的元数据文件名：.<upload_id>.json
+_SESSION_FILE = re.compile(r'^\.([0-9a-f]{32})\.json$')
+
+class UploadError(Exception):
+    """上传校验失败，status 为对应的HTTP状态码"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def safe_filename(filename):
+    """仅对文件名中的特殊字符进行安全处理，保留中文"""
+    return "".join([c for c in filename if c.isalnum() or c.isspace() or c in '._-()[]{}中文韩文日文'])
+
+def upload_kind(filename):
+    """根据扩展名确定转换类型"""
+    kind = _KINDS.get(os.path.splitext(filename)[1].lower())
+    if kind is None:
+        raise UploadError('不支持的文件格式，仅支持PDF和DOCX文件')
+    return kind
+
+def sniff_kind(head):
+    """根据文件头的魔数识别文档类型，无法识别时返回 None"""
+    # PDF 规范允许文件头前存在少量字节
+    if b'%PDF-' in head[:1024]:
+        return 'pdf2docx'
+    # DOCX 为 ZIP 容器
+    if head.startswith(b'PK\x03\x04'):
+        return 'docx2pdf'
+    return None
+
+def write_stream(stream, file, digest, kind, max_bytes, chunk_size, offset=0, length=None):
+    """
+    将输入流分块写入文件并累计哈希，内存占用与文件大小无关
+    offset 为0时用首块校验文件头，超出 max_bytes 时立即停止读取
+    :param digest: 累计哈希对象，为 None 时不计算
+    :param length: 本次最多读取的字节数，None 表示读到流结束
+    :return: 本次写入的字节数
+    """
+    written = 0
+    while length is None or written < length:
+        size = chunk_size if length is None else min(chunk_size, length - written)
+        chunk = stream.read(size)
+        if not chunk:
+            break
+        if offset == 0 and written == 0 and sniff_kind(chunk) != kind:
+            raise UploadError('文件内容与扩展名不符，仅支持PDF和DOCX文件')
+        if offset + written + len(chunk) > max_bytes:
+            raise UploadError(f'文件大小超过限制（{max_bytes // 1024 // 1024}MB）', 413)
+        if digest is not None:
+            digest.update(chunk)
+        file.write(chunk)
+        written += len(chunk)
+    if offset == 0 and written == 0:
+        raise UploadError('文件大小为0，可能是空文件')
+    return written
+
+class UploadManager:
+    """
+    上传管理：普通上传一次写完，分块上传可断点续传
+    分块上传会话保存在上传目录中（元数据文件 + 已接收的部分文件），同一主机的所有工作进程共享，
+    各分块可以由不同的工作进程接收；已接收字节数即部分文件的大小，同一会话的写入由文件锁串行化
+    :param upload_folder: 上传文件保存目录
+    :param max_bytes: 单个文件大小上限
+    :param chunk_size: 读写缓冲块大小
+    :param session_ttl: 分块上传会话无活动后的过期时间（秒）
+    """
+
+    def __init__(self, upload_folder, max_bytes, chunk_size=1024 * 1024, session_ttl=3600):
+        self.upload_folder = upload_folder
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.session_ttl = session_ttl
+
+    def _stored_path(self, upload_id, filename):
+        """上传文件的保存路径：以上传ID为前缀，同名文件并发上传时互不覆盖，原始文件名仅用于下载"""
+        return os.path.join(self.upload_folder, f'{upload_id}_{filename}')
+
+    def _result(self, path, filename, kind, digest, size):
+        return {
+            'path': path,
+            'filename': filename,
+            'kind': kind,
+            'sha256': digest.hexdigest(),
+            'size': size
+        }
+
+    def save(self, stream, filename):
+        """
+        保存一次性上传的文件
+        :return: 上传信息 {'path', 'filename', 'kind', 'sha256', 'size'}，filename 为处理后的原始文件名
+        """
+        name = safe_filename(filename)
+        kind = upload_kind(filename)
+        path = self._stored_path(uuid.uuid4().hex, name)
+        digest = hashlib.sha256()
+        try:
+            with open(path, 'wb') as f:
+                size = write_stream(stream, f, digest, kind, self.max_bytes, self.chunk_size)
+        except Exception:
+            self._remove(path)
+            raise
+        return self._result(path, name, kind, digest, size)
+
+    def _session_files(self, upload_id):
+        """会话的 (元数据文件, 部分文件, 锁文件)"""
+        base = os.path.join(self.upload_folder, f'.{upload_id}')
+        return base + '.json', base + '.part', base + '.lock'
+
+    def create(self, filename, size):
+        """创建分块上传会话，文件总大小需预先声明"""
+        self.purge_expired()
+        kind = upload_kind(filename)
+        size = int(size)
+        if size <= 0:
+            raise UploadError('文件大小为0，可能是空文件')
+        if size > self.max_bytes:
+            raise UploadError(f'文件大小超过限制（{self.max_bytes // 1024 // 1024}MB）', 413)
+
+        upload_id = uuid.uuid4().hex
+        meta_path, part_path, _ = self._session_files(upload_id)
+        open(part_path, 'wb').close()
+        # 先写部分文件再原子地写入元数据，其他进程看到会话时部分文件已存在
+        tmp_path = f'{meta_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'filename': safe_filename(filename), 'kind': kind, 'size': size}, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+        app_logger.info(f"Chunked upload created - ID: {upload_id}, File: {filename}, Size: {size}")
+        return self.status(upload_id)
+
+    def _get(self, upload_id):
+        """读取会话，返回元数据及已接收字节数"""
+        if not isinstance(upload_id, str) or not re.fullmatch(r'[0-9a-f]{32}', upload_id):
+            raise UploadError('上传会话不存在或已过期', 404)
+        meta_path, part_path, lock_path = self._session_files(upload_id)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                session = json.load(f)
+            session['received'] = os.path.getsize(part_path)
+        except (OSError, ValueError):
+            raise UploadError('上传会话不存在或已过期', 404)
+        session.update(upload_id=upload_id, meta=meta_path, path=part_path, lock=lock_path)
+        return session
+
+    @staticmethod
+    def _status(session):
+        return {
+            'upload_id': session['upload_id'],
+            'filename': session['filename'],
+            'size': session['size'],
+            'received': session['received'],
+            'complete': session['received'] == session['size']
+        }
+
+    def status(self, upload_id):
+        return self._status(self._get(upload_id))
+
+    def append(self, upload_id, stream, offset, length=None):
+        """
+        追加一个分块，offset 必须等于已接收的字节数，否则返回 409 及当前进度供客户端续传
+        :return: 上传状态
+        """
+        session = self._get(upload_id)
+        with file_lock(session['lock']):
+            # 等待锁期间会话可能已被其他进程完成或取消，重新读取
+            session = self._get(upload_id)
+            received = session['received']
+            if int(offset) != received:
+                raise UploadError(f"分块偏移不连续，已接收 {received} 字节", 409)
+            limit = session['size'] - received
+            if length is not None and int(length) > limit:
+                raise UploadError('分块超出声明的文件大小', 413)
+            # 分块写入失败时回滚到分块开始前的状态，客户端可从原偏移重传
+            try:
+                with open(session['path'], 'ab') as f:
+                    written = write_stream(
+                        stream, f, None, session['kind'],
+                        session['size'], self.chunk_size, offset=received, length=length
+                    )
+            except Exception:
+                os.truncate(session['path'], received)
+                raise
+            # 元数据文件随分块更新修改时间，定时清理旧文件时不会删除仍在进行的会话
+            os.utime(session['meta'])
+        session['received'] = received + written
+        return self._status(session)
+
+    def _hash_file(self, path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                digest.update(chunk)
+        return digest
+
+    def complete(self, upload_id):
+        """
+        结束分块上传，将文件移动到上传目录
+        各分块可能由不同进程接收，内容哈希在此时对完整文件计算一次
+        :return: 上传信息，格式与 save() 相同
+        """
+        session = self._get(upload_id)
+        with file_lock(session['lock']):
+            session = self._get(upload_id)
+            if session['received'] != session['size']:
+                raise UploadError(f"上传未完成，已接收 {session['received']}/{session['size']} 字节", 409)
+            digest = self._hash_file(session['path'])
+            path = self._stored_path(upload_id, session['filename'])
+            os.replace(session['path'], path)
+            self._remove(session['meta'])
+        self._remove(session['lock'])
+        app_logger.info(f"Chunked upload completed - ID: {upload_id}, Path: {path}")
+        return self._result(path, session['filename'], session['kind'], digest, session['size'])
+
+    def abort(self, upload_id):
+        session = self._get(upload_id)
+        self._discard(session)
+
+    def _discard(self, session):
+        with file_lock(session['lock']):
+            self._remove(session['meta'])
+            self._remove(session['path'])
+        self._remove(session['lock'])
+
+    def purge_expired(self):
+        """删除长时间无活动的分块上传会话（以部分文件的最后写入时间为准）"""
+        now = time.time()
+        purged = 0
+        for name in os.listdir(self.upload_folder):
+            match = _SESSION_FILE.match(name)
+            if not match:
+                continue
+            try:
+                session = self._get(match.group(1))
+                updated_at = max(os.path.getmtime(session['meta']), os.path.getmtime(session['path']))
+            except (UploadError, OSError):
+                continue
+            if updated_at + self.session_ttl <= now:
+                self._discard(session)
+                purged += 1
+        if purged:
+            app_logger.info(f"Purged {purged} expired upload sessions")
+
+    @staticmethod
+    def _remove(path):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            app_logger.warning(f"Failed to remove upload file {path}: {str(e)}")
@@ -0,0 +1,95 @@
+import heapq
+import ipaddress
+from utils.ip_tools import _subnet_info, format_address
+
+# 单次规划最多分配的子网数
+MAX_REQUESTS = 100000
+
+def _host_bits(version, max_prefixlen, hosts):
+    """容纳 hosts 台主机所需的最少主机位数：IPv4 扣除网络地址和广播地址，IPv6 扣除子网路由器任播地址"""
+    if hosts < 1:
+        raise ValueError('主机数量必须大于0')
+    reserved = 2 if version == 4 else 1
+    bits = (hosts + reserved - 1).bit_length()
+    if bits > max_prefixlen:
+        raise ValueError(f'主机数量过大: {hosts}')
+    return bits
+
+def _expand_requirements(requirements, version, max_prefixlen):
+    """
+    将需求展开为逐个子网的请求
+    每项可为主机数，或 {'name', 'hosts' | 'prefixlen', 'count'}，count 表示相同需求的子网个数
+    :return: [(序号, 名称, 主机数, 主机位数)]
+    """
+    requests = []
+    for index, item in enumerate(requirements):
+        if not isinstance(item, dict):
+            item = {'hosts': item}
+        name = item.get('name') or f'子网{index + 1}'
+        count = int(item.get('count', 1))
+        if count < 1:
+            raise ValueError(f'{name}: 子网个数必须大于0')
+        if item.get('prefixlen') not in (None, ''):
+            prefixlen = int(item['prefixlen'])
+            if not 0 <= prefixlen <= max_prefixlen:
+                raise ValueError(f'{name}: 无效的前缀长度 {prefixlen}')
+            hosts, bits = None, max_prefixlen - prefixlen
+        else:
+            hosts = int(item.get('hosts'))
+            bits = _host_bits(version, max_prefixlen, hosts)
+        if len(requests) + count > MAX_REQUESTS:
+            raise ValueError(f'单次最多分配 {MAX_REQUESTS} 个子网')
+        for number in range(count):
+            requests.append((len(requests), name if count == 1 else f'{name}-{number + 1}', hosts, bits))
+    return requests
+
+def _free_blocks(free, version, max_prefixlen):
+    blocks = sorted((start, bits) for bits, heap in free.items() for start in heap)
+    return [{
+        'subnet': f"{format_address(version, start)}/{max_prefixlen - bits}",
+        'addresses': 1 << bits
+    } for start, bits in blocks]
+
+def allocate_vlsm(network, requirements):
+    """
+    可变长子网划分（VLSM）
+    采用伙伴分配：需求按块大小从大到小处理，每个块从不小于它的最小空闲块中取地址最低者，
+    多余部分逐级对半拆分放回空闲表。从大到小分配时拆分出的空闲块始终按对齐方式排列，
+    除按2的幂取整外不产生碎片，剩余空间保持为尽可能大的对齐块
+    :param network: 主网段，如 '10.0.0.0/16'
+    :param requirements: 需求列表，见 _expand_requirements
+    :return: (分配结果列表（按需求顺序）, 剩余空闲块列表（按地址排序）, 无法分配的需求列表)
+    :raises ValueError: 参数无效，或某个需求的子网大于主网段
+    """
+    try:
+        net = ipaddress.ip_network(network, strict=False)
+    except ValueError as e:
+        raise ValueError(f'网段格式错误: {str(e)}')
+    version, max_prefixlen = net.version, net.max_prefixlen
+    parent_bits = max_prefixlen - net.prefixlen
+    requests = _expand_requirements(requirements, version, max_prefixlen)
+    # 单个子网就比主网段大的需求无论如何都无法满足，视为参数错误，而不是空间不足
+    for _, name, _, bits in requests:
+        if bits > parent_bits:
+            raise ValueError(f'{name}: 需要 /{max_prefixlen - bits}，超出主网段 {net}')
+
+    # 主机位数 -> 空闲块起始地址的最小堆
+    free = {parent_bits: [int(net.network_address)]}
+    allocations = [None] * len(requests)
+    unallocated = []
+
+    for order, name, hosts, bits in sorted(requests, key=lambda request: (-request[3], request[0])):
+        source = next((size for size in range(bits, parent_bits + 1) if free.get(size)), None)
+        if source is None:
+            unallocated.append({'name': name, 'hosts': hosts, 'prefixlen': max_prefixlen - bits,
+                                'error': '地址空间不足'})
+            continue
+        start = heapq.heappop(free[source])
+        # 逐级拆分，高地址的一半放回空闲表
+        while source > bits:
+            source -= 1
+            heapq.heappush(free.setdefault(source, []), start + (1 << source))
+        allocations[order] = dict(_subnet_info(version, start, max_prefixlen - bits), name=name, requested_hosts=hosts)
+
+    return [allocation for allocation in allocations if allocation], \
+        _free_blocks(free, version, max_prefixlen), unallocated
@@ -1,10 +1,11 @@
 import request from '../utils/request'
 
-export function calculateNetwork(data) {
+// 纯计算接口使用 GET，响应可被浏览器和反向代理按 ETag/Cache-Control 缓存
+export function calculateNetwork(params) {
   return request({
     url: '/api/network/calculate',
-    method: 'post',
-    data
+    method: 'get',
+    params
   })
 }
 
@@ -32,11 +33,11 @@ export function formatIp(data) {
   })
 }
 
-export function divideSubnet(data) {
+export function divideSubnet(params) {
   return request({
     url: '/api/network/divide',
-    method: 'post',
-    data
+    method: 'get',
+    params
   })
 }
 